@@ -0,0 +1,226 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic_data import synthetic_dataset
+from lib.instrumentation import peak_rss_mb
+from lib.scoring_kernels import kernel_backend
+
+HISTORY_FILE = os.path.join("benchmarks", "results", "history.jsonl")
+
+
+def _setup_read_clingen(paths):
+    return (paths["clingen"],)
+
+
+def _run_read_clingen(clingen_json_file):
+    from pathogenicity_benchmark import read_clingen
+
+    return len(read_clingen(clingen_json_file))
+
+
+def _setup_compare_seq(paths):
+    return (paths["seq"],)
+
+
+def _run_compare_seq(seq_annotation_json):
+    from pathogenicity_benchmark import compare_seq_vs_clingen
+
+    return sum(compare_seq_vs_clingen(seq_annotation_json)[0].values())
+
+
+def _setup_competitor(paths):
+    from pathogenicity_benchmark import read_clingen
+
+    return paths["competitor"], read_clingen(paths["clingen"])
+
+
+def _run_competitor(competitor_annotation_file, clingen_truthset):
+    from pathogenicity_benchmark import run_competitor_comparison
+
+    return sum(run_competitor_comparison(competitor_annotation_file, clingen_truthset, merge_vus=True)[0].values())
+
+
+def _setup_score_columns(paths):
+    from pathogenicity_benchmark import extract_competitor_columns, read_clingen
+
+    return extract_competitor_columns(paths["competitor"]), read_clingen(paths["clingen"])
+
+
+def _run_score_columns(columns, clingen_truthset):
+    # the cached competitor path: the truthset join plus one scoring kernel pass
+    from pathogenicity_benchmark import score_competitor_columns
+
+    return sum(score_competitor_columns(columns, clingen_truthset, merge_vus=True)[0].values())
+
+
+def _setup_tsv(paths):
+    # the comparison dicts are tiny, so the table writers are timed over many of them
+    from pathogenicity_benchmark import compare_seq_vs_clingen
+
+    comparison_dict = compare_seq_vs_clingen(paths["seq"])[0]
+    os.makedirs(os.path.join("data", "output"), exist_ok=True)
+    return comparison_dict, 200
+
+
+def _run_dict_to_tsv(comparison_dict, repeats):
+    from lib.unchangable_variables import COMPETITOR_INDEX_MAPPING
+    from sankey_diagram import dict_to_tsv
+
+    for _ in range(repeats):
+        dict_to_tsv(comparison_dict, COMPETITOR_INDEX_MAPPING, "benchmark.tsv")
+    return repeats * sum(comparison_dict.values())
+
+
+def _setup_statistics(paths):
+    from lib.unchangable_variables import COMPETITOR_INDEX_MAPPING
+    from sankey_diagram import dict_to_tsv
+
+    comparison_dict, repeats = _setup_tsv(paths)
+    dict_to_tsv(comparison_dict, COMPETITOR_INDEX_MAPPING, "benchmark.tsv")
+    return sum(comparison_dict.values()), repeats
+
+
+def _run_statistics(variants, repeats):
+    from sankey_diagram import calculate_statistics_from_tsv
+
+    for _ in range(repeats):
+        calculate_statistics_from_tsv("benchmark.tsv", "benchmark_statistics.tsv")
+    return repeats * variants
+
+
+# name -> (setup, timed run); setup is not timed, the run returns the rows it processed
+BENCHMARKS = {
+    "read_clingen": (_setup_read_clingen, _run_read_clingen),
+    "compare_seq_vs_clingen": (_setup_compare_seq, _run_compare_seq),
+    "run_competitor_comparison": (_setup_competitor, _run_competitor),
+    "score_competitor_columns": (_setup_score_columns, _run_score_columns),
+    "dict_to_tsv": (_setup_tsv, _run_dict_to_tsv),
+    "calculate_statistics_from_tsv": (_setup_statistics, _run_statistics),
+}
+
+
+def _run_benchmark(name, paths, repeat, work_dir):
+    # runs in a fresh interpreter, so the peak RSS belongs to this benchmark alone
+    os.chdir(work_dir)
+    setup, run = BENCHMARKS[name]
+    args = setup(paths)
+    setup_rss_mb = peak_rss_mb()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run(*args)
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    return {
+        "benchmark": name,
+        "rows": rows,
+        "seconds": round(best, 4),
+        "median_seconds": round(sorted(seconds)[len(seconds) // 2], 4),
+        "rows_per_sec": round(rows / best) if best else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "setup_rss_mb": setup_rss_mb,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(variants, names=None, repeat=3, data_dir=os.path.join("data", "synthetic"), seed=0):
+    """one result dict per benchmark in names (all of BENCHMARKS by default), each run in its own process"""
+    paths = {name: os.path.abspath(path) for name, path in synthetic_dataset(data_dir, variants, seed).items()}
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in names or BENCHMARKS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results.append(executor.submit(_run_benchmark, name, paths, repeat, work_dir).result())
+    return results
+
+
+def read_history(history_file):
+    try:
+        with open(history_file) as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def find_regressions(results, history, threshold=0.1):
+    """
+    (benchmark, metric, previous, current) for every result whose rows/sec dropped or whose peak RSS grew
+    by more than threshold against the latest history record of the same benchmark, scale and machine
+    """
+    regressions = []
+    for result in results:
+        previous = [
+            record for record in history
+            if (record["benchmark"], record["variants"], record["machine"])
+            == (result["benchmark"], result["variants"], result["machine"])
+        ]
+        if not previous:
+            continue
+        previous = previous[-1]
+        if previous["rows_per_sec"] and result["rows_per_sec"] < previous["rows_per_sec"] * (1 - threshold):
+            regressions.append((result["benchmark"], "rows_per_sec", previous["rows_per_sec"], result["rows_per_sec"]))
+        if result["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + threshold):
+            regressions.append((result["benchmark"], "peak_rss_mb", previous["peak_rss_mb"], result["peak_rss_mb"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="time the benchmark stages on synthetic data")
+    parser.add_argument("--variants", type=int, action="append", help="dataset scale (repeatable), default 10000")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), help="only this one (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the fastest is kept")
+    parser.add_argument("--data-dir", default=os.path.join("data", "synthetic"))
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON lines file the results are appended to")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    parser.add_argument("--no-record", action="store_true", help="compare against the history without appending")
+    args = parser.parse_args(argv)
+
+    history = read_history(args.history)
+    record = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "kernel": kernel_backend(),
+    }
+    results = []
+    for variants in args.variants or [10000]:
+        for result in run_benchmarks(variants, args.benchmark, args.repeat, args.data_dir):
+            result = dict(record, variants=variants, **result)
+            results.append(result)
+            print(
+                f"{result['benchmark']:<32}{variants:>10} variants{result['seconds']:>10.3f}s"
+                f"{result['rows_per_sec']:>14,} rows/s{result['peak_rss_mb']:>10.1f} MB"
+            )
+
+    regressions = find_regressions(results, history, args.threshold)
+    for benchmark, metric, previous, current in regressions:
+        print(f"regression: {benchmark} {metric} {previous} -> {current}")
+    if not args.no_record:
+        os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+        with open(args.history, "a") as fh:
+            for result in results:
+                fh.write(json.dumps(result) + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import argparse
+import gzip
+import json
+import os
+import random
+
+from lib.unchangable_variables import PATHOGENICITY_MAPPING_EXTENDED, PATHOGENICITY_MAPPING_SHRINKAGE
+
+# tier and evidence frequencies roughly follow the 2024-02 ClinGen release in data/clingen
+TIER_WEIGHTS = {"VUS": 30, "P": 26, "LP": 22, "B": 12, "LB": 10}
+INHERITANCE_WEIGHTS = {
+    ("autosomal dominant",): 48,
+    ("autosomal recessive",): 36,
+    ("semidominant",): 9,
+    ("x-linked",): 5,
+    ("mitochondrial",): 2,
+}
+PATHOGENIC_CODES = ["PVS1", "PS1", "PS2", "PS3", "PS4", "PM1", "PM2", "PM3", "PM4", "PM5", "PM6", "PP1", "PP2", "PP3",
+                    "PP4"]
+BENIGN_CODES = ["BA1", "BS1", "BS2", "BS3", "BP2", "BP4", "BP5", "BP7"]
+STRENGTHS = ["", "", "", "_Supporting", "_Moderate", "_Strong", "_Very Strong"]
+CHROMOSOMES = [str(number) for number in range(1, 23)] + ["X", "MT"]
+BASES = "ACGT"
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+GENES = 2000
+
+# labels the platforms report per ClinGen tier; the first entry is the concordant call
+SEQ_LABELS = {tier: [tier] + [label for label in PATHOGENICITY_MAPPING_EXTENDED if label != tier] for tier in TIER_WEIGHTS}
+COMPETITOR_LABELS = {
+    tier: sorted(PATHOGENICITY_MAPPING_SHRINKAGE, key=lambda label: PATHOGENICITY_MAPPING_SHRINKAGE[label] != tier)
+    for tier in TIER_WEIGHTS
+}
+
+# header of the competitor export; only COMPETITOR_COLUMNS are filled
+COMPETITOR_HEADER = [
+    "Variant", "Chromosome", "Position", "RS ID", "Ref seq", "Var seq", "Type", "HGVS", "Zygosity", "Genes",
+    "Phenotypes", "Number of phenotypes", "Transcripts", "OMIM phenotypes", "OMIM inheritance", "Function",
+    "Functions of ACMG transcript", "Coding impact", "Inheritance", "ClinVar class", "ClinVar disease",
+    "Cosmic primary site", "Allelic balance", "Frequency", "1000Genomes", "Sift score", "Sift prediction",
+    "Mutation taster prediction", "PolyPhen-2 HVAR", "PolyPhen-2 HDIV", "PrimateAI", "Coverage",
+    "Alternate Allele Coverage", "Class", "User classification", "Homozygous samples", "Heterozygous samples",
+    "Tumor Samples", "Your Homozygous samples", "Your Heterozygous samples", "Your Tumor samples", "COSMIC Id",
+    "dbscSNV ADA", "dbscSNV RF", "Min splice distance", "CADD score", "CADD prediction", "BayesDel AddAF score",
+    "BayesDel AddAF prediction", "BayesDel noAF score", "BayesDel noAF prediction", "EIGEN raw coding",
+    "EIGEN prediction", "REVEL score", "REVEL prediction", "MetaSVM score", "MetaSVM prediction", "Germline rules",
+    "Comments", "Germline Class", "Somatic Tier", "Filters",
+]
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _evidence_codes(rng, tier, count):
+    codes = PATHOGENIC_CODES if tier in ("P", "LP", "VUS") else BENIGN_CODES
+    return [rng.choice(codes) + rng.choice(STRENGTHS) for _ in range(count)]
+
+
+def _aa_change(rng):
+    roll = rng.random()
+    if roll < 0.15:
+        return None
+    position = rng.randint(2, 1500)
+    reference = rng.choice(AMINO_ACIDS)
+    if roll < 0.55:
+        return f"{reference}{position}{rng.choice(AMINO_ACIDS)}"
+    if roll < 0.7:
+        return f"{reference}{position}{rng.choice(AMINO_ACIDS)}fs"
+    if roll < 0.82:
+        return f"{reference}{position}*"
+    if roll < 0.92:
+        return f"{reference}{position}="
+    if roll < 0.97:
+        return f"{reference}{position}del"
+    return f"M1{rng.choice(AMINO_ACIDS)}"
+
+
+def iter_clingen_entries(variants, seed=0):
+    """
+    ClinGen truthset entries with every field of the curated export; the same (variants, seed) always yields
+    the same entries, so the truthset and the platform files can be written in separate streaming passes
+    """
+    rng = random.Random(seed)
+    for number in range(variants):
+        chromosome = CHROMOSOMES[number % len(CHROMOSOMES)]
+        position = 10000 + 7 * (number // len(CHROMOSOMES))
+        ref = rng.choice(BASES)
+        alt = rng.choice(BASES.replace(ref, ""))
+        if rng.random() < 0.1:
+            alt = ref + "".join(rng.choice(BASES) for _ in range(rng.randint(1, 4)))
+        tier = _weighted(rng, TIER_WEIGHTS)
+        gene = rng.randrange(GENES)
+        yield {
+            "transcript_ids": [f"ENST{gene:011d}", f"NM_{gene:06d}"],
+            "variant_id": f"CA{number + 100000}",
+            "gene_ids": [str(gene + 1), f"ENSG{gene:011d}"],
+            "unique_gene_ids": [str(gene + 20000)],
+            "aa_change": _aa_change(rng),
+            "hgvs_all": [f"NM_{gene:06d}.1:c.{position % 5000}{ref}>{alt}"],
+            "hgvsg": [f"{chromosome}:g.{position}{ref}>{alt}"],
+            "gene_symbol": f"GENE{gene}",
+            "mondo_id": f"{gene * 3 + rng.randrange(3):07d}",
+            "disease_name": f"disease {gene}",
+            "pathogenicity": tier,
+            "mode_of_inheritances": list(_weighted(rng, INHERITANCE_WEIGHTS)),
+            "evidence_codes": _evidence_codes(rng, tier, rng.randint(0, 6)),
+            "unmet_evidence_codes": _evidence_codes(rng, tier, rng.randint(0, 2)),
+            "clinvar_id": str(number + 1000),
+            "identifier": None if rng.random() < 0.02 else f"{chromosome}-{position}-{ref}-{alt}",
+        }
+
+
+def _predicted(rng, labels, concordance):
+    if rng.random() < concordance:
+        return labels[0]
+    return rng.choice(labels[1:])
+
+
+def write_clingen_json(path, variants, seed=0, compresslevel=1):
+    # streamed as one {"date": ..., "data": [...]} document, the layout of the ClinGen export
+    with gzip.open(path, "wt", compresslevel=compresslevel) as fh:
+        fh.write('{"date": "2024-02-13", "data": [\n')
+        for number, entry in enumerate(iter_clingen_entries(variants, seed)):
+            if number:
+                fh.write(",\n")
+            fh.write(json.dumps(entry))
+        fh.write("\n]}\n")
+
+
+def write_seq_json_lines(path, variants, seed=0, concordance=0.6, coverage=0.95, compresslevel=1):
+    """SEQ annotation records; coverage is the share of records that carry their ClinGen entry"""
+    rng = random.Random(seed + 1)
+    with gzip.open(path, "wt", compresslevel=compresslevel) as fh:
+        for entry in iter_clingen_entries(variants, seed):
+            record = {
+                "variant": {"chrom": entry["hgvsg"][0].split(":")[0]},
+                "annotations": {
+                    "variant": {"clingen": [entry] if rng.random() < coverage else []},
+                    "transcript": {
+                        "auto_pathogenicity": _predicted(rng, SEQ_LABELS[entry["pathogenicity"]], concordance),
+                        "acmg_evidence_codes": [
+                            code + rng.choice(["", "", "+", "-", "++", "--"])
+                            for code in rng.sample(PATHOGENIC_CODES + BENIGN_CODES, rng.randint(0, 6))
+                        ],
+                    },
+                },
+            }
+            fh.write(json.dumps(record) + "\n")
+
+
+def write_competitor_tsv(path, variants, seed=0, concordance=0.6, coverage=0.9, compresslevel=1):
+    """competitor export rows; coverage is the share of truthset variants the export has a row for"""
+    rng = random.Random(seed + 2)
+    columns = {column: position for position, column in enumerate(COMPETITOR_HEADER)}
+    with gzip.open(path, "wt", compresslevel=compresslevel, encoding="utf-8") as fh:
+        fh.write("\t".join(COMPETITOR_HEADER) + "\n")
+        for entry in iter_clingen_entries(variants, seed):
+            if entry["identifier"] is None or rng.random() >= coverage:
+                continue
+            chromosome, position, ref, alt = entry["identifier"].split("-")
+            row = [""] * len(COMPETITOR_HEADER)
+            row[columns["Variant"]] = f"chr{chromosome}:{position} {ref}⇒{alt}"
+            row[columns["Chromosome"]] = f"chr{chromosome}"
+            row[columns["Position"]] = position
+            row[columns["Ref seq"]] = ref
+            row[columns["Var seq"]] = alt
+            row[columns["Genes"]] = entry["gene_symbol"]
+            row[columns["Germline rules"]] = ",".join(
+                entry["evidence_codes"] + (["PP5_Very Strong"] if rng.random() < 0.3 else [])
+            )
+            row[columns["Germline Class"]] = _predicted(rng, COMPETITOR_LABELS[entry["pathogenicity"]], concordance)
+            row[columns["Filters"]] = "PASS"
+            fh.write("\t".join(row) + "\n")
+
+
+def synthetic_dataset(output_dir, variants, seed=0):
+    """
+    {"clingen": path, "seq": path, "competitor": path} of a dataset with variants truthset entries,
+    written on the first call and reused afterwards
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {
+        "clingen": os.path.join(output_dir, f"clingen_{variants}_{seed}.json.gz"),
+        "seq": os.path.join(output_dir, f"seq_{variants}_{seed}.json.gz"),
+        "competitor": os.path.join(output_dir, f"competitor_{variants}_{seed}.tsv.gz"),
+    }
+    for name, write in (("clingen", write_clingen_json), ("seq", write_seq_json_lines),
+                        ("competitor", write_competitor_tsv)):
+        if not os.path.exists(paths[name]):
+            # written next to the target first, so an interrupted run never leaves a truncated file behind
+            write(paths[name] + ".tmp", variants, seed)
+            os.replace(paths[name] + ".tmp", paths[name])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="write a synthetic ClinGen / SEQ / competitor dataset")
+    parser.add_argument("--variants", type=int, default=10000, help="truthset entries, e.g. 10000 to 10000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=os.path.join("data", "synthetic"))
+    args = parser.parse_args(argv)
+    for path in synthetic_dataset(args.output_dir, args.variants, args.seed).values():
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
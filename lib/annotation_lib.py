@@ -1,33 +1,94 @@
+from typing import Any, Dict, List, Optional, TypedDict
+
 from lib.unchangable_variables import PATHOGENICITY_MAPPING_EXTENDED
 
 
+def _entry_field(key, default=None, required=False):
+    # resolved from the underlying ClinGen entry on every access, nothing is copied up front
+    if required:
+        return property(lambda self: self._entry[key])
+    if isinstance(default, list):
+        return property(lambda self: self._entry.get(key, []))
+    return property(lambda self: self._entry.get(key, default))
+
+
 class ClingenVariant:
+    __slots__ = ("_entry",)
+
     def __init__(self, entry):
-        self.mondo_id = entry["mondo_id"]
-        self.disease_id = f'MONDO:{entry["mondo_id"]}'
-        self.disease_name = entry["disease_name"]
-        self.mode_of_inheritances = entry["mode_of_inheritances"]
-        self.pathogenicity = entry["pathogenicity"]
-        self.evidence_codes = entry["evidence_codes"]
-        self.unmet_evidence_codes = entry.get("unmet_evidence_codes", [])
-        self.variant_id = entry["variant_id"]
-
-        self.gene_ids = entry.get("gene_ids")
-        self.transcript_ids = entry.get("transcript_ids", [])
-        self.aa_change = entry.get("aa_change")
-        self.identifier = entry.get("identifier")
-        self.clinvar_id = entry.get("clinvar_id")
-        self.hgvsg = entry.get("hgvsg")
-        self.hgvs_all = entry.get("hgvs_all")
-        self.gene_symbol = entry.get("gene_symbol")
-        self.gene_unique_ids = entry.get("unique_gene_ids")
+        self._entry = entry
+
+    mondo_id = _entry_field("mondo_id", required=True)
+    disease_name = _entry_field("disease_name", required=True)
+    mode_of_inheritances = _entry_field("mode_of_inheritances", required=True)
+    pathogenicity = _entry_field("pathogenicity", required=True)
+    evidence_codes = _entry_field("evidence_codes", required=True)
+    unmet_evidence_codes = _entry_field("unmet_evidence_codes", default=[])
+    variant_id = _entry_field("variant_id", required=True)
+
+    gene_ids = _entry_field("gene_ids")
+    transcript_ids = _entry_field("transcript_ids", default=[])
+    aa_change = _entry_field("aa_change")
+    identifier = _entry_field("identifier")
+    clinvar_id = _entry_field("clinvar_id")
+    hgvsg = _entry_field("hgvsg")
+    hgvs_all = _entry_field("hgvs_all")
+    gene_symbol = _entry_field("gene_symbol")
+    gene_unique_ids = _entry_field("unique_gene_ids")
+
+    @property
+    def disease_id(self):
+        return f'MONDO:{self._entry["mondo_id"]}'
 
 
 class Annotation:
+    __slots__ = ("data", "_clingen_entries")
+
     def __init__(self, data):
         self.data = data
-        self.clingen_data = data["annotations"]["variant"].get("clingen", [])
-        self.clingen_entries = [ClingenVariant(entry) for entry in self.clingen_data]
-        self.autopat_code = PATHOGENICITY_MAPPING_EXTENDED[
-            data["annotations"]["transcript"]["auto_pathogenicity"]
+        self._clingen_entries = None
+
+    @property
+    def clingen_data(self):
+        return self.data["annotations"]["variant"].get("clingen", [])
+
+    @property
+    def clingen_entries(self):
+        # built on first access only
+        if self._clingen_entries is None:
+            self._clingen_entries = [ClingenVariant(entry) for entry in self.clingen_data]
+        return self._clingen_entries
+
+    @property
+    def autopat_code(self):
+        return PATHOGENICITY_MAPPING_EXTENDED[
+            self.data["annotations"]["transcript"]["auto_pathogenicity"]
         ]
+
+
+# records without a ClinGen entry are skipped before the transcript is read, so only the variant is required;
+# absent or null fields decode the same with every backend and are defaulted where they are read
+class TranscriptAnnotationRecord(TypedDict, total=False):
+    auto_pathogenicity: Optional[str]
+    acmg_evidence_codes: Optional[List[str]]
+
+
+class VariantAnnotationRecord(TypedDict, total=False):
+    clingen: Optional[List[Dict[str, Any]]]
+
+
+class _RequiredAnnotationsRecord(TypedDict):
+    variant: VariantAnnotationRecord
+
+
+# a total=False subclass instead of NotRequired, which typing only has from Python 3.11
+class AnnotationsRecord(_RequiredAnnotationsRecord, total=False):
+    transcript: Optional[TranscriptAnnotationRecord]
+
+
+class SeqAnnotationRecord(TypedDict):
+    """
+    the parts of a SEQ JSON-lines record the comparison reads; schema-aware decoders (msgspec) skip everything else
+    """
+
+    annotations: AnnotationsRecord
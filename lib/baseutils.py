@@ -1,4 +1,12 @@
 import gzip
+import io
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from operator import itemgetter
+
+from lib import instrumentation
 
 
 def is_gzipped(file):
@@ -22,46 +30,323 @@ def open_func(
         read_header = True
     header = None
     with file_open(file) as infile:
-        for xline in infile:
-            row_count += 1
-            line = (
-                xline.decode("utf-8").replace("\n", "")
-                if gzipped
-                else xline.replace("\n", "")
-            )
-            if (
-                    line == ""
-                    or (line.startswith(header_start) and read_header is False)
-                    or row_count <= skip_rows
-            ):
-                continue
-            if not to_dict:
-                yield line if not to_list else line.split(sep)
-            else:
-                fields = line.replace(header_start, "").split(sep)
-                if header is None:
-                    header = fields
+        try:
+            for xline in infile:
+                row_count += 1
+                line = (
+                    xline.decode("utf-8").replace("\n", "")
+                    if gzipped
+                    else xline.replace("\n", "")
+                )
+                if (
+                        line == ""
+                        or (line.startswith(header_start) and read_header is False)
+                        or row_count <= skip_rows
+                ):
                     continue
+                if not to_dict:
+                    yield line if not to_list else line.split(sep)
                 else:
-                    yield dict(zip(header, fields))
+                    fields = line.replace(header_start, "").split(sep)
+                    if header is None:
+                        header = fields
+                        continue
+                    else:
+                        yield dict(zip(header, fields))
+        finally:
+            instrumentation.record_file(file, infile)
+
+
+def _available_decompressor():
+    try:
+        import isal.igzip_threaded  # noqa: F401
+
+        return "isal"
+    except ImportError:
+        pass
+    if shutil.which("pigz"):
+        return "pigz"
+    return "gzip"
+
+
+@contextmanager
+def open_text(file, encoding="utf-8", buffer_size=1 << 20, decompressor="auto"):
+    """
+    text-mode reader with a large buffer; gzip members are decompressed by python-isal (on a
+    background thread), an external pigz process, or stdlib gzip, whichever decompressor names,
+    "auto" taking the first one available
+    """
+    file = str(file)
+    if not is_gzipped(file):
+        with open(file, "rt", encoding=encoding, buffering=buffer_size) as infile:
+            try:
+                yield infile
+            finally:
+                instrumentation.record_file(file)
+        return
+
+    if decompressor == "auto":
+        decompressor = _available_decompressor()
+    if decompressor == "isal":
+        from isal import igzip_threaded
+
+        with igzip_threaded.open(file, "rt", encoding=encoding, threads=1, block_size=buffer_size) as infile:
+            try:
+                yield infile
+            finally:
+                instrumentation.record_file(file, infile)
+    elif decompressor == "pigz":
+        process = subprocess.Popen(["pigz", "-dc", file], stdout=subprocess.PIPE, bufsize=buffer_size)
+        at_eof = False
+        try:
+            yield io.TextIOWrapper(process.stdout, encoding=encoding)
+        except BaseException:
+            # the reader failed; its exception propagates, not pigz's
+            process.terminate()
+            raise
+        else:
+            at_eof = not process.stdout.closed and process.stdout.peek(1) == b""
+            if not at_eof:
+                # the reader stopped early
+                process.terminate()
+        finally:
+            instrumentation.record_file(file)
+            process.stdout.close()
+            process.wait()
+        # a truncated or corrupt stream shows in the exit status, as gzip and isal raise EOFError on it
+        if at_eof and process.returncode != 0:
+            raise OSError(f"pigz failed on {file} with exit code {process.returncode}")
+    elif decompressor == "gzip":
+        with gzip.open(file, "rb") as raw:
+            try:
+                yield io.TextIOWrapper(io.BufferedReader(raw, buffer_size), encoding=encoding)
+            finally:
+                instrumentation.record_file(file, raw)
+    else:
+        raise ValueError(f"unknown decompressor {decompressor!r}")
+
+
+def _column_indices(file, header_fields, usecols):
+    # duplicated column names resolve to the last one, as with dict(zip(header, fields))
+    header = {name: index for index, name in enumerate(header_fields)}
+    missing = [column for column in usecols if column not in header]
+    if missing:
+        raise KeyError(f"{file}: missing columns {missing}")
+    return [header[column] for column in usecols]
+
+
+def _row_projection(indices):
+    return itemgetter(*indices) if len(indices) > 1 else lambda row: (row[indices[0]],)
+
+
+def read_tsv_columns(file, usecols, sep="\t", header_start="#", **open_kwargs):
+    """
+    yields one tuple per row holding only the usecols values, in usecols order;
+    rows are read like open_func(file, to_dict=True) does, without building a dict per row
+    """
+    with open_text(file, **open_kwargs) as infile:
+        header = None
+        for line in instrumentation.timed_iter("read", infile):
+            line = line.rstrip("\n")
+            if line == "":
+                continue
+            if header_start in line:
+                line = line.replace(header_start, "")
+            fields = line.split(sep)
+            if header is None:
+                header = fields
+                project = _row_projection(_column_indices(file, header, usecols))
+                continue
+            yield project(fields)
+
+
+def read_tsv_blocks(file, usecols, block_size=1 << 22, sep="\t", header_start="#"):
+    """
+    read_tsv_columns split for a streaming pipeline: returns the positions of usecols in the header and an
+    iterator of bytes blocks of whole rows (each roughly block_size decompressed bytes) for parse_tsv_block
+    """
+    file_open = gzip.open if is_gzipped(file) else open
+    with file_open(str(file), "rb") as infile:
+        for line in infile:
+            line = _decode_tsv_line(line).rstrip("\n")
+            if line != "":
+                break
+        else:
+            raise KeyError(f"{file}: no header line")
+    indices = _column_indices(file, line.replace(header_start, "").split(sep), usecols)
+    return indices, iter_line_blocks(file, block_size, skip_header=True)
 
 
-def load_json(json_file, encoding="utf-8", parse_float=None):
+def _decode_tsv_line(line):
+    # text mode of open_text: utf-8 with universal newlines
+    line = line.decode("utf-8")
+    if "\r" in line:
+        line = line.replace("\r\n", "\n").replace("\r", "\n")
+    return line
+
+
+def parse_tsv_block(block, indices, sep="\t", header_start="#"):
+    """the usecols tuples of one read_tsv_blocks block, as read_tsv_columns yields them"""
+    project = _row_projection(indices)
+    for line in _decode_tsv_line(block).split("\n"):
+        if line == "":
+            continue
+        if header_start in line:
+            line = line.replace(header_start, "")
+        yield project(line.split(sep))
+
+
+def load_json(json_file, encoding="utf-8", parse_float=None, backend="auto"):
     import json
 
+    from lib.json_backend import get_json_decoder
+
     json_file = str(json_file)
+    if parse_float is not None:
+        # only the standard library supports parse_float
+        backend = "json"
     if is_gzipped(json_file):
         with gzip.open(json_file) as fh:
-            return json.loads(
-                fh.read().decode(encoding=encoding), parse_float=parse_float
-            )
+            data = fh.read()
+        instrumentation.count("bytes_decompressed", len(data))
     else:
-        with open(json_file) as fh:
-            return json.load(fh, parse_float=parse_float)
+        with open(json_file, "rb") as fh:
+            data = fh.read()
+    instrumentation.record_file(json_file)
+    with instrumentation.stage("json decode"):
+        if backend == "json":
+            return json.loads(data.decode(encoding=encoding), parse_float=parse_float)
+        return get_json_decoder(backend)(data)
+
+
+def iter_json_array(json_file, key="data", encoding="utf-8", chunk_size=1 << 20):
+    """
+    streams the items of the top-level array stored under key without holding the whole document;
+    only one decompressed chunk plus the item being decoded are kept in memory
+    """
+    import json
+
+    raw_decode = instrumentation.timed_calls("json decode", json.JSONDecoder().raw_decode)
+    file_open = gzip.open if is_gzipped(json_file) else open
+    with file_open(str(json_file), "rt", encoding=encoding) as infile:
+        try:
+            read = instrumentation.timed_calls("read", infile.read)
+            buffer = ""
+            position = 0
+            eof = False
+
+            def skip_whitespace():
+                nonlocal buffer, position, eof
+                while True:
+                    while position < len(buffer) and buffer[position] in " \t\r\n":
+                        position += 1
+                    if position < len(buffer) or eof:
+                        return
+                    buffer, position = read(chunk_size), 0
+                    eof = buffer == ""
 
+            def expect(characters):
+                skip_whitespace()
+                if position >= len(buffer) or buffer[position] not in characters:
+                    raise ValueError(f"{json_file}: expected one of {characters!r} at top level")
+                return buffer[position]
+
+            def decode():
+                nonlocal buffer, position, eof
+                skip_whitespace()
+                while True:
+                    try:
+                        value, end = raw_decode(buffer, position)
+                        # a number cut by the chunk boundary decodes as its prefix, so it needs a delimiter after it
+                        if eof or type(value) not in (int, float) or buffer[end:end + 1] in tuple(" \t\r\n,]}"):
+                            position = end
+                            return value
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    # grow geometrically so an item larger than chunk_size is re-scanned only a few times
+                    chunk = read(max(chunk_size, len(buffer) - position))
+                    eof = chunk == ""
+                    buffer, position = buffer[position:] + chunk, 0
+
+            expect("{")
+            position += 1
+            while expect('"}') == '"':
+                current_key = decode()
+                expect(":")
+                position += 1
+                if current_key != key:
+                    decode()
+                    if expect(",}") == "}":
+                        break
+                    position += 1
+                    continue
+                expect("[")
+                position += 1
+                skip_whitespace()
+                if buffer[position:position + 1] == "]":
+                    return
+                while True:
+                    yield decode()
+                    if expect(",]") == "]":
+                        return
+                    position += 1
+            raise KeyError(f"{json_file}: no top-level {key!r} array")
+        finally:
+            instrumentation.record_file(json_file, infile)
+
+
+def iter_line_blocks(file, block_size=1 << 22, skip_header=False):
+    """
+    yields bytes blocks of whole lines, each roughly block_size decompressed bytes;
+    skip_header drops everything up to and including the first non-empty line
+    """
+    file_open = gzip.open if is_gzipped(file) else open
+    with file_open(str(file), "rb") as infile:
+        try:
+            if skip_header:
+                for line in infile:
+                    if line.strip(b"\r\n"):
+                        break
+            # read in raw blocks and cut after the last newline, rather than line by line
+            pending = b""
+            while True:
+                block = infile.read(block_size)
+                if not block:
+                    if pending:
+                        yield pending
+                    return
+                block = pending + block
+                cut = block.rfind(b"\n") + 1
+                pending = block[cut:]
+                if cut:
+                    yield block[:cut]
+        finally:
+            instrumentation.record_file(file, infile)
+
+
+def parse_json_lines(infile, backend="auto", schema=None):
+    """one decoded record per line; empty lines and lines starting with "#" are skipped like open_func does"""
+    from lib.json_backend import get_json_decoder
+
+    loads = instrumentation.timed_calls("json decode", get_json_decoder(backend, schema))
+    file_open = gzip.open if is_gzipped(infile) else open
+    with file_open(str(infile), "rb") as fh:
+        try:
+            for line in instrumentation.timed_iter("read", fh):
+                if line == b"\n" or line == b"" or line.startswith(b"#"):
+                    continue
+                yield loads(line)
+        finally:
+            instrumentation.record_file(infile, fh)
 
-def parse_json_lines(infile):
-    import json as json
 
-    for line in open_func(infile):
-        yield json.loads(line)
+@contextmanager
+def timed(stage, timings):
+    """records the wall time of the with-block under timings[stage], and as an instrumentation stage when that is on"""
+    start = time.perf_counter()
+    try:
+        with instrumentation.stage(stage):
+            yield
+    finally:
+        timings[stage] = time.perf_counter() - start
@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.confusion_matrix import AVERAGES, confusion_matrix_metrics
+
+METRICS = ["f1", "precision", "recall"]
+
+
+def bootstrap_confusion_matrices(matrix, replicates=10000, seed=None, batch_size=2000):
+    """
+    yields (batch, tiers, tiers) resampled count matrices. resampling the variants with replacement is
+    the same as one multinomial draw of matrix.sum() variants over the cells, so a whole batch of
+    replicates is a single rng.multinomial call instead of a loop over variants
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    total = int(matrix.sum())
+    if total == 0:
+        probabilities = np.full(matrix.size, 1 / matrix.size)
+    else:
+        probabilities = matrix.ravel() / total
+    for start in range(0, replicates, batch_size):
+        size = min(batch_size, replicates - start)
+        yield rng.multinomial(total, probabilities, size=size).reshape((size,) + matrix.shape)
+
+
+def bootstrap_metrics(matrix, replicates=10000, confidence=0.95, seed=None, batch_size=2000):
+    """
+    percentile confidence intervals for per-tier and averaged F1/precision/recall:
+    {"f1": (lower, upper), ..., "averages": {"macro": {"f1": (lower, upper), ...}, ...}}
+    with per-tier bounds as arrays in tier_labels order
+    """
+    samples = {metric: [] for metric in METRICS}
+    average_samples = {average: {metric: [] for metric in METRICS} for average in AVERAGES}
+    for matrices in bootstrap_confusion_matrices(matrix, replicates, seed, batch_size):
+        metrics = confusion_matrix_metrics(matrices)
+        for metric in METRICS:
+            samples[metric].append(metrics[metric])
+        for average in AVERAGES:
+            for metric, values in zip(METRICS, metrics["averages"][average]):
+                average_samples[average][metric].append(values)
+
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+
+    def interval(values):
+        lower, upper = np.quantile(np.concatenate(values), quantiles, axis=0)
+        return lower, upper
+
+    intervals = {metric: interval(samples[metric]) for metric in METRICS}
+    intervals["averages"] = {
+        average: {metric: interval(average_samples[average][metric]) for metric in METRICS}
+        for average in AVERAGES
+    }
+    return intervals
+
+
+def _bootstrap_job(args):
+    matrix, replicates, confidence, seed = args
+    return bootstrap_metrics(matrix, replicates, confidence, seed)
+
+
+def bootstrap_platforms(matrices, replicates=10000, confidence=0.95, seed=None, processes=None):
+    """
+    bootstrap_metrics for every entry of {name: matrix}, one process per matrix.
+    each entry gets its own child seed, so results do not depend on the number of processes
+    """
+    names = list(matrices)
+    seeds = np.random.SeedSequence(seed).spawn(len(names))
+    jobs = [(matrices[name], replicates, confidence, child) for name, child in zip(names, seeds)]
+    if processes is None:
+        processes = len(jobs)
+    if processes <= 1 or len(jobs) <= 1:
+        return dict(zip(names, map(_bootstrap_job, jobs)))
+    with ProcessPoolExecutor(max_workers=min(processes, len(jobs))) as executor:
+        return dict(zip(names, executor.map(_bootstrap_job, jobs)))
+
+
+def interval_rows(intervals, labels, decimals=3):
+    """(label, F1 lower, F1 upper, precision lower, ..., recall upper) per tier and per average"""
+    rows = []
+    for position, label in enumerate(labels):
+        rows.append((label,) + tuple(
+            round(float(bound[position]), decimals) for metric in METRICS for bound in intervals[metric]
+        ))
+    for average in AVERAGES:
+        rows.append((average,) + tuple(
+            round(float(bound), decimals) for metric in METRICS for bound in intervals["averages"][average][metric]
+        ))
+    return rows
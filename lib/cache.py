@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from lib import instrumentation
+
+# bump when an extractor changes what it stores, so old entries are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+
+def file_content_hash(file, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file, "rb") as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    on-disk cache of extracted columns, one directory of .npy files per (kind, source file).
+    an entry is reused while the source size and mtime are unchanged; when they change the content hash
+    decides, so a touched but identical file is not re-parsed. columns are memory-mapped on load
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = str(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, kind, source_file):
+        source_key = hashlib.blake2b(os.path.abspath(source_file).encode("utf-8"), digest_size=10).hexdigest()
+        return os.path.join(self.cache_dir, f"{kind}-{source_key}")
+
+    def _read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, "meta.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _lookup(self, kind, source_file):
+        # (entry_dir, meta) on a hit; (None, content hash or None) on a miss
+        entry_dir = self._entry_dir(kind, source_file)
+        meta = self._read_meta(entry_dir)
+        if meta is None or meta.get("format_version") != CACHE_FORMAT_VERSION:
+            return None, None
+        stat = os.stat(source_file)
+        if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+            return entry_dir, meta
+        content_hash = file_content_hash(source_file)
+        if meta["content_hash"] != content_hash:
+            return None, content_hash
+        meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        with open(os.path.join(entry_dir, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        return entry_dir, meta
+
+    @staticmethod
+    def _load_columns(entry_dir, meta):
+        return {
+            column: np.load(os.path.join(entry_dir, f"{column}.npy"), mmap_mode="r")
+            for column in meta["columns"]
+        }
+
+    def load(self, kind, source_file):
+        entry_dir, meta = self._lookup(kind, source_file)
+        if entry_dir is None:
+            return None
+        return self._load_columns(entry_dir, meta)
+
+    def store(self, kind, source_file, columns, content_hash=None):
+        stat = os.stat(source_file)
+        meta = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "source": os.path.abspath(source_file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_hash": content_hash or file_content_hash(source_file),
+            "columns": list(columns),
+        }
+        # written to a scratch directory and renamed, so readers never see a partial entry
+        scratch_dir = tempfile.mkdtemp(dir=self.cache_dir)
+        for column, values in columns.items():
+            np.save(os.path.join(scratch_dir, f"{column}.npy"), np.asarray(values), allow_pickle=False)
+        with open(os.path.join(scratch_dir, "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        entry_dir = self._entry_dir(kind, source_file)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(scratch_dir, entry_dir)
+
+    def load_or_build(self, kind, source_file, build):
+        """memory-mapped columns for source_file, calling build(source_file) and storing its result on a miss"""
+        entry_dir, meta = self._lookup(kind, source_file)
+        if entry_dir is not None:
+            self.hits += 1
+            instrumentation.count("cache_hits")
+            return self._load_columns(entry_dir, meta)
+        self.misses += 1
+        instrumentation.count("cache_misses")
+        columns = build(source_file)
+        # on a content change _lookup already hashed the file
+        self.store(kind, source_file, columns, content_hash=meta)
+        return self._load_columns(self._entry_dir(kind, source_file), {"columns": list(columns)})
@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+import numpy as np
+
+AVERAGES = ["macro", "micro", "weighted"]
+
+
+def tier_labels(index_mapping):
+    """labels ordered by node index; for shared indices the last key wins (e.g. LP before P)"""
+    reverse_mapping = {v: k for k, v in index_mapping.items()}
+    return [reverse_mapping[index] for index in sorted(reverse_mapping)]
+
+
+def aggregate_comparison_dict(comparison_dict, index_mapping):
+    # Create a reverse mapping dictionary
+    reverse_mapping = {v: k for k, v in index_mapping.items()}
+
+    # Sum the counts of pairs that collapse onto the same merged names, keeping first-seen order
+    aggregated = defaultdict(int)
+    for key, value in comparison_dict.items():
+        clingen_name = reverse_mapping[index_mapping[key[0]]]
+        predicted_name = reverse_mapping[index_mapping[key[1]]]
+        aggregated[(clingen_name, predicted_name)] += value
+    return aggregated
+
+
+def build_confusion_matrix(comparison_dict, index_mapping):
+    """rows are ClinGen tiers, columns are predicted tiers, both in tier_labels order"""
+    positions = {
+        index: position
+        for position, index in enumerate(sorted(set(index_mapping.values())))
+    }
+    matrix = np.zeros((len(positions), len(positions)), dtype=np.int64)
+    if comparison_dict:
+        keys = list(comparison_dict)
+        rows = np.fromiter(
+            (positions[index_mapping[key[0]]] for key in keys), dtype=np.intp, count=len(keys)
+        )
+        cols = np.fromiter(
+            (positions[index_mapping[key[1]]] for key in keys), dtype=np.intp, count=len(keys)
+        )
+        counts = np.fromiter(
+            (comparison_dict[key] for key in keys), dtype=np.int64, count=len(keys)
+        )
+        np.add.at(matrix, (rows, cols), counts)
+    return matrix, tier_labels(index_mapping)
+
+
+def _safe_divide(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _f1(precision, recall, decimals):
+    if decimals is not None:
+        precision = np.round(precision, decimals)
+        recall = np.round(recall, decimals)
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+    if decimals is not None:
+        f1 = np.round(f1, decimals)
+    return f1, precision, recall
+
+
+def confusion_matrix_metrics(matrix, decimals=None):
+    """
+    per-tier tp/fp/fn, precision, recall and F1 for a (..., tiers, tiers) count matrix,
+    plus macro/micro/weighted averages; leading axes (e.g. bootstrap replicates) are kept.
+    decimals rounds precision and recall before deriving F1, as the TSV reports always did.
+    """
+    matrix = np.asarray(matrix)
+    true_positives = np.diagonal(matrix, axis1=-2, axis2=-1)
+    false_positives = matrix.sum(axis=-2) - true_positives
+    false_negatives = matrix.sum(axis=-1) - true_positives
+    support = true_positives + false_negatives
+
+    f1, precision, recall = _f1(
+        _safe_divide(true_positives, true_positives + false_positives),
+        _safe_divide(true_positives, support),
+        decimals,
+    )
+
+    micro_tp = true_positives.sum(axis=-1)
+    micro_f1, micro_precision, micro_recall = _f1(
+        _safe_divide(micro_tp, micro_tp + false_positives.sum(axis=-1)),
+        _safe_divide(micro_tp, micro_tp + false_negatives.sum(axis=-1)),
+        decimals,
+    )
+    weights = _safe_divide(support, support.sum(axis=-1, keepdims=True))
+
+    averages = {
+        "macro": (f1.mean(axis=-1), precision.mean(axis=-1), recall.mean(axis=-1)),
+        "micro": (micro_f1, micro_precision, micro_recall),
+        "weighted": (
+            (f1 * weights).sum(axis=-1),
+            (precision * weights).sum(axis=-1),
+            (recall * weights).sum(axis=-1),
+        ),
+    }
+    if decimals is not None:
+        averages = {
+            name: tuple(np.round(value, decimals) for value in values)
+            for name, values in averages.items()
+        }
+
+    return {
+        "tp": true_positives,
+        "fp": false_positives,
+        "fn": false_negatives,
+        "support": support,
+        "f1": f1,
+        "precision": precision,
+        "recall": recall,
+        "averages": averages,
+    }
+
+
+def build_tier_confusion_matrix(comparison_dict, tiers):
+    """
+    matrix over tiers for an already aggregated comparison dict (e.g. read back from a comparison TSV);
+    unexpected labels are appended in sorted order, so they still count as false positives / negatives of the tiers
+    """
+    labels = list(tiers) + sorted(
+        {label for key in comparison_dict for label in key} - set(tiers)
+    )
+    return build_confusion_matrix(comparison_dict, {label: index for index, label in enumerate(labels)})
+
+
+def statistics_rows(matrix, labels, tiers=None, decimals=3):
+    """(label, F1, precision, recall) per tier, restricted to tiers when given, followed by the AVERAGES rows"""
+    metrics = confusion_matrix_metrics(matrix, decimals=decimals)
+    rows = [
+        (label, float(f1), float(precision), float(recall))
+        for label, f1, precision, recall in zip(labels, metrics["f1"], metrics["precision"], metrics["recall"])
+    ]
+    if tiers is not None:
+        rows_by_label = {row[0]: row for row in rows}
+        rows = [rows_by_label[tier] for tier in tiers]
+    for average in AVERAGES:
+        rows.append((average,) + tuple(float(value) for value in metrics["averages"][average]))
+    return rows
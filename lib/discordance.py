@@ -0,0 +1,225 @@
+import csv
+import gzip
+import os
+
+import numpy as np
+
+from lib.evidence_codes import EVIDENCE_CODE_BITS, decode_evidence_codes
+
+# one row per compared variant; the masks are EVIDENCE_CODE_LIST bitmasks as counted by EvidenceCodeCounter
+DISCORDANCE_COLUMNS = ["identifier", "gene", "truth", "label", "predicted", "predicted_mask", "met_mask", "unmet_mask"]
+_STRING_COLUMNS = DISCORDANCE_COLUMNS[:5]
+_MASK_COLUMNS = DISCORDANCE_COLUMNS[5:]
+
+DISCORDANCE_FORMATS = {
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".tsv": "tsv",
+    ".tsv.gz": "tsv",
+}
+
+
+def _pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def discordance_format(path):
+    for extension, file_format in sorted(DISCORDANCE_FORMATS.items(), key=lambda item: -len(item[0])):
+        if str(path).endswith(extension):
+            return file_format
+    raise ValueError(f"unknown discordance file type {path!r}, expected one of {list(DISCORDANCE_FORMATS)}")
+
+
+def discordance_file(output_dir, name):
+    """{name}_variants.parquet in output_dir, or .tsv.gz when pyarrow is not installed"""
+    return os.path.join(output_dir, f"{name}_variants{'.parquet' if _pyarrow_available() else '.tsv.gz'}")
+
+
+class DiscordanceWriter:
+    """
+    per-variant outcome sink of a comparison: identifier, gene, ClinGen tier, the platform label as reported,
+    the predicted tier and the predicted/met/unmet evidence masks, written in batches of batch_size rows
+    (Parquet row groups or Feather record batches with pyarrow, gzipped TSV otherwise).
+    the file is opened on the first flush, so an unused writer can be handed to a worker process; gene_index is
+    left out when it is pickled, and run_platform_comparisons re-attaches the one it shares with its workers.
+    gene_index ({identifier: gene symbol}) fills the gene column; label_mapping, when given, sets the predicted
+    tier from the reported label, for comparisons run with raw_labels
+    """
+
+    def __init__(self, path, gene_index=None, label_mapping=None, batch_size=1 << 16):
+        self.path = str(path)
+        self.format = discordance_format(self.path)
+        self.gene_index = gene_index or {}
+        self.label_mapping = label_mapping
+        self.batch_size = batch_size
+        self.rows = 0
+        self._batch = {column: [] for column in DISCORDANCE_COLUMNS}
+        self._handle = None
+        self._writer = None
+
+    def add(self, identifier, truth, label, predicted, predicted_mask, met_mask, unmet_mask):
+        batch = self._batch
+        batch["identifier"].append(identifier)
+        batch["gene"].append(self.gene_index.get(identifier, ""))
+        batch["truth"].append(truth)
+        batch["label"].append(label)
+        batch["predicted"].append(predicted if self.label_mapping is None else self.label_mapping[label])
+        batch["predicted_mask"].append(predicted_mask)
+        batch["met_mask"].append(met_mask)
+        batch["unmet_mask"].append(unmet_mask)
+        if len(batch["identifier"]) >= self.batch_size:
+            self.flush()
+
+    def add_columns(self, identifiers, truth, labels, predicted, predicted_masks, met_masks, unmet_masks):
+        """add for whole arrays, as the cached comparisons hold them"""
+        for row in zip(
+                identifiers.tolist(), truth.tolist(), labels.tolist(), predicted,
+                predicted_masks.tolist(), met_masks.tolist(), unmet_masks.tolist(),
+        ):
+            self.add(*row)
+
+    def flush(self):
+        batch = self._batch
+        if not batch["identifier"] and self._writer is not None:
+            return
+        self.rows += len(batch["identifier"])
+        if self.format == "tsv":
+            self._write_tsv(batch)
+        else:
+            self._write_arrow(batch)
+        self._batch = {column: [] for column in DISCORDANCE_COLUMNS}
+
+    def _write_tsv(self, batch):
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.path.endswith(".gz"):
+                self._handle = gzip.open(self.path, "wt", compresslevel=3, newline="")
+            else:
+                self._handle = open(self.path, "w", newline="")
+            self._writer = csv.writer(self._handle, delimiter="\t", lineterminator="\n")
+            self._writer.writerow(DISCORDANCE_COLUMNS)
+        self._writer.writerows(zip(*(batch[column] for column in DISCORDANCE_COLUMNS)))
+
+    def _write_arrow(self, batch):
+        import pyarrow as pa
+
+        table = pa.table(
+            {column: pa.array(batch[column], type=pa.string()) for column in _STRING_COLUMNS}
+            | {column: pa.array(batch[column], type=pa.uint32()) for column in _MASK_COLUMNS}
+        )
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._handle = pa.OSFile(self.path, "wb")
+                self._writer = pa.ipc.new_file(self._handle, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """writes the remaining rows (the header alone for an empty comparison) and closes the file"""
+        self.flush()
+        if self.format != "tsv":
+            self._writer.close()
+        if self._handle is not None:
+            self._handle.close()
+        self._handle = self._writer = None
+
+    def __getstate__(self):
+        if self._writer is not None:
+            raise TypeError("an open DiscordanceWriter cannot be pickled")
+        state = dict(self.__dict__)
+        state["gene_index"] = None
+        return state
+
+
+def _as_list(values):
+    return [values] if isinstance(values, str) else list(values)
+
+
+def read_discordance(path, columns=None, filters=None):
+    """
+    the rows of a discordance file as a DataFrame; filters ({column: value or list of values}) are pushed
+    down to the Parquet reader, which then skips row groups without a match, and applied after reading otherwise
+    """
+    import pandas as pd
+
+    filters = {column: _as_list(values) for column, values in (filters or {}).items() if values is not None}
+    file_format = discordance_format(path)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(
+            path, columns=columns, filters=[(column, "in", values) for column, values in filters.items()] or None
+        ).to_pandas()
+    if file_format == "feather":
+        chunks = [pd.read_feather(path)]
+    else:
+        # filtered chunk by chunk, so only the matching rows of a large file are held
+        chunks = pd.read_csv(
+            path,
+            sep="\t",
+            dtype={column: str for column in _STRING_COLUMNS} | {column: np.uint32 for column in _MASK_COLUMNS},
+            keep_default_na=False,
+            quoting=csv.QUOTE_NONE,
+            chunksize=1 << 18,
+        )
+    frames = []
+    for frame in chunks:
+        for column, values in filters.items():
+            frame = frame[frame[column].isin(values)]
+        frames.append(frame if columns is None else frame[columns])
+    if not frames:
+        return pd.DataFrame(columns=columns or DISCORDANCE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def query_discordance(
+        path,
+        truth=None,
+        predicted=None,
+        gene=None,
+        evidence_code=None,
+        evidence="predicted",
+        discordant_only=True,
+):
+    """
+    variants of a discordance file by transition (truth -> predicted tier), gene and evidence code, e.g.
+    query_discordance("competitor_variants.parquet", truth="B", predicted="LP") lists the benign variants the
+    competitor called likely pathogenic. truth, predicted and gene take one value or a list; evidence_code keeps
+    variants with the code set in the evidence mask ("predicted", "met" or "unmet").
+    discordant_only drops variants whose predicted tier equals the ClinGen one
+    """
+    frame = read_discordance(path, filters={"truth": truth, "predicted": predicted, "gene": gene})
+    if discordant_only:
+        frame = frame[frame["truth"] != frame["predicted"]]
+    if evidence_code is not None:
+        bits = 0
+        for code in _as_list(evidence_code):
+            bits |= EVIDENCE_CODE_BITS[code]
+        frame = frame[(frame[f"{evidence}_mask"].to_numpy(dtype=np.int64) & bits) != 0]
+    return frame.reset_index(drop=True)
+
+
+def with_evidence_codes(frame):
+    """frame with the evidence masks also spelled out as comma separated code names"""
+    return frame.assign(
+        **{
+            column.replace("_mask", "_codes"): [",".join(decode_evidence_codes(mask)) for mask in frame[column]]
+            for column in _MASK_COLUMNS
+        }
+    )
+
+
+def transition_counts(path):
+    """(truth, predicted) -> variants, the pathogenicity dict of the comparison that wrote path"""
+    frame = read_discordance(path, columns=["truth", "predicted"])
+    return {key: int(count) for key, count in frame.value_counts(["truth", "predicted"], sort=False).items()}
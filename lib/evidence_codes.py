@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+import numpy as np
+
+from lib.unchangable_variables import EVIDENCE_CODE_LIST
+
+EVIDENCE_CODE_BITS = {ec: 1 << index for index, ec in enumerate(EVIDENCE_CODE_LIST)}
+OUTCOMES = ["tp", "fp", "tn", "fn"]
+
+
+def strip_strength(evidence_code):
+    # "PM2_Supporting" -> "PM2"
+    return evidence_code.split("_")[0]
+
+
+def strip_modifiers(evidence_code):
+    # "PP3++" -> "PP3"
+    return evidence_code.replace("+", "").replace("-", "")
+
+
+class EvidenceCodeEncoder:
+    """turns a code list into a bitmask over codes; normalization is done once per distinct raw code"""
+
+    __slots__ = ("_normalize", "_exclude", "_code_bits", "_bits", "codes")
+
+    def __init__(self, normalize=None, exclude=(), codes=EVIDENCE_CODE_LIST):
+        self._normalize = normalize
+        self._exclude = frozenset(exclude)
+        self._code_bits = {ec: 1 << index for index, ec in enumerate(codes)}
+        self._bits = {}
+        self.codes = list(codes)
+
+    def _bit(self, evidence_code):
+        if evidence_code in self._exclude:
+            return 0
+        if self._normalize is not None:
+            evidence_code = self._normalize(evidence_code)
+        return self._code_bits.get(evidence_code, 0)
+
+    def __call__(self, evidence_codes):
+        bits = self._bits
+        mask = 0
+        for ec in evidence_codes:
+            bit = bits.get(ec)
+            if bit is None:
+                bit = bits[ec] = self._bit(ec)
+            mask |= bit
+        return mask
+
+    def code_bits(self, raw_codes):
+        """bit of every raw code of a vocabulary, for scoring_kernels.code_id_masks"""
+        bits = self._bits
+        for ec in raw_codes:
+            if ec not in bits:
+                bits[ec] = self._bit(ec)
+        return np.array([bits[ec] for ec in raw_codes], dtype=np.int64)
+
+    def decode(self, mask):
+        return [ec for ec, bit in self._code_bits.items() if mask & bit]
+
+
+encode_evidence_codes = EvidenceCodeEncoder()
+encode_clingen_evidence_codes = EvidenceCodeEncoder(strip_strength)
+encode_competitor_evidence_codes = EvidenceCodeEncoder(strip_strength)
+encode_seq_evidence_codes = EvidenceCodeEncoder(strip_modifiers, exclude=("BA1-",))
+
+
+def decode_evidence_codes(mask):
+    return encode_evidence_codes.decode(mask)
+
+
+def evidence_code_outcomes(predicted_mask, met_mask, unmet_mask):
+    """
+    tp/fp/tn/fn bitmasks for one variant (or elementwise for integer arrays);
+    a code listed as both met and unmet counts as met
+    """
+    unmet_only = unmet_mask & ~met_mask
+    return (
+        predicted_mask & met_mask,
+        predicted_mask & unmet_only,
+        ~predicted_mask & unmet_only,
+        ~predicted_mask & met_mask,
+    )
+
+
+class EvidenceCodeCounter:
+    """
+    TP/FP/TN/FN per evidence code; variants are tallied by their (predicted, met, unmet) masks
+    and only the distinct mask triples are expanded into the NumPy counts table.
+    whole columns are counted by the scoring kernels straight into code_counts
+    """
+
+    def __init__(self, codes=EVIDENCE_CODE_LIST):
+        self.codes = list(codes)
+        self.mask_counts = defaultdict(int)
+        self.code_counts = np.zeros((len(self.codes), len(OUTCOMES)), dtype=np.int64)
+
+    def add(self, predicted_mask, met_mask, unmet_mask, count=1):
+        self.mask_counts[(predicted_mask, met_mask, unmet_mask)] += count
+
+    def add_arrays(self, predicted_masks, met_masks, unmet_masks):
+        """tallies whole columns of masks at once"""
+        # the kernels build on evidence_code_outcomes, so they are imported here rather than at module level
+        from lib.scoring_kernels import evidence_code_counts
+
+        self.add_counts(evidence_code_counts(predicted_masks, met_masks, unmet_masks, len(self.codes)))
+
+    def add_counts(self, counts):
+        """adds a (codes, OUTCOMES) table, as scoring_kernels.score_arrays returns it"""
+        self.code_counts += counts
+
+    def update(self, other):
+        for masks, count in other.mask_counts.items():
+            self.mask_counts[masks] += count
+        self.code_counts += other.code_counts
+        return self
+
+    def counts(self):
+        """(codes, OUTCOMES) int64 array"""
+        if not self.mask_counts:
+            return self.code_counts.copy()
+        masks = np.array(list(self.mask_counts), dtype=np.int64)
+        weights = np.fromiter(self.mask_counts.values(), dtype=np.int64, count=len(self.mask_counts))
+        outcome_masks = np.stack(evidence_code_outcomes(masks[:, 0], masks[:, 1], masks[:, 2]), axis=1)
+        code_bits = (outcome_masks[:, :, None] >> np.arange(len(self.codes))) & 1
+        return self.code_counts + np.einsum("v,voc->co", weights, code_bits)
+
+    def to_dict(self):
+        return {
+            ec: dict(zip(OUTCOMES, map(int, row)))
+            for ec, row in zip(self.codes, self.counts())
+        }
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from lib import instrumentation
+
+FIGURE_FORMATS = ["pdf", "png", "svg", "html"]
+
+
+def _write_figure(fig, path, figure_format, width, height):
+    if figure_format == "html":
+        fig.write_html(path, include_plotlyjs="cdn")
+    else:
+        fig.write_image(path, format=figure_format, width=width, height=height)
+
+
+def _write_figure_json(fig_json, path, figure_format, width, height):
+    # render pool side; every worker keeps its own Kaleido process for all the figures it gets
+    _write_figure(pio.from_json(fig_json), path, figure_format, width, height)
+    return path
+
+
+class FigureRenderer:
+    """
+    collects figures and exports them in one pass, in every format of formats, through the one Kaleido
+    process plotly keeps per interpreter (or a pool of them with processes > 1). a figure whose data,
+    size and format match the previous export recorded in the manifest and whose file still exists is skipped
+    """
+
+    def __init__(self, output_dir, formats=("pdf",), width=1280, height=720, processes=1,
+                 manifest_file=".figure_manifest.json"):
+        unknown = set(formats) - set(FIGURE_FORMATS)
+        if unknown:
+            raise ValueError(f"unknown figure formats {sorted(unknown)}, expected some of {FIGURE_FORMATS}")
+        self.output_dir = output_dir
+        self.formats = list(formats)
+        self.width = width
+        self.height = height
+        self.processes = processes
+        self.manifest_file = os.path.join(output_dir, manifest_file)
+        self.figures = {}
+
+    def add(self, name, fig):
+        """name is the output file name without extension"""
+        self.figures[name] = fig
+
+    def warm_up(self):
+        """starts the Kaleido process now, e.g. while the comparisons run, instead of on the first export"""
+        if self.processes == 1 and set(self.formats) - {"html"}:
+            with instrumentation.stage("kaleido start"):
+                pio.to_image(go.Figure(), format="svg", width=10, height=10)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_file) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def render(self):
+        """exports every added figure; returns {file name: "rendered" or "unchanged"}"""
+        manifest = self._read_manifest()
+        pending = []
+        status = {}
+        for name, fig in self.figures.items():
+            fig_json = fig.to_json()
+            for figure_format in self.formats:
+                filename = f"{name}.{figure_format}"
+                digest = hashlib.blake2b(
+                    f"{fig_json}{figure_format}{self.width}x{self.height}".encode("utf-8"), digest_size=16
+                ).hexdigest()
+                path = os.path.join(self.output_dir, filename)
+                if manifest.get(filename) == digest and os.path.exists(path):
+                    status[filename] = "unchanged"
+                    instrumentation.count("figures_unchanged")
+                    continue
+                pending.append((fig, fig_json, path, figure_format))
+                manifest[filename] = digest
+                status[filename] = "rendered"
+
+        instrumentation.count("figures_rendered", len(pending))
+        if self.processes == 1 or len(pending) <= 1:
+            for fig, _, path, figure_format in pending:
+                with instrumentation.stage(f"write {figure_format}"):
+                    _write_figure(fig, path, figure_format, self.width, self.height)
+        else:
+            context = None
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            jobs = [
+                (fig_json, path, figure_format, self.width, self.height)
+                for _, fig_json, path, figure_format in pending
+            ]
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(jobs)), mp_context=context) as executor:
+                list(executor.map(_write_figure_json, *zip(*jobs)))
+
+        with open(self.manifest_file, "w") as fh:
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+        return status
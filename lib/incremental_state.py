@@ -0,0 +1,156 @@
+import hashlib
+import os
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from lib import instrumentation
+from lib.evidence_codes import EvidenceCodeCounter
+
+# identifier, truth tier ("" when the row was skipped or not in the truthset), raw predicted label,
+# predicted / met / unmet evidence masks, double-counting mask
+OUTCOME_COLUMNS = [
+    "identifier",
+    "truth",
+    "predicted",
+    "predicted_mask",
+    "met_mask",
+    "unmet_mask",
+    "double_counting_mask",
+]
+
+
+def content_hash(data):
+    """persistent 64-bit hash of a line or row (bytes or str)"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class IncrementalState:
+    """
+    per-variant outcomes of the previous run keyed by content hash, plus the raw counters they add up to.
+    update() re-scores only rows whose hash is new and moves the counters by the difference,
+    so the counters always equal a full recompute over the current input
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.pair_counts = Counter()
+        self.evidence_code_counter = EvidenceCodeCounter()
+        self.double_counting_counts = Counter()
+        self.unmatched = 0
+        self.reused = 0
+        self.scored = 0
+        self.changed = True
+
+    def _apply(self, outcome, delta):
+        identifier, truth, predicted, predicted_mask, met_mask, unmet_mask, double_counting_mask = outcome
+        if truth == "":
+            self.unmatched += delta
+            return
+        self.pair_counts[(truth, predicted)] += delta
+        self.evidence_code_counter.add(predicted_mask, met_mask, unmet_mask, count=delta)
+        self.double_counting_counts[double_counting_mask] += delta
+
+    def update(self, keyed_rows, score_row):
+        """
+        keyed_rows yields (content hash, payload); score_row(payload) returns an OUTCOME_COLUMNS tuple
+        and is only called for hashes the previous run did not see. changed is False afterwards when the input
+        held exactly the rows of the previous run, so the state need not be saved again
+        """
+        previous_rows = self.rows
+        rows = {}
+        self.reused = self.scored = 0
+        for row_hash, payload in keyed_rows:
+            known = rows.get(row_hash)
+            if known is not None:
+                known[1] += 1
+                continue
+            previous = previous_rows.get(row_hash)
+            if previous is not None:
+                outcome = previous[0]
+                self.reused += 1
+            else:
+                outcome = score_row(payload)
+                self.scored += 1
+            rows[row_hash] = [outcome, 1]
+
+        self.changed = False
+        for row_hash, (outcome, count) in rows.items():
+            previous = previous_rows.get(row_hash)
+            previous_count = 0 if previous is None else previous[1]
+            if count != previous_count:
+                self._apply(outcome, count - previous_count)
+                self.changed = True
+        if self.reused != len(previous_rows):
+            # some rows of the previous run are gone
+            for row_hash, (outcome, previous_count) in previous_rows.items():
+                if row_hash not in rows:
+                    self._apply(outcome, -previous_count)
+                    self.changed = True
+        self.rows = rows
+        instrumentation.count("incremental_reused", self.reused)
+        instrumentation.count("incremental_scored", self.scored)
+        self.pair_counts = +self.pair_counts
+        self.double_counting_counts = +self.double_counting_counts
+        self.evidence_code_counter.mask_counts = defaultdict(
+            int, {masks: count for masks, count in self.evidence_code_counter.mask_counts.items() if count}
+        )
+        return self
+
+    def save(self, state_file):
+        outcomes = [outcome for outcome, _ in self.rows.values()]
+        columns = {
+            "hash": np.fromiter(self.rows, dtype=np.uint64, count=len(self.rows)),
+            "count": np.fromiter((count for _, count in self.rows.values()), dtype=np.int64, count=len(self.rows)),
+        }
+        for position, column in enumerate(OUTCOME_COLUMNS):
+            values = [outcome[position] for outcome in outcomes]
+            dtype = str if position < 3 else np.uint32
+            columns[column] = np.array(values, dtype=dtype)
+        columns["pair_truth"] = np.array([truth for truth, _ in self.pair_counts], dtype=str)
+        columns["pair_predicted"] = np.array([predicted for _, predicted in self.pair_counts], dtype=str)
+        columns["pair_count"] = np.array(list(self.pair_counts.values()), dtype=np.int64)
+        columns["mask_triples"] = np.array(
+            list(self.evidence_code_counter.mask_counts), dtype=np.int64
+        ).reshape(-1, 3)
+        columns["mask_count"] = np.array(list(self.evidence_code_counter.mask_counts.values()), dtype=np.int64)
+        columns["double_counting_key"] = np.array(list(self.double_counting_counts), dtype=np.int64)
+        columns["double_counting_count"] = np.array(list(self.double_counting_counts.values()), dtype=np.int64)
+        columns["unmatched"] = np.array([self.unmatched], dtype=np.int64)
+
+        os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+        scratch_file = f"{state_file}.tmp.npz"
+        np.savez(scratch_file, **columns)
+        os.replace(scratch_file, state_file)
+
+    @classmethod
+    def load(cls, state_file):
+        """empty state when state_file does not exist yet"""
+        state = cls()
+        if not os.path.exists(state_file):
+            return state
+        with np.load(state_file, allow_pickle=False) as columns:
+            outcome_columns = [columns[column].tolist() for column in OUTCOME_COLUMNS]
+            state.rows = {
+                row_hash: [outcome, count]
+                for row_hash, count, outcome in zip(
+                    columns["hash"].tolist(), columns["count"].tolist(), zip(*outcome_columns)
+                )
+            }
+            state.pair_counts = Counter(
+                dict(
+                    zip(
+                        zip(columns["pair_truth"].tolist(), columns["pair_predicted"].tolist()),
+                        columns["pair_count"].tolist(),
+                    )
+                )
+            )
+            for masks, count in zip(columns["mask_triples"].tolist(), columns["mask_count"].tolist()):
+                state.evidence_code_counter.add(*masks, count=count)
+            state.double_counting_counts = Counter(
+                dict(zip(columns["double_counting_key"].tolist(), columns["double_counting_count"].tolist()))
+            )
+            state.unmatched = int(columns["unmatched"][0])
+        return state
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import resource
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+# the active Collector; None means instrumentation is off and every hook below returns after one check
+_collector = None
+
+_NULL_STAGE = nullcontext()
+
+PROFILERS = ["cprofile", "tracemalloc"]
+
+_METRIC_PREFIX = "pathogenicity_benchmark"
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """peak resident set size of this process (or its children, with RUSAGE_CHILDREN) in MiB"""
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _new_stage_record():
+    return {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_mb": 0.0, "counters": Counter()}
+
+
+class Collector:
+    """
+    per-stage wall and CPU time, peak RSS and counters (rows, bytes read and decompressed, cache hits ...).
+    stages nest: a stage opened inside "platform comparisons" is recorded as "platform comparisons/<name>".
+    profile_stage names one stage (its own name or full path) to run under cProfile or tracemalloc;
+    the profile is written to profile_dir
+    """
+
+    def __init__(self, profile_stage=None, profiler="cprofile", profile_dir="."):
+        if profiler not in PROFILERS:
+            raise ValueError(f"unknown profiler {profiler!r}, expected one of {PROFILERS}")
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self._stack = []
+
+    def config(self):
+        """keyword arguments of enable() that give a worker process the same settings"""
+        return {"profile_stage": self.profile_stage, "profiler": self.profiler, "profile_dir": self.profile_dir}
+
+    def path(self, name=None):
+        return "/".join(self._stack + ([name] if name else []))
+
+    def record(self, path):
+        record = self.stages.get(path)
+        if record is None:
+            record = self.stages[path] = _new_stage_record()
+        return record
+
+    def count(self, name, value=1):
+        self.record(self.path())["counters"][name] += value
+
+    def merge(self, report, prefix=None):
+        """adds the stages of another Collector's report (e.g. from a worker process) under prefix"""
+        prefix = self.path() if prefix is None else prefix
+        for path, stage_report in report["stages"].items():
+            record = self.record("/".join(part for part in (prefix, path) if part))
+            record["calls"] += stage_report["calls"]
+            record["wall_seconds"] += stage_report["wall_seconds"]
+            record["cpu_seconds"] += stage_report["cpu_seconds"]
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], stage_report["peak_rss_mb"])
+            record["counters"].update(stage_report["counters"])
+
+    def report(self):
+        return {
+            "stages": {
+                path: dict(record, counters=dict(record["counters"])) for path, record in self.stages.items()
+            },
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        }
+
+
+class _Stage:
+    __slots__ = ("collector", "name", "path", "wall", "cpu", "profile")
+
+    def __init__(self, collector, name):
+        self.collector = collector
+        self.name = name
+
+    def __enter__(self):
+        collector = self.collector
+        self.path = collector.path(self.name)
+        collector._stack.append(self.name)
+        self.profile = None
+        if collector.profile_stage in (self.name, self.path):
+            self.profile = _start_profile(collector.profiler)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        collector = self.collector
+        collector._stack.pop()
+        record = collector.record(self.path)
+        record["calls"] += 1
+        record["wall_seconds"] += wall
+        record["cpu_seconds"] += cpu
+        record["peak_rss_mb"] = max(record["peak_rss_mb"], peak_rss_mb())
+        if self.profile is not None:
+            _stop_profile(collector, self.path, self.profile, record)
+        return False
+
+
+def _start_profile(profiler):
+    if profiler == "cprofile":
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    import tracemalloc
+
+    # a tracemalloc session started outside the stage is left running
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(25)
+    tracemalloc.reset_peak()
+    return started
+
+
+def _profile_file(collector, path, extension):
+    os.makedirs(collector.profile_dir, exist_ok=True)
+    return os.path.join(collector.profile_dir, re.sub(r"[^\w.-]+", "_", path) + extension)
+
+
+def _stop_profile(collector, path, profile, record):
+    if collector.profiler == "cprofile":
+        profile.disable()
+        profile.dump_stats(_profile_file(collector, path, ".prof"))
+        return
+    import tracemalloc
+
+    snapshot = tracemalloc.take_snapshot()
+    record["counters"]["tracemalloc_peak_bytes"] += tracemalloc.get_traced_memory()[1]
+    if profile:
+        tracemalloc.stop()
+    with open(_profile_file(collector, path, ".tracemalloc.txt"), "w") as fh:
+        for statistic in snapshot.statistics("lineno")[:50]:
+            fh.write(f"{statistic}\n")
+
+
+def enable(profile_stage=None, profiler="cprofile", profile_dir="."):
+    """starts a new Collector and returns it"""
+    global _collector
+    _collector = Collector(profile_stage, profiler, profile_dir)
+    return _collector
+
+
+def disable():
+    """stops collecting and returns the Collector that was active, if any"""
+    global _collector
+    collector, _collector = _collector, None
+    return collector
+
+
+def enabled():
+    return _collector is not None
+
+
+def stage(name):
+    """context manager timing name as a stage; a shared no-op when instrumentation is off"""
+    if _collector is None:
+        return _NULL_STAGE
+    return _Stage(_collector, name)
+
+
+def count(name, value=1):
+    """adds value to the counter name of the innermost open stage"""
+    if _collector is not None:
+        _collector.count(name, value)
+
+
+def timed_calls(name, function):
+    """
+    function, wrapped to add each call's wall time to the pseudo-stage name under the open stage when
+    instrumentation is on; for hot per-record callables such as JSON decoders, so wrap once per file, not per call
+    """
+    collector = _collector
+    if collector is None:
+        return function
+    path = collector.path(name)
+    record = collector.record(path)
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record["wall_seconds"] += perf_counter() - start
+            record["calls"] += 1
+
+    return wrapper
+
+
+def timed_iter(name, iterable):
+    """iterable, with the time spent producing each item (reading and decompressing lines) added to name"""
+    collector = _collector
+    if collector is None:
+        return iterable
+    record = collector.record(collector.path(name))
+    return _timed_iter(record, iter(iterable))
+
+
+def _timed_iter(record, iterator):
+    perf_counter = time.perf_counter
+    while True:
+        start = perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record["wall_seconds"] += perf_counter() - start
+            return
+        record["wall_seconds"] += perf_counter() - start
+        record["calls"] += 1
+        yield item
+
+
+def record_file(file, handle=None):
+    """
+    counts a finished read of file: bytes_read is its size on disk, bytes_decompressed the uncompressed offset
+    the handle reached, for handles that can tell it (gzip and isal readers, not pigz pipes)
+    """
+    if _collector is None:
+        return
+    _collector.count("files")
+    try:
+        _collector.count("bytes_read", os.path.getsize(file))
+    except OSError:
+        pass
+    if handle is None or not str(file).endswith((".gz", ".bgz")):
+        return
+    try:
+        _collector.count("bytes_decompressed", getattr(handle, "buffer", handle).tell())
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
+def worker_config():
+    """settings for a worker process's enable(), None when instrumentation is off"""
+    return None if _collector is None else _collector.config()
+
+
+def merge(report, prefix=None):
+    if _collector is not None and report is not None:
+        _collector.merge(report, prefix)
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_openmetrics(report):
+    """the report as OpenMetrics text: one gauge family per stage measure and one counter family of stage counters"""
+    lines = []
+    stages = report["stages"]
+    for measure in ("wall_seconds", "cpu_seconds", "peak_rss_mb"):
+        family = f"{_METRIC_PREFIX}_stage_{measure}"
+        lines.append(f"# TYPE {family} gauge")
+        if measure.endswith("_seconds"):
+            lines.append(f"# UNIT {family} seconds")
+        for path, record in stages.items():
+            lines.append(f'{family}{{stage="{_escape_label(path)}"}} {record[measure]}')
+    family = f"{_METRIC_PREFIX}_stage_calls"
+    lines.append(f"# TYPE {family} counter")
+    for path, record in stages.items():
+        lines.append(f'{family}_total{{stage="{_escape_label(path)}"}} {record["calls"]}')
+    family = f"{_METRIC_PREFIX}_stage_events"
+    lines.append(f"# TYPE {family} counter")
+    for path, record in stages.items():
+        for name, value in sorted(record["counters"].items()):
+            lines.append(f'{family}_total{{stage="{_escape_label(path)}",event="{_escape_label(name)}"}} {value}')
+    for key in ("peak_rss_mb", "children_peak_rss_mb"):
+        family = f"{_METRIC_PREFIX}_{key}"
+        lines.append(f"# TYPE {family} gauge")
+        lines.append(f"{family} {report[key]}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report_file, report=None):
+    """writes the active Collector's report (or report) as OpenMetrics text for .prom/.om/.txt files, JSON otherwise"""
+    if report is None:
+        report = _collector.report()
+    with open(report_file, "w") as fh:
+        if report_file.endswith((".prom", ".om", ".txt")):
+            fh.write(to_openmetrics(report))
+        else:
+            json.dump(report, fh, indent=1)
+    return report
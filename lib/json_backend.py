@@ -0,0 +1,54 @@
+import json
+from functools import lru_cache
+
+JSON_BACKENDS = ["orjson", "msgspec", "simdjson", "json"]
+
+
+def _orjson_decoder(schema):
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec_decoder(schema):
+    import msgspec
+
+    # with a schema only the declared fields are materialized, everything else is skipped while parsing
+    return msgspec.json.Decoder(schema).decode if schema is not None else msgspec.json.decode
+
+
+def _simdjson_decoder(schema):
+    import simdjson
+
+    return simdjson.loads
+
+
+def _json_decoder(schema):
+    return json.loads
+
+
+_DECODER_FACTORIES = {
+    "orjson": _orjson_decoder,
+    "msgspec": _msgspec_decoder,
+    "simdjson": _simdjson_decoder,
+    "json": _json_decoder,
+}
+
+
+@lru_cache(maxsize=None)
+def get_json_decoder(backend="auto", schema=None):
+    """
+    returns a loads(bytes or str) callable for backend ("auto", "orjson", "msgspec", "simdjson" or "json");
+    "auto" takes the first installed backend, preferring msgspec when a schema (TypedDict) is given.
+    schema is only honoured by msgspec; the other backends decode the full record
+    """
+    if backend != "auto":
+        return _DECODER_FACTORIES[backend](schema)
+    backends = JSON_BACKENDS
+    if schema is not None:
+        backends = ["msgspec"] + [name for name in JSON_BACKENDS if name != "msgspec"]
+    for name in backends:
+        try:
+            return _DECODER_FACTORIES[name](schema)
+        except ImportError:
+            continue
@@ -0,0 +1,73 @@
+import json
+from collections import namedtuple
+
+# comparison: key of pathogenicity_benchmark.PLATFORM_COMPARISONS; cached / incremental: whether the
+# comparison takes a ParseCache and has an incremental variant
+PlatformFormat = namedtuple("PlatformFormat", ["comparison", "cached", "incremental"])
+
+PLATFORM_FORMATS = {
+    "seq_jsonl": PlatformFormat("seq", True, True),
+    "competitor_tsv": PlatformFormat("competitor", True, True),
+    "vcf_info": PlatformFormat("vcf", False, False),
+}
+
+# one benchmarked platform release; options are passed on to the comparison function
+Platform = namedtuple("Platform", ["name", "label", "format", "annotation_file", "color", "options"])
+
+DEFAULT_COLORS = ["blue", "lightgreen", "salmon", "orange", "purple", "gray", "gold", "teal", "brown", "pink"]
+
+
+def load_platform_config(config_file):
+    """
+    reads a benchmark config:
+    {"truthset": path, "platforms": [{"name", "label", "format", "file", "color", "options"}, ...]}
+    label defaults to name, color to DEFAULT_COLORS in order and options to {}.
+    returns (truthset path, list of Platform)
+    """
+    with open(config_file) as fh:
+        config = json.load(fh)
+
+    platforms = []
+    for position, entry in enumerate(config["platforms"]):
+        if entry["format"] not in PLATFORM_FORMATS:
+            raise ValueError(
+                f"platform {entry['name']!r} has unknown format {entry['format']!r}, "
+                f"expected one of {sorted(PLATFORM_FORMATS)}"
+            )
+        platforms.append(
+            Platform(
+                name=entry["name"],
+                label=entry.get("label", entry["name"]),
+                format=entry["format"],
+                annotation_file=entry["file"],
+                color=entry.get("color", DEFAULT_COLORS[position % len(DEFAULT_COLORS)]),
+                options=entry.get("options", {}),
+            )
+        )
+    names = [platform.name for platform in platforms]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"platform names must be unique, repeated: {duplicates}")
+    return config["truthset"], platforms
+
+
+# one ClinGen release of a multi-release run; platforms (names) restricts the platforms scored against it
+TruthsetRelease = namedtuple("TruthsetRelease", ["name", "file", "platforms"])
+
+
+def load_truthset_releases(config_file):
+    """
+    the "truthset_releases" of a benchmark config, oldest first:
+    [{"release": "2024-02", "file": path, "platforms": [names]}, ...], platforms defaulting to all of them.
+    a config without the section has the one release "current", its "truthset"
+    """
+    with open(config_file) as fh:
+        config = json.load(fh)
+
+    entries = config.get("truthset_releases") or [{"release": "current", "file": config["truthset"]}]
+    releases = [TruthsetRelease(entry["release"], entry["file"], entry.get("platforms")) for entry in entries]
+    names = [release.name for release in releases]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"truthset release names must be unique, repeated: {duplicates}")
+    return releases
@@ -0,0 +1,180 @@
+from functools import lru_cache
+
+import numpy as np
+
+from lib.evidence_codes import OUTCOMES, evidence_code_outcomes
+from lib.unchangable_variables import EVIDENCE_CODE_LIST
+
+KERNEL_BACKENDS = ["numba", "numpy"]
+
+# rows expanded at a time by the NumPy evidence count; bounds its scratch memory to 32 bytes a row
+_CHUNK_ROWS = 1 << 20
+
+
+def _code_masks_loop(offsets, code_ids, code_bits, masks):
+    for row in range(len(masks)):
+        mask = 0
+        for position in range(offsets[row], offsets[row + 1]):
+            mask |= code_bits[code_ids[position]]
+        masks[row] = mask
+
+
+def _score_loop(truth_codes, label_codes, predicted_masks, met_masks, unmet_masks, pair_counts, first_seen,
+                evidence_counts):
+    n_codes = evidence_counts.shape[0]
+    for row in range(len(truth_codes)):
+        truth_code = truth_codes[row]
+        label_code = label_codes[row]
+        if pair_counts[truth_code, label_code] == 0:
+            first_seen[truth_code, label_code] = row
+        pair_counts[truth_code, label_code] += 1
+        # evidence_code_outcomes of one variant, in OUTCOMES order
+        predicted = predicted_masks[row]
+        met = met_masks[row]
+        unmet_only = unmet_masks[row] & ~met
+        tp = predicted & met
+        fp = predicted & unmet_only
+        tn = ~predicted & unmet_only
+        fn = ~predicted & met
+        for code in range(n_codes):
+            evidence_counts[code, 0] += (tp >> code) & 1
+            evidence_counts[code, 1] += (fp >> code) & 1
+            evidence_counts[code, 2] += (tn >> code) & 1
+            evidence_counts[code, 3] += (fn >> code) & 1
+
+
+@lru_cache(maxsize=None)
+def _compiled(loop):
+    """loop compiled by Numba (on first use, cached on disk), None when Numba is not installed"""
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(cache=True, nogil=True)(loop)
+
+
+def _kernel(loop, backend):
+    if backend not in ("auto", *KERNEL_BACKENDS):
+        raise ValueError(f"unknown kernel backend {backend!r}, expected auto or one of {KERNEL_BACKENDS}")
+    if backend == "numpy":
+        return None
+    kernel = _compiled(loop)
+    if kernel is None and backend == "numba":
+        raise ImportError("the numba kernel backend needs numba (requirements-optional.txt)")
+    return kernel
+
+
+def kernel_backend():
+    """the backend "auto" resolves to"""
+    return "numpy" if _compiled(_score_loop) is None else "numba"
+
+
+def code_id_masks(offsets, code_ids, code_bits, backend="auto"):
+    """
+    uint32 bitmask per row of a ragged array of code IDs: row i holds code_ids[offsets[i]:offsets[i + 1]],
+    and code_bits[code ID] is the bit of that code (0 for codes that are not counted). the codes are normalized
+    once per distinct raw code when code_bits is built (EvidenceCodeEncoder.code_bits), not once per variant
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    code_ids = np.asarray(code_ids, dtype=np.int64)
+    code_bits = np.asarray(code_bits, dtype=np.int64)
+    kernel = _kernel(_code_masks_loop, backend)
+    if kernel is not None:
+        masks = np.zeros(len(offsets) - 1, dtype=np.int64)
+        kernel(offsets, code_ids, code_bits, masks)
+        return masks.astype(np.uint32)
+    masks = np.zeros(len(offsets) - 1, dtype=np.uint32)
+    # reduceat over the starts of the non-empty rows: each reduces up to the next start, the last to the end
+    non_empty = np.diff(offsets) > 0
+    if non_empty.any():
+        masks[non_empty] = np.bitwise_or.reduceat(code_bits[code_ids[:offsets[-1]]], offsets[:-1][non_empty])
+    return masks
+
+
+def evidence_code_counts(predicted_masks, met_masks, unmet_masks, n_codes=len(EVIDENCE_CODE_LIST)):
+    """(n_codes, OUTCOMES) int64 table of TP/FP/TN/FN per evidence code over arrays of masks"""
+    counts = np.zeros((n_codes, len(OUTCOMES)), dtype=np.int64)
+    for start in range(0, len(predicted_masks), _CHUNK_ROWS):
+        chunk = slice(start, start + _CHUNK_ROWS)
+        outcome_masks = evidence_code_outcomes(
+            np.asarray(predicted_masks[chunk], dtype="<u4"),
+            np.asarray(met_masks[chunk], dtype="<u4"),
+            np.asarray(unmet_masks[chunk], dtype="<u4"),
+        )
+        for outcome, mask in enumerate(outcome_masks):
+            # bit c of every mask in column c
+            bits = np.unpackbits(mask.view(np.uint8).reshape(-1, 4), axis=1, bitorder="little")
+            counts[:, outcome] += bits[:, :n_codes].sum(axis=0, dtype=np.int64)
+    return counts
+
+
+def score_arrays(
+        truth_codes,
+        label_codes,
+        predicted_masks,
+        met_masks,
+        unmet_masks,
+        n_truth,
+        n_labels,
+        n_codes=len(EVIDENCE_CODE_LIST),
+        backend="auto",
+):
+    """
+    one pass over pre-encoded variants: truth_codes and label_codes index the truth tiers and platform labels,
+    the masks are the predicted/met/unmet evidence-code bitmasks.
+    returns (pair_counts, first_seen, evidence_counts): the (n_truth, n_labels) count matrix of (truth, label)
+    pairs, the row each pair first occurs in (len(truth_codes) for absent pairs) and the (n_codes, OUTCOMES)
+    evidence-code table. backend "numba" runs a compiled loop, "numpy" vectorized passes; "auto" takes numba
+    when it is installed. both give identical results
+    """
+    truth_codes = np.asarray(truth_codes, dtype=np.int64)
+    label_codes = np.asarray(label_codes, dtype=np.int64)
+    rows = len(truth_codes)
+    kernel = _kernel(_score_loop, backend)
+    if kernel is not None:
+        pair_counts = np.zeros((n_truth, n_labels), dtype=np.int64)
+        first_seen = np.full((n_truth, n_labels), rows, dtype=np.int64)
+        evidence_counts = np.zeros((n_codes, len(OUTCOMES)), dtype=np.int64)
+        kernel(
+            truth_codes,
+            label_codes,
+            np.asarray(predicted_masks, dtype=np.int64),
+            np.asarray(met_masks, dtype=np.int64),
+            np.asarray(unmet_masks, dtype=np.int64),
+            pair_counts,
+            first_seen,
+            evidence_counts,
+        )
+        return pair_counts, first_seen, evidence_counts
+
+    pair_keys = truth_codes * n_labels + label_codes
+    pair_counts = np.bincount(pair_keys, minlength=n_truth * n_labels)
+    first_seen = np.full(n_truth * n_labels, rows, dtype=np.int64)
+    # return_index gives the first occurrence of every observed pair
+    observed_keys, first_rows = np.unique(pair_keys, return_index=True)
+    first_seen[observed_keys] = first_rows
+    return (
+        pair_counts.reshape(n_truth, n_labels),
+        first_seen.reshape(n_truth, n_labels),
+        evidence_code_counts(predicted_masks, met_masks, unmet_masks, n_codes),
+    )
+
+
+def pair_count_dict(pair_counts, first_seen, truth_labels, labels):
+    """{(truth label, label): count} of the observed pairs of score_arrays, in first-seen order"""
+    truth_positions, label_positions = np.nonzero(pair_counts)
+    order = np.argsort(first_seen[truth_positions, label_positions], kind="stable")
+    return {
+        (truth_labels[truth_position], labels[label_position]): count
+        for truth_position, label_position, count in zip(
+            truth_positions[order].tolist(),
+            label_positions[order].tolist(),
+            pair_counts[truth_positions, label_positions][order].tolist(),
+        )
+    }
+
+
+def encode_labels(values):
+    """(sorted distinct labels, label code per value) of a string array, without sorting the values themselves"""
+    labels = np.array(sorted(set(values.tolist())), dtype=values.dtype)
+    return labels, np.searchsorted(labels, values)
@@ -0,0 +1,148 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from lib.annotation_lib import ClingenVariant
+from lib.baseutils import iter_json_array
+from lib.confusion_matrix import AVERAGES, confusion_matrix_metrics, tier_labels
+
+# stratum of identifiers the truthset has no strata for
+UNKNOWN_STRATUM = ""
+
+_START_LOSS = re.compile(r"^M1[A-Z?]")
+
+
+def variant_class(aa_change):
+    """coarse consequence class from a protein change such as "R158W", "A148fs", "W187*" or "Y414=" """
+    if not aa_change:
+        return "non-coding"
+    if "fs" in aa_change:
+        return "frameshift"
+    if aa_change.startswith("*"):
+        return "synonymous" if aa_change.endswith("=") else "stop-loss"
+    if "*" in aa_change:
+        return "nonsense"
+    if aa_change.endswith("="):
+        return "synonymous"
+    if "del" in aa_change or "ins" in aa_change or "dup" in aa_change:
+        return "inframe-indel"
+    if _START_LOSS.match(aa_change):
+        return "start-loss"
+    return "missense"
+
+
+# stratum name -> stratum key of a ClingenVariant
+STRATA_FIELDS = {
+    "gene_symbol": lambda variant: variant.gene_symbol or UNKNOWN_STRATUM,
+    "disease_id": lambda variant: variant.disease_id,
+    "mode_of_inheritance": lambda variant: "|".join(sorted(variant.mode_of_inheritances)),
+    "variant_class": lambda variant: variant_class(variant.aa_change),
+}
+
+
+def load_strata_index(clingen_json_file, fields=tuple(STRATA_FIELDS)):
+    """{identifier: tuple of stratum keys in fields order}, read in one streaming pass over the truthset"""
+    key_functions = [STRATA_FIELDS[field] for field in fields]
+    strata_index = {}
+    for entry in iter_json_array(clingen_json_file, "data"):
+        identifier = entry.get("identifier")
+        if identifier is None:
+            continue
+        variant = ClingenVariant(entry)
+        strata_index[identifier] = tuple(key_function(variant) for key_function in key_functions)
+    return strata_index
+
+
+def load_gene_index(clingen_json_file):
+    """{identifier: gene symbol} of the truthset"""
+    strata_index = load_strata_index(clingen_json_file, ["gene_symbol"])
+    return {identifier: strata[0] for identifier, strata in strata_index.items()}
+
+
+class StratifiedCounter:
+    """
+    sparse (stratum, ClinGen tier, predicted tier) counts for every field at once; a comparison feeds it
+    the same pairs it adds to its pathogenicity dict, so all strata come out of the one pass over the input.
+    only observed combinations are stored, and dense matrices are built per field on demand.
+    the strata index is left out when the counter is pickled, so jobs and results sent between processes carry only
+    the counts; a worker re-attaches its shared index (pathogenicity_benchmark.run_platform_comparisons)
+    """
+
+    def __init__(self, strata_index, fields=tuple(STRATA_FIELDS)):
+        self.strata_index = strata_index
+        self.fields = list(fields)
+        self.counts = [Counter() for _ in self.fields]
+        self._unknown = (UNKNOWN_STRATUM,) * len(self.fields)
+
+    def add(self, identifier, clingen_pathogenicity, predicted_pathogenicity, count=1):
+        strata = self.strata_index.get(identifier, self._unknown)
+        for field_counts, stratum in zip(self.counts, strata):
+            field_counts[(stratum, clingen_pathogenicity, predicted_pathogenicity)] += count
+
+    def add_counts(self, identifier_pair_counts):
+        """adds a {(identifier, ClinGen tier, predicted tier): count} mapping"""
+        for (identifier, clingen_pathogenicity, predicted_pathogenicity), count in identifier_pair_counts.items():
+            self.add(identifier, clingen_pathogenicity, predicted_pathogenicity, count)
+        return self
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["strata_index"] = None
+        return state
+
+    def update(self, other):
+        for field_counts, other_counts in zip(self.counts, other.counts):
+            field_counts.update(other_counts)
+        return self
+
+    def confusion_matrices(self, field, index_mapping):
+        """(strata, (strata, tiers, tiers) count matrices, tier labels) for one field"""
+        positions = {
+            index: position
+            for position, index in enumerate(sorted(set(index_mapping.values())))
+        }
+        field_counts = self.counts[self.fields.index(field)]
+        strata = sorted({stratum for stratum, _, _ in field_counts})
+        stratum_positions = {stratum: position for position, stratum in enumerate(strata)}
+        matrices = np.zeros((len(strata), len(positions), len(positions)), dtype=np.int64)
+        if field_counts:
+            keys = list(field_counts)
+            np.add.at(
+                matrices,
+                (
+                    np.fromiter((stratum_positions[key[0]] for key in keys), dtype=np.intp, count=len(keys)),
+                    np.fromiter((positions[index_mapping[key[1]]] for key in keys), dtype=np.intp, count=len(keys)),
+                    np.fromiter((positions[index_mapping[key[2]]] for key in keys), dtype=np.intp, count=len(keys)),
+                ),
+                np.fromiter(field_counts.values(), dtype=np.int64, count=len(keys)),
+            )
+        return strata, matrices, tier_labels(index_mapping)
+
+    def metrics(self, field, index_mapping, decimals=3):
+        """
+        one row per stratum: (stratum, variants, macro F1/precision/recall, micro ..., weighted ...),
+        all strata scored in one vectorized confusion_matrix_metrics call
+        """
+        strata, matrices, _ = self.confusion_matrices(field, index_mapping)
+        metrics = confusion_matrix_metrics(matrices, decimals=decimals)
+        support = matrices.sum(axis=(1, 2))
+        columns = [support] + [values for average in AVERAGES for values in metrics["averages"][average]]
+        return [
+            (stratum,) + tuple(column[position].item() for column in columns)
+            for position, stratum in enumerate(strata)
+        ]
+
+    def worst(self, field, index_mapping, top_k=20, min_variants=10, average="weighted"):
+        """
+        the top_k strata with the lowest average F1 among those with at least min_variants variants;
+        weighted by default, since a macro average also counts the tiers a small stratum never has
+        """
+        f1_position = 2 + 3 * AVERAGES.index(average)
+        rows = [row for row in self.metrics(field, index_mapping) if row[1] >= min_variants]
+        rows.sort(key=lambda row: (row[f1_position], -row[1], row[0]))
+        return rows[:top_k]
+
+
+def strata_metric_columns():
+    return ["Variants"] + [f"{average} {metric}" for average in AVERAGES for metric in ["F1", "Precision", "Recall"]]
@@ -0,0 +1,79 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# end of the reader thread's items; an exception it raised is passed on in a _Failure
+_DONE = object()
+
+
+class _Failure:
+    __slots__ = ("exception",)
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def prefetch(iterable, depth=4):
+    """
+    iterates iterable in a reader thread, at most depth items ahead of the consumer; with gzip or isal
+    inputs the decompression (which releases the GIL) overlaps whatever the consumer does with the items.
+    an exception in the reader is raised in the consumer, and closing the generator stops the reader
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # blocks while the queue is full (backpressure) but gives up once the consumer has gone
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as exception:
+            put(_Failure(exception))
+            return
+        put(_DONE)
+
+    reader = threading.Thread(target=read, name="prefetch", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+def stream_blocks(blocks, score_block, processes=None, depth=None, initializer=None, initargs=()):
+    """
+    yields score_block(block) for every item of blocks, in input order: blocks are produced by a reader
+    thread (prefetch), scored in a pool of processes (None for all cores) and handed back in order.
+    depth bounds the blocks waiting between the stages (default 2 per process), so a slow consumer holds back
+    the workers and the reader instead of letting decompressed blocks pile up in memory.
+    score_block and its results must pickle; large shared state goes to the workers once through initializer
+    """
+    processes = processes or os.cpu_count()
+    depth = depth or 2 * processes
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        for block in prefetch(blocks, depth):
+            pending.append(executor.submit(score_block, block))
+            while len(pending) >= depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,130 @@
+import json
+from collections import defaultdict
+
+import numpy as np
+
+from lib.confusion_matrix import tier_labels
+from lib.unchangable_variables import COMPETITOR_INDEX_MAPPING, COMPETITOR_INDEX_MAPPING_MERGED
+
+
+class _RawLabels(dict):
+    # empty mapping that returns every label unchanged; also honoured by pandas Series.map
+    def __missing__(self, label):
+        return label
+
+
+# predicted-label mapping of a comparison run with raw_labels=True: platform labels are counted as reported
+RAW_LABELS = _RawLabels()
+
+
+def relabel_pairs(pairs, predicted_mapping, truth_mapping=None):
+    """
+    {(truth label, predicted label): count} with both labels passed through the mappings and the counts of pairs
+    that land on the same labels summed, in first-seen order (the order the comparison TSVs are written in)
+    """
+    relabelled = defaultdict(int)
+    for (truth_label, predicted_label), count in pairs.items():
+        if truth_mapping is not None:
+            truth_label = truth_mapping[truth_label]
+        relabelled[(truth_label, predicted_mapping[predicted_label])] += count
+    return relabelled
+
+
+class TierModel:
+    """
+    a tier scheme: mapping sends every fine tier label (P, LP, VUS++, VUS+, VUS, LB, B) to one of tiers.
+    truth and predicted labels go through the same mapping, so the confusion matrices are square
+    """
+
+    def __init__(self, name, mapping, tiers=None):
+        self.name = name
+        self.mapping = dict(mapping)
+        self.tiers = list(tiers) if tiers is not None else list(dict.fromkeys(self.mapping.values()))
+        unknown = set(self.mapping.values()) - set(self.tiers)
+        if unknown:
+            raise ValueError(f"tier model {name}: labels {sorted(unknown)} map to tiers not in {self.tiers}")
+
+    @classmethod
+    def from_index_mapping(cls, name, index_mapping):
+        """the scheme of a Sankey/statistics index mapping: labels sharing an index form one tier"""
+        tiers = tier_labels(index_mapping)
+        positions = {index: position for position, index in enumerate(sorted(set(index_mapping.values())))}
+        return cls(name, {label: tiers[positions[index]] for label, index in index_mapping.items()}, tiers)
+
+    def index_mapping(self, label_mapping=None):
+        """
+        {label: tier position}, for build_confusion_matrix and StratifiedCounter; with label_mapping
+        (raw platform label -> fine label) the raw labels are included, so raw-label counts can be used directly
+        """
+        positions = {tier: position for position, tier in enumerate(self.tiers)}
+        index_mapping = {label: positions[tier] for label, tier in self.mapping.items()}
+        if label_mapping is not None:
+            for raw_label, label in label_mapping.items():
+                index_mapping.setdefault(raw_label, index_mapping[label])
+        return index_mapping
+
+
+class TierCounts:
+    """
+    (truth label, raw platform label) counts of one scan as a dense matrix. any tier scheme is a projection
+    one_hot(truth)^T @ counts @ one_hot(predicted), so evaluating another scheme never re-reads the input
+    """
+
+    def __init__(self, pairs):
+        self.pairs = dict(pairs)
+        self.truth_labels = list(dict.fromkeys(truth_label for truth_label, _ in self.pairs))
+        self.raw_labels = list(dict.fromkeys(raw_label for _, raw_label in self.pairs))
+        truth_positions = {label: position for position, label in enumerate(self.truth_labels)}
+        raw_positions = {label: position for position, label in enumerate(self.raw_labels)}
+        self.counts = np.zeros((len(self.truth_labels), len(self.raw_labels)), dtype=np.int64)
+        for (truth_label, raw_label), count in self.pairs.items():
+            self.counts[truth_positions[truth_label], raw_positions[raw_label]] += count
+
+    @staticmethod
+    def _one_hot(labels, mapping, tiers):
+        positions = {tier: position for position, tier in enumerate(tiers)}
+        one_hot = np.zeros((len(labels), len(tiers)), dtype=np.int64)
+        one_hot[np.arange(len(labels)), [positions[mapping[label]] for label in labels]] = 1
+        return one_hot
+
+    def project(self, model, label_mapping=RAW_LABELS):
+        """(tiers, tiers) confusion matrix and the tier labels of model; label_mapping takes raw labels to fine ones"""
+        truth = self._one_hot(self.truth_labels, model.mapping, model.tiers)
+        predicted = self._one_hot(
+            self.raw_labels, {raw_label: model.mapping[label_mapping[raw_label]] for raw_label in self.raw_labels},
+            model.tiers,
+        )
+        return truth.T @ self.counts @ predicted, list(model.tiers)
+
+    def comparison_dict(self, label_mapping=RAW_LABELS):
+        """the pathogenicity dict the comparison returns without raw_labels"""
+        return relabel_pairs(self.pairs, label_mapping)
+
+    def total(self):
+        return int(self.counts.sum())
+
+
+# tier schemes every sweep evaluates; register_tier_model adds more
+TIER_MODELS = {}
+
+
+def register_tier_model(name, mapping, tiers=None):
+    TIER_MODELS[name] = TierModel(name, mapping, tiers)
+    return TIER_MODELS[name]
+
+
+TIER_MODELS["five_tier"] = TierModel.from_index_mapping("five_tier", COMPETITOR_INDEX_MAPPING)
+TIER_MODELS["three_tier"] = TierModel.from_index_mapping("three_tier", COMPETITOR_INDEX_MAPPING_MERGED)
+
+
+def load_tier_models(config_file):
+    """
+    registers the optional "tier_models" section of a platform config,
+    {"name": {"mapping": {"P": "P/LP", ...}, "tiers": ["P/LP", ...]}}, and returns the registered models
+    """
+    with open(config_file) as fh:
+        config = json.load(fh)
+    return [
+        register_tier_model(name, model["mapping"], model.get("tiers"))
+        for name, model in config.get("tier_models", {}).items()
+    ]
@@ -0,0 +1,140 @@
+from array import array
+from sys import intern
+
+import numpy as np
+
+from lib.baseutils import iter_json_array
+from lib.evidence_codes import decode_evidence_codes, encode_evidence_codes
+
+
+class TruthsetVariant:
+    __slots__ = ("pathogenicity", "evidence_mask", "unmet_evidence_mask")
+
+    def __init__(self, pathogenicity, evidence_mask, unmet_evidence_mask):
+        self.pathogenicity = pathogenicity
+        self.evidence_mask = evidence_mask
+        self.unmet_evidence_mask = unmet_evidence_mask
+
+    @property
+    def evidence_codes(self):
+        return decode_evidence_codes(self.evidence_mask)
+
+    @property
+    def unmet_evidence_codes(self):
+        return decode_evidence_codes(self.unmet_evidence_mask)
+
+
+class ClingenTruthset:
+    """
+    columnar ClinGen truthset: one row per identifier, tiers stored as small codes into an interned tier table
+    and evidence codes as bitmasks over EVIDENCE_CODE_LIST (codes are kept exactly as curated, strengths included)
+    """
+
+    __slots__ = ("tiers", "_tier_codes", "_index", "_pathogenicity", "_evidence_masks", "_unmet_evidence_masks")
+
+    def __init__(self):
+        self.tiers = []
+        self._tier_codes = {}
+        self._index = {}
+        self._pathogenicity = array("B")
+        self._evidence_masks = array("I")
+        self._unmet_evidence_masks = array("I")
+
+    def add(self, identifier, pathogenicity, evidence_codes, unmet_evidence_codes):
+        tier_code = self._tier_codes.get(pathogenicity)
+        if tier_code is None:
+            tier_code = self._tier_codes[pathogenicity] = len(self.tiers)
+            self.tiers.append(intern(pathogenicity))
+        row = self._index.get(identifier)
+        if row is None:
+            # later entries overwrite earlier ones, as with the dict the truthset used to be
+            self._index[identifier] = len(self._pathogenicity)
+            self._pathogenicity.append(tier_code)
+            self._evidence_masks.append(encode_evidence_codes(evidence_codes))
+            self._unmet_evidence_masks.append(encode_evidence_codes(unmet_evidence_codes))
+        else:
+            self._pathogenicity[row] = tier_code
+            self._evidence_masks[row] = encode_evidence_codes(evidence_codes)
+            self._unmet_evidence_masks[row] = encode_evidence_codes(unmet_evidence_codes)
+
+    def to_columns(self):
+        """NumPy columns in row order, as stored by the parse cache"""
+        return {
+            "identifier": np.array(list(self._index), dtype=str),
+            "tier": np.array(self.tiers, dtype=str),
+            "pathogenicity": np.frombuffer(self._pathogenicity, dtype=np.uint8),
+            "evidence_mask": np.frombuffer(self._evidence_masks, dtype=np.uint32),
+            "unmet_evidence_mask": np.frombuffer(self._unmet_evidence_masks, dtype=np.uint32),
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        truthset = cls()
+        truthset.tiers = [intern(tier) for tier in columns["tier"].tolist()]
+        truthset._tier_codes = {tier: code for code, tier in enumerate(truthset.tiers)}
+        truthset._index = {identifier: row for row, identifier in enumerate(columns["identifier"].tolist())}
+        truthset._pathogenicity = array("B", columns["pathogenicity"].tobytes())
+        truthset._evidence_masks = array("I", np.asarray(columns["evidence_mask"], dtype=np.uint32).tobytes())
+        truthset._unmet_evidence_masks = array(
+            "I", np.asarray(columns["unmet_evidence_mask"], dtype=np.uint32).tobytes()
+        )
+        return truthset
+
+    @property
+    def pathogenicity_codes(self):
+        return np.frombuffer(self._pathogenicity, dtype=np.uint8).copy()
+
+    @property
+    def evidence_masks(self):
+        return np.frombuffer(self._evidence_masks, dtype=np.uint32).copy()
+
+    @property
+    def unmet_evidence_masks(self):
+        return np.frombuffer(self._unmet_evidence_masks, dtype=np.uint32).copy()
+
+    def lookup_identifiers(self, identifiers):
+        """row per identifier, -1 where it is not in the truthset"""
+        index = self._index
+        return np.fromiter(
+            (index.get(identifier, -1) for identifier in identifiers), dtype=np.int64, count=len(identifiers)
+        )
+
+    def get(self, identifier, default=None):
+        row = self._index.get(identifier)
+        if row is None:
+            return default
+        return TruthsetVariant(
+            self.tiers[self._pathogenicity[row]],
+            self._evidence_masks[row],
+            self._unmet_evidence_masks[row],
+        )
+
+    def __getitem__(self, identifier):
+        variant = self.get(identifier)
+        if variant is None:
+            raise KeyError(identifier)
+        return variant
+
+    def __contains__(self, identifier):
+        return identifier in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def load_clingen_truthset(clingen_json_file):
+    truthset = ClingenTruthset()
+    for entry in iter_json_array(clingen_json_file, key="data"):
+        if entry.get("identifier") is None:
+            # no platform row can be joined to it
+            continue
+        truthset.add(
+            entry["identifier"],
+            entry["pathogenicity"],
+            entry["evidence_codes"],
+            entry["unmet_evidence_codes"],
+        )
+    return truthset
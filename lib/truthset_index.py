@@ -0,0 +1,206 @@
+import os
+import zlib
+
+import numpy as np
+
+from lib.truthset import TruthsetVariant
+
+CHROMOSOME_CODES = {str(chromosome): chromosome for chromosome in range(1, 23)}
+CHROMOSOME_CODES.update({"X": 23, "Y": 24, "M": 25, "MT": 25})
+
+# key layout, high to low bits: chromosome (5) | position (29) | ref allele hash (15) | alt allele hash (15)
+_POSITION_BITS = 29
+_ALLELE_BITS = 15
+_ALLELE_MASK = (1 << _ALLELE_BITS) - 1
+INDEX_COLUMNS = [
+    "key",
+    "identifier_offsets",
+    "identifier_blob",
+    "tier",
+    "pathogenicity",
+    "evidence_mask",
+    "unmet_evidence_mask",
+]
+
+
+def _chromosome_code(chromosome):
+    code = CHROMOSOME_CODES.get(chromosome)
+    if code is None:
+        # other contigs share the six spare codes; the stored identifier tells them apart
+        code = 26 + zlib.crc32(chromosome.encode("utf-8")) % 6
+    return code
+
+
+def pack_variant_key(chromosome, position, ref, alt):
+    position = int(position)
+    if not 0 <= position < 1 << _POSITION_BITS:
+        raise ValueError(f"position {position} does not fit the truthset index key")
+    return (
+        _chromosome_code(chromosome) << (_POSITION_BITS + 2 * _ALLELE_BITS)
+        | position << (2 * _ALLELE_BITS)
+        | (zlib.crc32(ref.encode("utf-8")) & _ALLELE_MASK) << _ALLELE_BITS
+        | zlib.crc32(alt.encode("utf-8")) & _ALLELE_MASK
+    )
+
+
+def pack_identifiers(identifiers):
+    """
+    uint64 packed keys for "chrom-pos-ref-alt" identifiers;
+    malformed identifiers get key 0, which never matches a stored variant
+    """
+    keys = np.zeros(len(identifiers), dtype=np.uint64)
+    for row, identifier in enumerate(identifiers):
+        parts = identifier.split("-")
+        if len(parts) != 4 or not parts[1].isdigit():
+            continue
+        keys[row] = pack_variant_key(*parts)
+    return keys
+
+
+def identifier_blob(identifiers):
+    """(offsets, blob) of identifiers: identifier i is the UTF-8 bytes blob[offsets[i]:offsets[i + 1]]"""
+    encoded = [identifier.encode("utf-8") for identifier in identifiers]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(identifier) for identifier in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _identifiers_equal(offsets, blob, rows, encoded):
+    # identifier rows[i] of (offsets, blob) == encoded[i], compared byte by byte over all rows at once
+    starts = offsets[rows]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    equal = lengths == offsets[rows + 1] - starts
+    compared = np.flatnonzero(equal & (lengths > 0))
+    if len(compared):
+        lengths = lengths[compared]
+        segment_starts = np.cumsum(lengths) - lengths
+        query = np.frombuffer(b"".join([encoded[row] for row in compared.tolist()]), dtype=np.uint8)
+        stored = blob[np.repeat(starts[compared] - segment_starts, lengths) + np.arange(len(query))]
+        equal[compared] = ~np.logical_or.reduceat(stored != query, segment_starts)
+    return equal
+
+
+class TruthsetIndex:
+    """
+    truthset stored as arrays sorted by packed variant key, looked up by binary search; the identifiers are kept
+    as one byte blob, so a hit is confirmed against the full identifier and hash collisions never match.
+    saved as .npy files and loaded memory-mapped, so any number of worker processes share one copy
+    through the page cache; pickling a loaded index only sends the file paths
+    """
+
+    def __init__(self, columns):
+        self.keys = columns["key"]
+        self.identifier_offsets = columns["identifier_offsets"]
+        self.identifier_blob = columns["identifier_blob"]
+        self.tiers = [str(tier) for tier in columns["tier"]]
+        self.pathogenicity_codes = columns["pathogenicity"]
+        self.evidence_masks = columns["evidence_mask"]
+        self.unmet_evidence_masks = columns["unmet_evidence_mask"]
+
+    @classmethod
+    def from_truthset(cls, clingen_truthset):
+        return cls(cls.columns_from_truthset(clingen_truthset))
+
+    @staticmethod
+    def columns_from_truthset(clingen_truthset):
+        """
+        index columns for a ClingenTruthset, sorted by packed key; alleles whose hashes collide share a key,
+        and lookup tells them apart by the stored identifier
+        """
+        columns = clingen_truthset.to_columns()
+        identifiers = columns["identifier"].tolist()
+        keys = pack_identifiers(identifiers)
+        if (keys == 0).any():
+            raise ValueError("truthset identifiers must look like chrom-pos-ref-alt")
+        order = np.argsort(keys, kind="stable")
+        identifier_offsets, identifier_bytes = identifier_blob([identifiers[row] for row in order.tolist()])
+        return {
+            "key": keys[order],
+            "identifier_offsets": identifier_offsets,
+            "identifier_blob": identifier_bytes,
+            "tier": columns["tier"],
+            "pathogenicity": columns["pathogenicity"][order],
+            "evidence_mask": columns["evidence_mask"][order],
+            "unmet_evidence_mask": columns["unmet_evidence_mask"][order],
+        }
+
+    def to_columns(self):
+        return {
+            "key": self.keys,
+            "identifier_offsets": self.identifier_offsets,
+            "identifier_blob": self.identifier_blob,
+            "tier": np.array(self.tiers, dtype=str),
+            "pathogenicity": self.pathogenicity_codes,
+            "evidence_mask": self.evidence_masks,
+            "unmet_evidence_mask": self.unmet_evidence_masks,
+        }
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        for column, values in self.to_columns().items():
+            np.save(os.path.join(index_dir, f"{column}.npy"), values, allow_pickle=False)
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode="r"):
+        return cls(
+            {
+                column: np.load(os.path.join(index_dir, f"{column}.npy"), mmap_mode=mmap_mode)
+                for column in INDEX_COLUMNS
+            }
+        )
+
+    def __reduce__(self):
+        columns = self.to_columns()
+        filenames = {column: getattr(values, "filename", None) for column, values in columns.items()}
+        if all(filenames[column] for column in INDEX_COLUMNS if column != "tier"):
+            return _load_index_files, (filenames, self.tiers)
+        return TruthsetIndex, (columns,)
+
+    def lookup(self, keys, identifiers):
+        """row per identifier, -1 where the variant is not in the truthset; keys from pack_identifiers"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.keys) == 0:
+            return rows
+        starts = np.searchsorted(self.keys, keys, side="left")
+        run_lengths = np.searchsorted(self.keys, keys, side="right") - starts
+        # colliding alleles form short runs of equal keys; the stored identifier picks the row within the run
+        for offset in range(int(run_lengths.max(initial=0))):
+            in_run = np.flatnonzero(run_lengths > offset)
+            positions = starts[in_run] + offset
+            matches = _identifiers_equal(
+                self.identifier_offsets,
+                self.identifier_blob,
+                positions,
+                [identifiers[row].encode("utf-8") for row in in_run.tolist()],
+            )
+            rows[in_run[matches]] = positions[matches]
+        return rows
+
+    def lookup_identifiers(self, identifiers):
+        identifiers = list(identifiers)
+        return self.lookup(pack_identifiers(identifiers), identifiers)
+
+    def get(self, identifier, default=None):
+        row = self.lookup_identifiers([identifier])[0]
+        if row < 0:
+            return default
+        return TruthsetVariant(
+            self.tiers[self.pathogenicity_codes[row]],
+            int(self.evidence_masks[row]),
+            int(self.unmet_evidence_masks[row]),
+        )
+
+    def __contains__(self, identifier):
+        return self.lookup_identifiers([identifier])[0] >= 0
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _load_index_files(filenames, tiers):
+    columns = {
+        column: np.load(filename, mmap_mode="r") for column, filename in filenames.items() if column != "tier"
+    }
+    columns["tier"] = np.array(tiers, dtype=str)
+    return TruthsetIndex(columns)
@@ -0,0 +1,162 @@
+from array import array
+from sys import intern
+
+import numpy as np
+
+from lib.truthset import ClingenTruthset, TruthsetVariant
+
+# versions are bitmaps in one uint64 per record
+MAX_RELEASES = 64
+
+
+class TruthsetReleases:
+    """
+    several ClinGen releases in one store. a record (identifier, tier, evidence mask, unmet evidence mask) that
+    several releases share is kept once, with a bitmap of the releases it belongs to; a variant only gets another
+    record in the releases where its tier or evidence codes changed, so memory grows with the changes between
+    releases rather than with their number
+    """
+
+    def __init__(self):
+        self.releases = []
+        self.tiers = []
+        self._tier_codes = {}
+        # identifier -> row of its first record, or a list of rows once a release changed it
+        self._index = {}
+        self._pathogenicity = array("B")
+        self._evidence_masks = array("I")
+        self._unmet_evidence_masks = array("I")
+        self._versions = array("Q")
+        self.release_sizes = []
+
+    def _tier_code(self, tier):
+        tier_code = self._tier_codes.get(tier)
+        if tier_code is None:
+            tier_code = self._tier_codes[tier] = len(self.tiers)
+            self.tiers.append(intern(tier))
+        return tier_code
+
+    def _rows(self, identifier):
+        rows = self._index.get(identifier)
+        if rows is None:
+            return ()
+        return rows if isinstance(rows, list) else (rows,)
+
+    def add_truthset(self, release, clingen_truthset):
+        """adds a release from its ClingenTruthset, keyed on its identifiers; releases are kept in the order added"""
+        if len(self.releases) == MAX_RELEASES:
+            raise ValueError(f"at most {MAX_RELEASES} releases fit the version bitmaps")
+        if release in self.releases:
+            raise ValueError(f"release {release!r} was already added")
+        bit = 1 << len(self.releases)
+        self.releases.append(release)
+        release_tiers = [self._tier_code(tier) for tier in clingen_truthset.tiers]
+        identifiers = list(clingen_truthset)
+        self.release_sizes.append(len(identifiers))
+        columns = zip(
+            identifiers,
+            np.asarray(clingen_truthset.pathogenicity_codes).tolist(),
+            np.asarray(clingen_truthset.evidence_masks).tolist(),
+            np.asarray(clingen_truthset.unmet_evidence_masks).tolist(),
+        )
+        for identifier, tier_code, evidence_mask, unmet_evidence_mask in columns:
+            tier_code = release_tiers[tier_code]
+            for row in self._rows(identifier):
+                if (
+                        self._pathogenicity[row] == tier_code
+                        and self._evidence_masks[row] == evidence_mask
+                        and self._unmet_evidence_masks[row] == unmet_evidence_mask
+                ):
+                    self._versions[row] |= bit
+                    break
+            else:
+                row = len(self._versions)
+                self._pathogenicity.append(tier_code)
+                self._evidence_masks.append(evidence_mask)
+                self._unmet_evidence_masks.append(unmet_evidence_mask)
+                self._versions.append(bit)
+                previous = self._index.get(identifier)
+                if previous is None:
+                    self._index[identifier] = row
+                elif isinstance(previous, list):
+                    previous.append(row)
+                else:
+                    self._index[identifier] = [previous, row]
+        return self
+
+    def join(self, identifiers):
+        """(positions, rows): every (identifier position, record row) pair, positions ascending"""
+        positions = array("q")
+        rows = array("q")
+        index = self._index
+        for position, identifier in enumerate(identifiers):
+            identifier_rows = index.get(identifier)
+            if identifier_rows is None:
+                continue
+            if isinstance(identifier_rows, list):
+                positions.extend([position] * len(identifier_rows))
+                rows.extend(identifier_rows)
+            else:
+                positions.append(position)
+                rows.append(identifier_rows)
+        return np.frombuffer(positions, dtype=np.int64), np.frombuffer(rows, dtype=np.int64)
+
+    def release_bit(self, release):
+        return np.uint64(1 << self.releases.index(release))
+
+    def release_truthset(self, release):
+        """the ClingenTruthset of one release, rebuilt from the shared records"""
+        in_release = (self.versions & self.release_bit(release)) != 0
+        identifiers = []
+        rows = []
+        for identifier in self._index:
+            for row in self._rows(identifier):
+                if in_release[row]:
+                    identifiers.append(identifier)
+                    rows.append(row)
+                    break
+        rows = np.array(rows, dtype=np.int64)
+        return ClingenTruthset.from_columns(
+            {
+                "identifier": np.array(identifiers, dtype=str),
+                "tier": np.array(self.tiers, dtype=str),
+                "pathogenicity": self.pathogenicity_codes[rows],
+                "evidence_mask": self.evidence_masks[rows],
+                "unmet_evidence_mask": self.unmet_evidence_masks[rows],
+            }
+        )
+
+    def get(self, identifier):
+        """[(TruthsetVariant, releases)] for every record of identifier"""
+        return [
+            (
+                TruthsetVariant(
+                    self.tiers[self._pathogenicity[row]], self._evidence_masks[row], self._unmet_evidence_masks[row]
+                ),
+                [release for bit, release in enumerate(self.releases) if self._versions[row] >> bit & 1],
+            )
+            for row in self._rows(identifier)
+        ]
+
+    @property
+    def pathogenicity_codes(self):
+        return np.frombuffer(self._pathogenicity, dtype=np.uint8).copy()
+
+    @property
+    def evidence_masks(self):
+        return np.frombuffer(self._evidence_masks, dtype=np.uint32).copy()
+
+    @property
+    def unmet_evidence_masks(self):
+        return np.frombuffer(self._unmet_evidence_masks, dtype=np.uint32).copy()
+
+    @property
+    def versions(self):
+        return np.frombuffer(self._versions, dtype=np.uint64).copy()
+
+    def __contains__(self, identifier):
+        return identifier in self._index
+
+    def __len__(self):
+        """distinct records; compare with sum(release_sizes), the rows the releases would take one by one"""
+        return len(self._versions)
@@ -48,3 +48,35 @@ PATHOGENICITY_MAPPING_EXTENDED = {
     "VUS-": "VUS",
     "VUS--": "VUS",
 }
+
+# node indices of the Sankey diagrams; the competitor mapping covers every predicted label
+CLINGEN_INDEX_MAPPING = {"P": 0, "LP": 1, "VUS": 2, "LB": 3, "B": 4}
+COMPETITOR_INDEX_MAPPING = {
+    "P": 5,
+    "LP": 6,
+    "VUS++": 7,
+    "VUS+": 7,
+    "VUS": 7,
+    "LB": 8,
+    "B": 9,
+}
+CLINGEN_INDEX_MAPPING_MERGED = {
+    "LP": 0,
+    "P": 0,
+    "VUS": 1,
+    "LB": 2,
+    "B": 2,
+}  # LP should be before P
+COMPETITOR_INDEX_MAPPING_MERGED = {
+    "LP": 3,
+    "P": 3,
+    "VUS++": 4,
+    "VUS+": 4,
+    "VUS": 4,
+    "LB": 5,
+    "B": 5,
+}  # LP should be before P
+
+# reported tiers of the five-tier and the merged statistics
+PATHOGENICITY_TIERS = ["P", "LP", "VUS", "LB", "B"]
+PATHOGENICITY_TIERS_MERGED = ["P", "VUS", "B"]
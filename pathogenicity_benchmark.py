@@ -1,149 +1,1514 @@
-from collections import defaultdict
+import csv
+import gzip
+import io
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 
-from lib.annotation_lib import Annotation
-from lib.baseutils import load_json, parse_json_lines, open_func
+import numpy as np
+
+from lib import instrumentation
+from lib.annotation_lib import Annotation, SeqAnnotationRecord
+from lib.baseutils import (
+    is_gzipped,
+    iter_line_blocks,
+    open_text,
+    parse_json_lines,
+    parse_tsv_block,
+    read_tsv_blocks,
+    read_tsv_columns,
+)
+from lib.bootstrap import bootstrap_metrics, interval_rows
+from lib.cache import ParseCache
+from lib.confusion_matrix import AVERAGES, aggregate_comparison_dict, build_tier_confusion_matrix, statistics_rows
+from lib.discordance import DiscordanceWriter, discordance_file, query_discordance, with_evidence_codes
+from lib.evidence_codes import (
+    EvidenceCodeCounter,
+    EvidenceCodeEncoder,
+    encode_clingen_evidence_codes,
+    encode_competitor_evidence_codes,
+    encode_seq_evidence_codes,
+    strip_strength,
+)
+from lib.incremental_state import IncrementalState, content_hash
+from lib.json_backend import get_json_decoder
+from lib.platform_registry import PLATFORM_FORMATS, load_platform_config, load_truthset_releases
+from lib.scoring_kernels import code_id_masks, encode_labels, pair_count_dict, score_arrays
+from lib.strata import STRATA_FIELDS, StratifiedCounter, load_gene_index, load_strata_index, strata_metric_columns
+from lib.streaming import stream_blocks
+from lib.tier_models import RAW_LABELS, TIER_MODELS, TierCounts, load_tier_models, relabel_pairs
+from lib.truthset import ClingenTruthset, load_clingen_truthset
+from lib.truthset_index import TruthsetIndex
+from lib.truthset_releases import TruthsetReleases
 from lib.unchangable_variables import (
-    EVIDENCE_CODE_LIST,
+    COMPETITOR_INDEX_MAPPING,
+    COMPETITOR_INDEX_MAPPING_MERGED,
+    PATHOGENICITY_MAPPING_EXTENDED,
     PATHOGENICITY_MAPPING_SHRINKAGE,
+    PATHOGENICITY_TIERS,
+    PATHOGENICITY_TIERS_MERGED,
 )
 
+COMPETITOR_COLUMNS = ["Chromosome", "Position", "Ref seq", "Var seq", "Germline Class", "Germline rules"]
 
-def read_clingen(clingen_json_file):
-    clingen_truthset_dict = {}
-    indata = load_json(clingen_json_file)
-    for entry in indata["data"]:
-        clingen_truthset_dict[entry["identifier"]] = {
-            "pathogenicity": entry["pathogenicity"],
-            "evidence_codes": entry["evidence_codes"],
-            "unmet_evidence_codes": entry["unmet_evidence_codes"],
-        }
-    return clingen_truthset_dict
+# sorted so decoded keys come out in the same order as sorted(code names)
+_encode_double_counting_codes = EvidenceCodeEncoder(strip_strength, codes=sorted(["PS1", "PP5", "PM5"]))
 
 
-def run_competitor_comparison(
-        competitor_annotation_file,
-        clingen_truthset_dict,
-        merge_vus=False,
-):
+def read_clingen(clingen_json_file, cache=None):
+    # streamed into a columnar truthset so the full document is never held in memory
+    if cache is not None:
+        columns = cache.load_or_build(
+            "clingen", clingen_json_file, lambda path: load_clingen_truthset(path).to_columns()
+        )
+        clingen_truthset = ClingenTruthset.from_columns(columns)
+    else:
+        clingen_truthset = load_clingen_truthset(clingen_json_file)
+    instrumentation.count("rows", len(clingen_truthset))
+    return clingen_truthset
+
+
+def competitor_pathogenicity_mapping(merge_vus=False, raw_labels=False):
+    if raw_labels:
+        return RAW_LABELS
     pathogenicity_mapping = PATHOGENICITY_MAPPING_SHRINKAGE.copy()
     if merge_vus:
         pathogenicity_mapping["Uncertain significance P"] = "VUS"
         pathogenicity_mapping["Uncertain significance LP"] = "VUS"
+    return pathogenicity_mapping
+
+
+def _competitor_identifier(chromosome, position, ref, alt):
+    if ref == "":
+        ref = "."
+    if alt == "":
+        alt = "."
+    if chromosome.startswith("chr"):
+        chromosome = chromosome[3:]
+    return "{}-{}-{}-{}".format(chromosome, position, ref, alt)
+
+
+def _competitor_row_fields(chromosome, position, ref, alt, germline_class, germline_rules):
+    # possible row is: 'chr1:171636330 C⇒T', 'chr1', '171636330', 'rs149881467', 'C' etc.; only COMPETITOR_COLUMNS are read
+    evidence_codes_competitor = germline_rules.split(",")
+    return (
+        _competitor_identifier(chromosome, position, ref, alt),
+        germline_class,
+        encode_competitor_evidence_codes(evidence_codes_competitor),
+        _encode_double_counting_codes(evidence_codes_competitor),
+    )
+
+
+def read_clingen_index(clingen_json_file, cache):
+    """
+    TruthsetIndex memory-mapped from the parse cache (built from the truthset on a miss);
+    worker processes map the same files instead of holding their own truthset copy
+    """
+    columns = cache.load_or_build(
+        "clingen-index",
+        clingen_json_file,
+        lambda path: TruthsetIndex.columns_from_truthset(load_clingen_truthset(path)),
+    )
+    clingen_truthset = TruthsetIndex(columns)
+    instrumentation.count("rows", len(clingen_truthset))
+    return clingen_truthset
+
+
+def run_competitor_comparison(
+        competitor_annotation_file,
+        clingen_truthset,
+        merge_vus=False,
+        cache=None,
+        engine="rows",
+        strata=None,
+        raw_labels=False,
+        discordance=None,
+        processes=1,
+        block_size=1 << 22,
+):
+    """
+    cache (a ParseCache) keeps the parsed competitor columns between runs.
+    engine="columnar" parses blocks of block_size bytes with pandas and does every step as a column operation.
+    strata (a StratifiedCounter) is filled in the same pass and returned as a fifth output; it needs the
+    identifier of every row, so it always runs the row engine, as does discordance.
+    raw_labels keeps the Germline Class labels as reported (merge_vus is then ignored), for TierCounts projections.
+    discordance (a DiscordanceWriter) receives every variant found in the truthset and is closed at the end.
+    processes > 1 (or None for all cores) streams the rows engine: a reader thread decompresses blocks of
+    block_size bytes while a process pool parses and scores them; the result equals the serial one
+    """
+    if engine == "columnar" and strata is None and discordance is None:
+        return run_competitor_comparison_columnar(
+            competitor_annotation_file, clingen_truthset, merge_vus=merge_vus, block_size=block_size,
+            raw_labels=raw_labels,
+        )
+    if cache is not None:
+        columns = cache.load_or_build("competitor", competitor_annotation_file, extract_competitor_columns)
+        return score_competitor_columns(
+            columns, clingen_truthset, merge_vus=merge_vus, strata=strata, raw_labels=raw_labels,
+            discordance=discordance,
+        )
+
+    pathogenicity_mapping = competitor_pathogenicity_mapping(merge_vus, raw_labels)
+    if processes == 1:
+        pathogenicity_compare_dict, evidence_code_counter, double_counting_dict, missing = _score_competitor_rows(
+            read_tsv_columns(competitor_annotation_file, COMPETITOR_COLUMNS),
+            clingen_truthset,
+            pathogenicity_mapping,
+            strata.add if strata is not None else None,
+            discordance.add if discordance is not None else None,
+        )
+    else:
+        pathogenicity_compare_dict = defaultdict(int)
+        evidence_code_counter = EvidenceCodeCounter()
+        double_counting_dict = defaultdict(int)
+        missing = 0
+        indices, blocks = read_tsv_blocks(competitor_annotation_file, COMPETITOR_COLUMNS, block_size)
+        score_block = partial(
+            _compare_competitor_block,
+            indices=indices,
+            pathogenicity_mapping=pathogenicity_mapping,
+            stratify=strata is not None,
+            keep_outcomes=discordance is not None,
+        )
+        # the truthset goes to each worker once, not with every block
+        for block_result in stream_blocks(
+                blocks, score_block, processes, initializer=_init_platform_worker, initargs=(clingen_truthset,)
+        ):
+            (
+                block_compare_dict,
+                block_evidence_code_counter,
+                block_double_counting_dict,
+                block_missing,
+                identifier_counts,
+                outcomes,
+            ) = block_result
+            for compare_id, count in block_compare_dict.items():
+                pathogenicity_compare_dict[compare_id] += count
+            evidence_code_counter.update(block_evidence_code_counter)
+            for clingen_related_codes, count in block_double_counting_dict.items():
+                double_counting_dict[clingen_related_codes] += count
+            missing += block_missing
+            if strata is not None:
+                strata.add_counts(identifier_counts)
+            if discordance is not None:
+                for outcome in outcomes:
+                    discordance.add(*outcome)
+    if discordance is not None:
+        discordance.close()
+
+    result = (
+        pathogenicity_compare_dict,
+        evidence_code_counter.to_dict(),
+        double_counting_dict,
+        missing,
+    )
+    return result if strata is None else result + (strata,)
+
 
+def _score_competitor_rows(rows, clingen_truthset, pathogenicity_mapping, add_pair=None, add_outcome=None):
+    """
+    the four counts of run_competitor_comparison over read_tsv_columns rows; add_pair(identifier, ClinGen tier,
+    predicted tier) and add_outcome (DiscordanceWriter.add arguments) are called for every variant found
+    """
     pathogenicity_compare_dict = defaultdict(int)
-    evidence_code_dict_competitor = {
-        ec: {
-            "tp": 0,
-            "fp": 0,
-            "tn": 0,
-            "fn": 0,
-        }
-        for ec in EVIDENCE_CODE_LIST
-    }
+    evidence_code_counter = EvidenceCodeCounter()
     missing = 0
     double_counting_dict = defaultdict(int)
-    for entry in open_func(competitor_annotation_file, to_dict=True):
-        # possible string is: {'Variant': 'chr1:171636330 C⇒T', 'Chromosome': 'chr1', 'Position': '171636330', 'RS ID': 'rs149881467', 'Ref seq': 'C' etc.
-        if entry["Ref seq"] == "":
-            entry["Ref seq"] = "."
-        if entry["Var seq"] == "":
-            entry["Var seq"] = "."
-        if entry["Chromosome"].startswith("chr"):
-            entry["Chromosome"] = entry["Chromosome"][3:]
-        identifier = "{}-{}-{}-{}".format(
-            entry["Chromosome"], entry["Position"], entry["Ref seq"], entry["Var seq"]
-        )
-        if identifier in clingen_truthset_dict:
+    for row in rows:
+        identifier, germline_class, predicted_mask, double_counting_mask = _competitor_row_fields(*row)
+        clingen_variant = clingen_truthset.get(identifier)
+        if clingen_variant is not None:
             compare_id = (
-                clingen_truthset_dict[identifier]["pathogenicity"],
-                pathogenicity_mapping[entry["Germline Class"]],
+                clingen_variant.pathogenicity,
+                pathogenicity_mapping[germline_class],
             )
             pathogenicity_compare_dict[compare_id] += 1
+            if add_pair is not None:
+                add_pair(identifier, *compare_id)
+            if add_outcome is not None:
+                add_outcome(
+                    identifier,
+                    clingen_variant.pathogenicity,
+                    germline_class,
+                    compare_id[1],
+                    predicted_mask,
+                    clingen_variant.evidence_mask,
+                    clingen_variant.unmet_evidence_mask,
+                )
 
-            evidence_codes_competitor = [
-                ec.split("_")[0] for ec in entry["Germline rules"].split(",")
-            ]
-
-            clingen_evidence_codes = clingen_truthset_dict[identifier]["evidence_codes"]
-            clingen_evidence_codes_unmet = clingen_truthset_dict[identifier][
-                "unmet_evidence_codes"
-            ]
-
-            for ec in evidence_code_dict_competitor:
-                if ec in evidence_codes_competitor and ec in clingen_evidence_codes:
-                    evidence_code_dict_competitor[ec]["tp"] += 1
-                elif (
-                        ec in evidence_codes_competitor and ec in clingen_evidence_codes_unmet
-                ):
-                    evidence_code_dict_competitor[ec]["fp"] += 1
-                elif ec not in evidence_codes_competitor and ec in clingen_evidence_codes:
-                    evidence_code_dict_competitor[ec]["fn"] += 1
-                elif (
-                        ec not in evidence_codes_competitor
-                        and ec in clingen_evidence_codes_unmet
-                ):
-                    evidence_code_dict_competitor[ec]["tn"] += 1
+            evidence_code_counter.add(
+                predicted_mask,
+                clingen_variant.evidence_mask,
+                clingen_variant.unmet_evidence_mask,
+            )
 
             # check whether the seq_evidence_codes_competitor contains at least 2 of elemtnis in PS1, PP5 and PM5
-            clingen_related_codes = sorted(
-                {"PP5", "PS1", "PM5"}.intersection(evidence_codes_competitor)
-            )
-            if len(clingen_related_codes) >= 2:
-                double_counting_dict[tuple(clingen_related_codes)] += 1
+            clingen_related_codes = double_counting_key(double_counting_mask)
+            if clingen_related_codes is not None:
+                double_counting_dict[clingen_related_codes] += 1
         else:
             missing += 1
+    return pathogenicity_compare_dict, evidence_code_counter, double_counting_dict, missing
+
+
+def _compare_competitor_block(block, indices, pathogenicity_mapping, stratify=False, keep_outcomes=False):
+    # worker side of the streaming mode; the truthset was handed over by _init_platform_worker
+    identifier_counts = Counter() if stratify else None
+    outcomes = [] if keep_outcomes else None
+
+    def add_pair(identifier, clingen_pathogenicity, predicted_pathogenicity):
+        identifier_counts[(identifier, clingen_pathogenicity, predicted_pathogenicity)] += 1
+
+    result = _score_competitor_rows(
+        parse_tsv_block(block, indices),
+        _shared_truthset,
+        pathogenicity_mapping,
+        add_pair if stratify else None,
+        (lambda *outcome: outcomes.append(outcome)) if keep_outcomes else None,
+    )
+    return result + (identifier_counts, outcomes)
+
+
+def _truthset_row_lookup(clingen_truthset):
+    # ClingenTruthset identifiers go into a pandas hash index once; a TruthsetIndex does its own batch search
+    if isinstance(clingen_truthset, TruthsetIndex):
+        return lambda identifiers: clingen_truthset.lookup_identifiers(identifiers.tolist())
+    import pandas as pd
+
+    identifier_index = pd.Index(list(clingen_truthset))
+    return lambda identifiers: identifier_index.get_indexer(identifiers)
+
+
+def run_competitor_comparison_columnar(
+        competitor_annotation_file,
+        clingen_truthset,
+        merge_vus=False,
+        block_size=1 << 22,
+        raw_labels=False,
+):
+    """
+    vectorized run_competitor_comparison: same four outputs. blocks of whole lines (read_tsv_blocks) are parsed
+    by pandas; chromosome prefixes and rule lists are handled once per distinct value, identifiers are joined in
+    one hash lookup per block, and tiers and evidence codes are counted in one score_arrays pass
+    """
+    import pandas as pd
+
+    pathogenicity_mapping = competitor_pathogenicity_mapping(merge_vus, raw_labels)
+    lookup_rows = _truthset_row_lookup(clingen_truthset)
+    tier_codes = np.asarray(clingen_truthset.pathogenicity_codes)
+    evidence_masks = np.asarray(clingen_truthset.evidence_masks)
+    unmet_evidence_masks = np.asarray(clingen_truthset.unmet_evidence_masks)
+
+    pair_counts = defaultdict(int)
+    double_counting_counts = Counter()
+    evidence_code_counter = EvidenceCodeCounter()
+    missing = 0
+    indices, blocks = read_tsv_blocks(competitor_annotation_file, COMPETITOR_COLUMNS, block_size)
+    for block in blocks:
+        # the row engine drops "#" everywhere in a line; removing it from the raw bytes keeps that parity
+        chunk = pd.read_csv(
+            io.BytesIO(block.replace(b"#", b"")),
+            sep="\t",
+            header=None,
+            usecols=indices,
+            dtype=str,
+            keep_default_na=False,
+            quoting=csv.QUOTE_NONE,
+        )[indices]
+        if chunk.empty:
+            continue
+        chromosome_codes, chromosomes = pd.factorize(chunk[indices[0]])
+        chromosomes = np.array([chromosome.removeprefix("chr") for chromosome in chromosomes], dtype=object)
+        ref = chunk[indices[2]].to_numpy()
+        ref[ref == ""] = "."
+        alt = chunk[indices[3]].to_numpy()
+        alt[alt == ""] = "."
+        identifiers = chromosomes[chromosome_codes] + "-" + chunk[indices[1]].to_numpy() + "-" + ref + "-" + alt
+
+        rows = np.asarray(lookup_rows(pd.Index(identifiers)))
+        found = rows >= 0
+        missing += int((~found).sum())
+        rows = rows[found]
+        if len(rows) == 0:
+            continue
+
+        # rule lists are split and encoded once per distinct list, as code IDs into the distinct rules
+        rule_list_codes, rule_lists = pd.factorize(chunk[indices[5]].to_numpy()[found])
+        rule_lists = [rule_list.split(",") for rule_list in rule_lists]
+        offsets = np.concatenate([[0], np.cumsum([len(rule_list) for rule_list in rule_lists])]).astype(np.int64)
+        code_ids, raw_codes = pd.factorize(
+            np.array([rule for rule_list in rule_lists for rule in rule_list], dtype=object)
+        )
+        predicted_masks = code_id_masks(offsets, code_ids, encode_competitor_evidence_codes.code_bits(raw_codes))
+        double_counting_masks = code_id_masks(offsets, code_ids, _encode_double_counting_codes.code_bits(raw_codes))
 
+        germline_class_codes, germline_classes = pd.factorize(chunk[indices[4]].to_numpy()[found])
+        block_pair_counts, first_seen, evidence_counts = score_arrays(
+            tier_codes[rows],
+            germline_class_codes,
+            predicted_masks[rule_list_codes],
+            evidence_masks[rows],
+            unmet_evidence_masks[rows],
+            len(clingen_truthset.tiers),
+            len(germline_classes),
+        )
+        for pair, count in pair_count_dict(
+                block_pair_counts, first_seen, clingen_truthset.tiers, list(germline_classes)
+        ).items():
+            pair_counts[pair] += count
+        evidence_code_counter.add_counts(evidence_counts)
+        double_counting_masks, counts = np.unique(double_counting_masks[rule_list_codes], return_counts=True)
+        double_counting_counts.update(dict(zip(double_counting_masks.tolist(), counts.tolist())))
+
+    double_counting_dict = defaultdict(int)
+    for double_counting_mask, count in double_counting_counts.items():
+        clingen_related_codes = double_counting_key(double_counting_mask)
+        if clingen_related_codes is not None:
+            double_counting_dict[clingen_related_codes] += count
     return (
+        relabel_pairs(pair_counts, pathogenicity_mapping),
+        evidence_code_counter.to_dict(),
+        double_counting_dict,
+        missing,
+    )
+
+
+def double_counting_key(double_counting_mask):
+    if double_counting_mask & (double_counting_mask - 1) == 0:
+        # fewer than two of the codes are set
+        return None
+    return tuple(_encode_double_counting_codes.decode(double_counting_mask))
+
+
+def extract_competitor_columns(competitor_annotation_file):
+    identifiers = []
+    germline_classes = []
+    predicted_masks = array("I")
+    double_counting_masks = array("B")
+    for row in read_tsv_columns(competitor_annotation_file, COMPETITOR_COLUMNS):
+        identifier, germline_class, predicted_mask, double_counting_mask = _competitor_row_fields(*row)
+        identifiers.append(identifier)
+        germline_classes.append(germline_class)
+        predicted_masks.append(predicted_mask)
+        double_counting_masks.append(double_counting_mask)
+    return {
+        "identifier": np.array(identifiers, dtype=str),
+        "germline_class": np.array(germline_classes, dtype=str),
+        "predicted_mask": np.frombuffer(predicted_masks, dtype=np.uint32),
+        "double_counting_mask": np.frombuffer(double_counting_masks, dtype=np.uint8),
+    }
+
+
+def score_competitor_columns(
+        columns, clingen_truthset, merge_vus=False, strata=None, raw_labels=False, discordance=None, kernel="auto"
+):
+    """
+    run_competitor_comparison over already extracted columns; same outputs.
+    identifiers are joined in one batch lookup, so a memory-mapped TruthsetIndex works as well as a ClingenTruthset.
+    tiers and evidence codes are counted in one score_arrays pass (kernel: "auto", "numba" or "numpy")
+    """
+    pathogenicity_mapping = competitor_pathogenicity_mapping(merge_vus, raw_labels)
+    rows = clingen_truthset.lookup_identifiers(columns["identifier"].tolist())
+    found = rows >= 0
+    rows = rows[found]
+    missing = len(found) - len(rows)
+
+    tier_codes = np.asarray(clingen_truthset.pathogenicity_codes)[rows]
+    germline_classes, germline_class_codes = encode_labels(columns["germline_class"][found])
+    pair_counts, first_seen, evidence_counts = score_arrays(
+        tier_codes,
+        germline_class_codes,
+        columns["predicted_mask"][found],
+        np.asarray(clingen_truthset.evidence_masks)[rows],
+        np.asarray(clingen_truthset.unmet_evidence_masks)[rows],
+        len(clingen_truthset.tiers),
+        len(germline_classes),
+        backend=kernel,
+    )
+    pathogenicity_compare_dict = relabel_pairs(
+        pair_count_dict(pair_counts, first_seen, clingen_truthset.tiers, germline_classes.tolist()),
+        pathogenicity_mapping,
+    )
+    if strata is not None:
+        identifier_counts = Counter(
+            zip(columns["identifier"][found].tolist(), tier_codes.tolist(), columns["germline_class"][found].tolist())
+        )
+        for (identifier, tier_code, germline_class), count in identifier_counts.items():
+            strata.add(identifier, clingen_truthset.tiers[tier_code], pathogenicity_mapping[germline_class], count)
+    if discordance is not None:
+        germline_classes = columns["germline_class"][found]
+        discordance.add_columns(
+            columns["identifier"][found],
+            np.asarray(clingen_truthset.tiers, dtype=object)[tier_codes],
+            germline_classes,
+            [pathogenicity_mapping[germline_class] for germline_class in germline_classes.tolist()],
+            columns["predicted_mask"][found],
+            np.asarray(clingen_truthset.evidence_masks)[rows],
+            np.asarray(clingen_truthset.unmet_evidence_masks)[rows],
+        )
+        discordance.close()
+
+    evidence_code_counter = EvidenceCodeCounter()
+    evidence_code_counter.add_counts(evidence_counts)
+
+    double_counting_dict = defaultdict(int)
+    double_counting_masks, first_rows, counts = np.unique(
+        columns["double_counting_mask"][found], return_index=True, return_counts=True
+    )
+    order = np.argsort(first_rows)
+    for double_counting_mask, count in zip(double_counting_masks[order].tolist(), counts[order].tolist()):
+        clingen_related_codes = double_counting_key(double_counting_mask)
+        if clingen_related_codes is not None:
+            double_counting_dict[clingen_related_codes] += count
+    result = (
         pathogenicity_compare_dict,
-        evidence_code_dict_competitor,
+        evidence_code_counter.to_dict(),
         double_counting_dict,
         missing,
     )
+    return result if strata is None else result + (strata,)
 
 
-def compare_seq_vs_clingen(seq_annotation_json, merge_vus=False):
-    pathogenicity_compare_dict = defaultdict(int)
-    evidence_code_dict = {
-        ec: {
-            "tp": 0,
-            "fp": 0,
-            "tn": 0,
-            "fn": 0,
-        }
-        for ec in EVIDENCE_CODE_LIST
+def seq_predicted_tier(auto_pathogenicity, merge_vus=False):
+    autopat_code = PATHOGENICITY_MAPPING_EXTENDED[auto_pathogenicity].replace("-", "")
+    if merge_vus:
+        autopat_code = autopat_code.replace("+", "")
+    return autopat_code
+
+
+def seq_pathogenicity_mapping(merge_vus=False, raw_labels=False):
+    """seq_predicted_tier as a mapping over every SEQ auto pathogenicity"""
+    if raw_labels:
+        return RAW_LABELS
+    return {
+        auto_pathogenicity: seq_predicted_tier(auto_pathogenicity, merge_vus)
+        for auto_pathogenicity in PATHOGENICITY_MAPPING_EXTENDED
     }
-    for entry in parse_json_lines(seq_annotation_json):
-        annot = Annotation(entry)
-        if not annot.clingen_entries:
+
+
+def _seq_entry_fields(entry):
+    annot = Annotation(entry)
+    if not annot.clingen_data:
+        return None
+    clingen_entry = annot.clingen_entries[0]
+    return (
+        clingen_entry.identifier or "",
+        clingen_entry.pathogenicity,
+        entry["annotations"]["transcript"]["auto_pathogenicity"],
+        encode_seq_evidence_codes(entry["annotations"]["transcript"].get("acmg_evidence_codes") or []),
+        encode_clingen_evidence_codes(clingen_entry.evidence_codes),
+        encode_clingen_evidence_codes(clingen_entry.unmet_evidence_codes),
+    )
+
+
+def _score_seq_entry(entry, pathogenicity_mapping, pathogenicity_compare_dict, evidence_code_counter,
+                     identifier_counts=None, add_outcome=None):
+    fields = _seq_entry_fields(entry)
+    if fields is None:
+        return
+    identifier, clingen_pathogeniciy, auto_pathogenicity, predicted_mask, met_mask, unmet_mask = fields
+    evidence_code_counter.add(predicted_mask, met_mask, unmet_mask)
+    compare_id = (
+        clingen_pathogeniciy,
+        pathogenicity_mapping[auto_pathogenicity],
+    )
+    pathogenicity_compare_dict[compare_id] += 1
+    if identifier_counts is not None:
+        identifier_counts[(identifier,) + compare_id] += 1
+    if add_outcome is not None:
+        add_outcome(identifier, clingen_pathogeniciy, auto_pathogenicity, compare_id[1], predicted_mask, met_mask,
+                    unmet_mask)
+
+
+def extract_seq_columns(seq_annotation_json, json_backend="auto"):
+    """one row per record with a ClinGen entry: identifier, truth tier, raw auto pathogenicity and the evidence masks"""
+    identifiers = []
+    truth = []
+    auto_pathogenicities = []
+    masks = array("I")
+    for entry in parse_json_lines(seq_annotation_json, backend=json_backend, schema=SeqAnnotationRecord):
+        fields = _seq_entry_fields(entry)
+        if fields is None:
+            continue
+        identifiers.append(fields[0])
+        truth.append(fields[1])
+        auto_pathogenicities.append(fields[2])
+        masks.extend(fields[3:])
+    masks = np.frombuffer(masks, dtype=np.uint32).reshape(-1, 3)
+    return {
+        "identifier": np.array(identifiers, dtype=str),
+        "truth": np.array(truth, dtype=str),
+        "auto_pathogenicity": np.array(auto_pathogenicities, dtype=str),
+        "predicted_mask": masks[:, 0].copy(),
+        "met_mask": masks[:, 1].copy(),
+        "unmet_mask": masks[:, 2].copy(),
+    }
+
+
+def score_seq_columns(columns, merge_vus=False, strata=None, raw_labels=False, discordance=None, kernel="auto"):
+    """
+    compare_seq_vs_clingen over already extracted columns; same outputs.
+    tiers and evidence codes are counted in one score_arrays pass (kernel: "auto", "numba" or "numpy")
+    """
+    pathogenicity_mapping = seq_pathogenicity_mapping(merge_vus, raw_labels)
+    truth_labels, truth_codes = encode_labels(columns["truth"])
+    auto_pathogenicities, auto_pathogenicity_codes = encode_labels(columns["auto_pathogenicity"])
+    pair_counts, first_seen, evidence_counts = score_arrays(
+        truth_codes,
+        auto_pathogenicity_codes,
+        columns["predicted_mask"],
+        columns["met_mask"],
+        columns["unmet_mask"],
+        len(truth_labels),
+        len(auto_pathogenicities),
+        backend=kernel,
+    )
+    pathogenicity_compare_dict = relabel_pairs(
+        pair_count_dict(pair_counts, first_seen, truth_labels.tolist(), auto_pathogenicities.tolist()),
+        pathogenicity_mapping,
+    )
+    evidence_code_counter = EvidenceCodeCounter()
+    evidence_code_counter.add_counts(evidence_counts)
+    if discordance is not None:
+        discordance.add_columns(
+            columns["identifier"],
+            columns["truth"],
+            columns["auto_pathogenicity"],
+            [pathogenicity_mapping[label] for label in columns["auto_pathogenicity"].tolist()],
+            columns["predicted_mask"],
+            columns["met_mask"],
+            columns["unmet_mask"],
+        )
+        discordance.close()
+    if strata is not None:
+        identifier_counts = Counter(
+            zip(columns["identifier"].tolist(), columns["truth"].tolist(), columns["auto_pathogenicity"].tolist())
+        )
+        for (identifier, clingen_pathogeniciy, auto_pathogenicity), count in identifier_counts.items():
+            strata.add(identifier, clingen_pathogeniciy, pathogenicity_mapping[auto_pathogenicity], count)
+        return pathogenicity_compare_dict, evidence_code_counter.to_dict(), strata
+    return pathogenicity_compare_dict, evidence_code_counter.to_dict()
+
+
+def _compare_seq_block(block, pathogenicity_mapping, json_backend, stratify=False, keep_outcomes=False):
+    # worker side of the parallel mode; skips the same lines parse_json_lines does
+    loads = get_json_decoder(json_backend, SeqAnnotationRecord)
+    pathogenicity_compare_dict = defaultdict(int)
+    evidence_code_counter = EvidenceCodeCounter()
+    identifier_counts = Counter() if stratify else None
+    outcomes = [] if keep_outcomes else None
+    add_outcome = (lambda *outcome: outcomes.append(outcome)) if keep_outcomes else None
+    for line in block.splitlines():
+        if line == b"" or line.startswith(b"#"):
             continue
-        clingen_pathogeniciy = annot.clingen_entries[0].pathogenicity
-        clingen_evidence_codes = [
-            ec.split("_")[0] for ec in annot.clingen_entries[0].evidence_codes
-        ]
-        clingen_evidence_codes_unmet = [
-            ec.split("_")[0] for ec in annot.clingen_entries[0].unmet_evidence_codes
-        ]
-        seq_evidence_codes = [
-            ec.replace("+", "").replace("-", "")
-            for ec in entry["annotations"]["transcript"]["acmg_evidence_codes"]
-            if ec != "BA1-"
-        ]
-
-        for ec in EVIDENCE_CODE_LIST:
-            if ec in seq_evidence_codes and ec in clingen_evidence_codes:
-                evidence_code_dict[ec]["tp"] += 1
-            elif ec in seq_evidence_codes and ec in clingen_evidence_codes_unmet:
-                evidence_code_dict[ec]["fp"] += 1
-            elif ec not in seq_evidence_codes and ec in clingen_evidence_codes:
-                evidence_code_dict[ec]["fn"] += 1
-            elif ec not in seq_evidence_codes and ec in clingen_evidence_codes_unmet:
-                evidence_code_dict[ec]["tn"] += 1
-        autopat_code = annot.autopat_code.replace("-", "")
-        if merge_vus:
-            autopat_code = autopat_code.replace("+", "")
-        compare_id = (
-            clingen_pathogeniciy,
-            autopat_code,
+        _score_seq_entry(
+            loads(line), pathogenicity_mapping, pathogenicity_compare_dict, evidence_code_counter, identifier_counts,
+            add_outcome,
         )
+    return pathogenicity_compare_dict, evidence_code_counter, identifier_counts, outcomes
+
+
+def compare_seq_vs_clingen(
+        seq_annotation_json,
+        merge_vus=False,
+        processes=1,
+        block_size=1 << 22,
+        json_backend="auto",
+        cache=None,
+        strata=None,
+        raw_labels=False,
+        discordance=None,
+):
+    """
+    processes > 1 (or None for all cores) streams line-aligned blocks: a reader thread decompresses them
+    while a process pool parses and scores them; partial counts are merged in block order, so the result equals
+    the serial one.
+    records are decoded against SeqAnnotationRecord, so with msgspec only the compared fields are built.
+    cache (a ParseCache) keeps the extracted columns between runs, so merge_vus changes skip parsing.
+    strata (a StratifiedCounter) is filled in the same pass and returned as a third output.
+    raw_labels keeps the auto pathogenicity labels as reported (e.g. "LP-"), for TierCounts projections.
+    discordance (a DiscordanceWriter) receives every record with a ClinGen entry, in file order,
+    and is closed at the end
+    """
+    if cache is not None:
+        columns = cache.load_or_build(
+            "seq", seq_annotation_json, partial(extract_seq_columns, json_backend=json_backend)
+        )
+        return score_seq_columns(
+            columns, merge_vus=merge_vus, strata=strata, raw_labels=raw_labels, discordance=discordance
+        )
+
+    pathogenicity_mapping = seq_pathogenicity_mapping(merge_vus, raw_labels)
+    pathogenicity_compare_dict = defaultdict(int)
+    evidence_code_counter = EvidenceCodeCounter()
+    identifier_counts = Counter() if strata is not None else None
+    if processes == 1:
+        add_outcome = discordance.add if discordance is not None else None
+        for entry in parse_json_lines(seq_annotation_json, backend=json_backend, schema=SeqAnnotationRecord):
+            _score_seq_entry(
+                entry, pathogenicity_mapping, pathogenicity_compare_dict, evidence_code_counter, identifier_counts,
+                add_outcome,
+            )
+    else:
+        score_block = partial(
+            _compare_seq_block,
+            pathogenicity_mapping=pathogenicity_mapping,
+            json_backend=json_backend,
+            stratify=strata is not None,
+            keep_outcomes=discordance is not None,
+        )
+        for block_result in stream_blocks(iter_line_blocks(seq_annotation_json, block_size), score_block, processes):
+            _merge_seq_block(
+                block_result, pathogenicity_compare_dict, evidence_code_counter, identifier_counts, discordance
+            )
+    if discordance is not None:
+        discordance.close()
+    if strata is not None:
+        return pathogenicity_compare_dict, evidence_code_counter.to_dict(), strata.add_counts(identifier_counts)
+    return pathogenicity_compare_dict, evidence_code_counter.to_dict()
+
+
+def _merge_seq_block(block_result, pathogenicity_compare_dict, evidence_code_counter, identifier_counts=None,
+                     discordance=None):
+    block_compare_dict, block_evidence_code_counter, block_identifier_counts, block_outcomes = block_result
+    for compare_id, count in block_compare_dict.items():
+        pathogenicity_compare_dict[compare_id] += count
+    evidence_code_counter.update(block_evidence_code_counter)
+    if identifier_counts is not None:
+        identifier_counts.update(block_identifier_counts)
+    if discordance is not None:
+        for outcome in block_outcomes:
+            discordance.add(*outcome)
+
+
+def _iter_hashed_lines(infile):
+    # same line filter as parse_json_lines
+    file_open = gzip.open if is_gzipped(infile) else open
+    with file_open(str(infile), "rb") as fh:
+        for line in fh:
+            if line == b"\n" or line == b"" or line.startswith(b"#"):
+                continue
+            yield content_hash(line.rstrip(b"\n")), line
+
+
+def _write_state_outcomes(discordance, state, pathogenicity_mapping):
+    # every variant of the current input, reused or rescored; identical lines share a state row and its count
+    for (identifier, truth, label, predicted_mask, met_mask, unmet_mask, _), count in state.rows.values():
+        if truth:
+            for _ in range(count):
+                discordance.add(
+                    identifier, truth, label, pathogenicity_mapping[label], predicted_mask, met_mask, unmet_mask
+                )
+    discordance.close()
+
+
+def compare_seq_vs_clingen_incremental(
+        seq_annotation_json,
+        state_file,
+        merge_vus=False,
+        json_backend="auto",
+        strata=None,
+        raw_labels=False,
+        discordance=None,
+):
+    """
+    compare_seq_vs_clingen that keeps per-variant outcomes in state_file and only parses lines
+    whose content hash the previous run did not see; the result equals a full recompute
+    """
+    loads = get_json_decoder(json_backend, SeqAnnotationRecord)
+
+    def score_line(line):
+        fields = _seq_entry_fields(loads(line))
+        if fields is None:
+            return "", "", "", 0, 0, 0, 0
+        return fields + (0,)
+
+    state = IncrementalState.load(state_file).update(_iter_hashed_lines(seq_annotation_json), score_line)
+    if state.changed:
+        state.save(state_file)
+
+    pathogenicity_mapping = seq_pathogenicity_mapping(merge_vus, raw_labels)
+    pathogenicity_compare_dict = relabel_pairs(state.pair_counts, pathogenicity_mapping)
+    if discordance is not None:
+        _write_state_outcomes(discordance, state, pathogenicity_mapping)
+    if strata is not None:
+        for (identifier, clingen_pathogeniciy, auto_pathogenicity, *_), count in state.rows.values():
+            if clingen_pathogeniciy:
+                strata.add(identifier, clingen_pathogeniciy, pathogenicity_mapping[auto_pathogenicity], count)
+        return pathogenicity_compare_dict, state.evidence_code_counter.to_dict(), strata
+    return pathogenicity_compare_dict, state.evidence_code_counter.to_dict()
+
+
+def run_competitor_comparison_incremental(
+        competitor_annotation_file,
+        clingen_truthset,
+        state_file,
+        merge_vus=False,
+        strata=None,
+        raw_labels=False,
+        discordance=None,
+):
+    """
+    run_competitor_comparison with per-variant outcomes kept in state_file; a row's hash covers both its
+    fields and the truthset record it joins to, so truthset releases invalidate exactly the changed variants.
+    only the identifier is built before hashing; the label and evidence codes are parsed for new hashes alone
+    """
+    tiers = clingen_truthset.tiers
+    tier_codes = np.asarray(clingen_truthset.pathogenicity_codes).tolist()
+    evidence_masks = np.asarray(clingen_truthset.evidence_masks).tolist()
+    unmet_evidence_masks = np.asarray(clingen_truthset.unmet_evidence_masks).tolist()
+
+    def keyed_rows():
+        rows = read_tsv_columns(competitor_annotation_file, COMPETITOR_COLUMNS)
+        # joined to the truthset a batch at a time, which a TruthsetIndex needs to stay fast
+        for batch in iter(lambda: list(islice(rows, 1 << 16)), []):
+            identifiers = [_competitor_identifier(*row[:4]) for row in batch]
+            truth_rows = clingen_truthset.lookup_identifiers(identifiers).tolist()
+            for row, identifier, truth_row in zip(batch, identifiers, truth_rows):
+                truth = (
+                    ""
+                    if truth_row < 0
+                    else "{}\t{}\t{}".format(
+                        tiers[tier_codes[truth_row]], evidence_masks[truth_row], unmet_evidence_masks[truth_row]
+                    )
+                )
+                yield content_hash("\t".join(row) + "\t" + truth), (row, identifier, truth_row)
+
+    def score_row(payload):
+        row, identifier, truth_row = payload
+        if truth_row < 0:
+            return identifier, "", "", 0, 0, 0, 0
+        _, germline_class, predicted_mask, double_counting_mask = _competitor_row_fields(*row)
+        return (
+            identifier,
+            tiers[tier_codes[truth_row]],
+            germline_class,
+            predicted_mask,
+            evidence_masks[truth_row],
+            unmet_evidence_masks[truth_row],
+            double_counting_mask,
+        )
+
+    state = IncrementalState.load(state_file).update(keyed_rows(), score_row)
+    if state.changed:
+        state.save(state_file)
+
+    pathogenicity_mapping = competitor_pathogenicity_mapping(merge_vus, raw_labels)
+    pathogenicity_compare_dict = relabel_pairs(state.pair_counts, pathogenicity_mapping)
+    if discordance is not None:
+        _write_state_outcomes(discordance, state, pathogenicity_mapping)
+    double_counting_dict = defaultdict(int)
+    for double_counting_mask, count in state.double_counting_counts.items():
+        clingen_related_codes = double_counting_key(double_counting_mask)
+        if clingen_related_codes is not None:
+            double_counting_dict[clingen_related_codes] += count
+    result = (
+        pathogenicity_compare_dict,
+        state.evidence_code_counter.to_dict(),
+        double_counting_dict,
+        state.unmatched,
+    )
+    if strata is None:
+        return result
+    for (identifier, clingen_pathogenicity, germline_class, *_), count in state.rows.values():
+        if clingen_pathogenicity:
+            strata.add(identifier, clingen_pathogenicity, pathogenicity_mapping[germline_class], count)
+    return result + (strata,)
+
+
+def vcf_pathogenicity_mapping(merge_vus=False, raw_labels=False):
+    # platforms exporting VCFs use either the long ClinVar-style labels or the SEQ tier codes
+    if raw_labels:
+        return RAW_LABELS
+    pathogenicity_mapping = {**PATHOGENICITY_MAPPING_SHRINKAGE, **PATHOGENICITY_MAPPING_EXTENDED}
+    if merge_vus:
+        pathogenicity_mapping = {label: tier.replace("+", "") for label, tier in pathogenicity_mapping.items()}
+    return pathogenicity_mapping
+
+
+def read_vcf_info(vcf_file, info_fields):
+    """
+    yields (identifier, values) per ALT allele, values holding info_fields in order ("" when absent);
+    identifiers are built like the competitor ones, chromosome without "chr"
+    """
+    with open_text(vcf_file) as infile:
+        for line in infile:
+            if line.startswith("#") or line == "\n":
+                continue
+            chromosome, position, _, ref, alts, _, _, info = line.rstrip("\n").split("\t", 8)[:8]
+            if chromosome.startswith("chr"):
+                chromosome = chromosome[3:]
+            info_values = dict(
+                entry.split("=", 1) if "=" in entry else (entry, "") for entry in info.split(";")
+            )
+            values = tuple(info_values.get(field, "") for field in info_fields)
+            for alt in alts.split(","):
+                yield "{}-{}-{}-{}".format(chromosome, position, ref or ".", alt or "."), values
+
+
+def run_vcf_comparison(
+        vcf_file,
+        clingen_truthset,
+        class_field="CLASS",
+        codes_field="ACMG",
+        merge_vus=False,
+        strata=None,
+        raw_labels=False,
+        discordance=None,
+):
+    """
+    compares a platform shipping a VCF: the predicted tier is INFO/class_field, the evidence codes the
+    comma separated INFO/codes_field (strength suffixes stripped like the competitor's).
+    returns the pathogenicity dict, the evidence code counts and the number of alleles missing from the truthset
+    or without a known class (absent INFO/class_field or a label outside the mapping), plus strata
+    (a StratifiedCounter) filled in the same pass when given; discordance (a DiscordanceWriter)
+    receives every compared allele
+    """
+    pathogenicity_mapping = vcf_pathogenicity_mapping(merge_vus, raw_labels)
+    # raw labels are counted as reported, but only for the classes a tier can be read from
+    known_classes = vcf_pathogenicity_mapping(merge_vus)
+    pathogenicity_compare_dict = defaultdict(int)
+    evidence_code_counter = EvidenceCodeCounter()
+    missing = 0
+    for identifier, (predicted_class, codes) in read_vcf_info(vcf_file, [class_field, codes_field]):
+        clingen_variant = clingen_truthset.get(identifier)
+        if clingen_variant is None or predicted_class not in known_classes:
+            missing += 1
+            continue
+        compare_id = (clingen_variant.pathogenicity, pathogenicity_mapping[predicted_class])
         pathogenicity_compare_dict[compare_id] += 1
-    return pathogenicity_compare_dict, evidence_code_dict
+        if strata is not None:
+            strata.add(identifier, *compare_id)
+        predicted_mask = encode_competitor_evidence_codes(codes.split(","))
+        evidence_code_counter.add(predicted_mask, clingen_variant.evidence_mask, clingen_variant.unmet_evidence_mask)
+        if discordance is not None:
+            discordance.add(
+                identifier,
+                clingen_variant.pathogenicity,
+                predicted_class,
+                compare_id[1],
+                predicted_mask,
+                clingen_variant.evidence_mask,
+                clingen_variant.unmet_evidence_mask,
+            )
+    if discordance is not None:
+        discordance.close()
+    result = (pathogenicity_compare_dict, evidence_code_counter.to_dict(), missing)
+    return result if strata is None else result + (strata,)
+
+
+def extract_vcf_columns(vcf_file, class_field="CLASS", codes_field="ACMG"):
+    """identifier, INFO/class_field and predicted evidence mask of every ALT allele, as run_vcf_comparison reads them"""
+    identifiers = []
+    classes = []
+    predicted_masks = array("I")
+    for identifier, (predicted_class, codes) in read_vcf_info(vcf_file, [class_field, codes_field]):
+        identifiers.append(identifier)
+        classes.append(predicted_class)
+        predicted_masks.append(encode_competitor_evidence_codes(codes.split(",")))
+    return {
+        "identifier": np.array(identifiers, dtype=str),
+        "class": np.array(classes, dtype=str),
+        "predicted_mask": np.frombuffer(predicted_masks, dtype=np.uint32),
+    }
+
+
+def _release_columns(annotation_file, comparison, options, cache=None):
+    # (identifiers, raw platform labels) of an annotation, through the same cache entries as the plain comparisons
+    if comparison == "seq":
+        kind, label_column = "seq", "auto_pathogenicity"
+        extract = partial(extract_seq_columns, json_backend=options.get("json_backend", "auto"))
+    elif comparison == "competitor":
+        kind, label_column = "competitor", "germline_class"
+        extract = extract_competitor_columns
+    else:
+        class_field = options.get("class_field", "CLASS")
+        codes_field = options.get("codes_field", "ACMG")
+        kind, label_column = f"vcf-{class_field}-{codes_field}", "class"
+        extract = partial(extract_vcf_columns, class_field=class_field, codes_field=codes_field)
+    if cache is not None:
+        columns = cache.load_or_build(kind, annotation_file, extract)
+    else:
+        columns = extract(annotation_file)
+    return columns["identifier"], columns[label_column]
+
+
+def compare_platform_releases(annotation_file, truthset_releases, comparison, options=None, releases=None, cache=None):
+    """
+    scores one platform annotation against every release of a TruthsetReleases in one pass: the annotation is
+    read once, its identifiers are joined to the shared records once, and each distinct (record, platform label)
+    count is added to every release in the record's version bitmap.
+    comparison names the platform's comparison ("seq", "competitor" or "vcf"), options are its platform options
+    and releases restricts the scored releases (all by default).
+    returns ({(release, ClinGen tier, raw platform label): count}, {release: identifiers missing from it});
+    SEQ records are joined by the identifier of their ClinGen entry, so their truth is the release's tier
+    rather than the one embedded when the annotation was made
+    """
+    identifiers, labels = _release_columns(annotation_file, comparison, options or {}, cache)
+    positions, rows = truthset_releases.join(identifiers.tolist())
+    label_names, label_codes = np.unique(labels, return_inverse=True)
+    pair_keys, pair_counts = np.unique(rows * len(label_names) + label_codes[positions], return_counts=True)
+    pair_rows, pair_labels = np.divmod(pair_keys, max(len(label_names), 1))
+    versions = truthset_releases.versions
+    pair_tiers = truthset_releases.pathogenicity_codes[pair_rows]
+    pair_versions = versions[pair_rows]
+    # releases each identifier was found in, for the missing counts
+    found_versions = np.zeros(len(identifiers), dtype=np.uint64)
+    np.bitwise_or.at(found_versions, positions, versions[rows])
+
+    label_names = label_names.tolist()
+    release_counts = defaultdict(int)
+    missing = {}
+    for release in releases if releases is not None else truthset_releases.releases:
+        bit = truthset_releases.release_bit(release)
+        in_release = (pair_versions & bit) != 0
+        for tier_code, label_code, count in zip(
+                pair_tiers[in_release].tolist(), pair_labels[in_release].tolist(), pair_counts[in_release].tolist()
+        ):
+            release_counts[(release, truthset_releases.tiers[tier_code], label_names[label_code])] += count
+        missing[release] = len(identifiers) - int(np.count_nonzero(found_versions & bit))
+    return release_counts, missing
+
+
+PlatformJob = namedtuple("PlatformJob", ["name", "comparison", "annotation_file", "kwargs"])
+
+# comparison name -> (function, whether it joins against the shared truthset)
+PLATFORM_COMPARISONS = {
+    "seq": (compare_seq_vs_clingen, False),
+    "competitor": (run_competitor_comparison, True),
+    "vcf": (run_vcf_comparison, True),
+    "seq_incremental": (compare_seq_vs_clingen_incremental, False),
+    "competitor_incremental": (run_competitor_comparison_incremental, True),
+    # the shared truthset is a TruthsetReleases here
+    "releases": (compare_platform_releases, True),
+}
+
+
+# comparison name -> predicted-label mapping of its platforms, (merge_vus) -> {raw label: tier label}
+PLATFORM_LABEL_MAPPINGS = {
+    "seq": seq_pathogenicity_mapping,
+    "competitor": competitor_pathogenicity_mapping,
+    "vcf": vcf_pathogenicity_mapping,
+}
+
+
+def platform_label_mapping(platform, merge_vus=None):
+    """the mapping platform's comparison applies to raw labels; merge_vus defaults to the platform's option"""
+    if merge_vus is None:
+        merge_vus = platform.options.get("merge_vus", False)
+    return PLATFORM_LABEL_MAPPINGS[PLATFORM_FORMATS[platform.format].comparison](merge_vus)
+
+
+def platform_jobs(
+        platforms,
+        cache=None,
+        incremental_dir=None,
+        strata_index=None,
+        strata_fields=None,
+        raw_labels=False,
+        discordance_dir=None,
+        gene_index=None,
+):
+    """
+    PlatformJobs for registry Platforms; formats without a cache or incremental mode
+    run their plain comparison. with strata_fields every job also fills a StratifiedCounter over strata_index,
+    returned as the last element of its result. raw_labels counts the platform labels as reported,
+    to be relabelled with platform_label_mapping or projected through a TierCounts.
+    discordance_dir gets one per-variant outcome file per platform (discordance_file), genes from gene_index
+    """
+    jobs = []
+    for platform in platforms:
+        platform_format = PLATFORM_FORMATS[platform.format]
+        comparison = platform_format.comparison
+        kwargs = dict(platform.options)
+        if raw_labels:
+            kwargs["raw_labels"] = True
+        if discordance_dir is not None:
+            kwargs["discordance"] = DiscordanceWriter(
+                discordance_file(discordance_dir, platform.name),
+                gene_index,
+                # the file holds the configured tiers even when the counts are kept raw
+                label_mapping=platform_label_mapping(platform) if raw_labels else None,
+            )
+        if strata_fields:
+            kwargs["strata"] = StratifiedCounter(strata_index, strata_fields)
+        if incremental_dir is not None and platform_format.incremental:
+            comparison = f"{comparison}_incremental"
+            kwargs["state_file"] = os.path.join(incremental_dir, f"{platform.name}.npz")
+        elif platform_format.cached:
+            kwargs["cache"] = cache
+        jobs.append(PlatformJob(platform.name, comparison, platform.annotation_file, kwargs))
+    return jobs
+
+
+def release_jobs(platforms, releases, cache=None):
+    """
+    PlatformJobs scoring every registry Platform against the TruthsetReleases of releases
+    (load_truthset_releases), each platform against the releases that list it or list no platforms
+    """
+    jobs = []
+    for platform in platforms:
+        kwargs = dict(
+            comparison=PLATFORM_FORMATS[platform.format].comparison,
+            options=platform.options,
+            releases=[
+                release.name for release in releases if release.platforms is None or platform.name in release.platforms
+            ],
+            cache=cache,
+        )
+        jobs.append(PlatformJob(platform.name, "releases", platform.annotation_file, kwargs))
+    return jobs
+
+
+# set in the parent before the pool starts; forked workers see them copy-on-write
+_shared_truthset = None
+_shared_strata_index = None
+_shared_gene_index = None
+
+
+def _init_platform_worker(clingen_truthset, strata_index=None, gene_index=None):
+    global _shared_truthset, _shared_strata_index, _shared_gene_index
+    _shared_truthset = clingen_truthset
+    _shared_strata_index = strata_index
+    _shared_gene_index = gene_index
+
+
+def _jobs_index(jobs, kwarg, attribute):
+    # the one index the jobs' counters or writers were built with (platform_jobs gives them all the same)
+    indexes = {
+        id(getattr(job.kwargs[kwarg], attribute)): getattr(job.kwargs[kwarg], attribute)
+        for job in jobs
+        if job.kwargs.get(kwarg) is not None
+    }
+    if len(indexes) > 1:
+        raise ValueError(f"the jobs of one run must share their {attribute}")
+    return next(iter(indexes.values()), None)
+
+
+def _run_platform_job(job, instrumentation_config=None):
+    # with instrumentation on, the worker collects its own stages and hands the report back to the parent
+    if instrumentation_config is not None:
+        instrumentation.enable(**instrumentation_config)
+    strata = job.kwargs.get("strata")
+    if strata is not None and strata.strata_index is None:
+        # the counter arrives without its index, which the worker shares with the parent
+        strata.strata_index = _shared_strata_index
+    discordance = job.kwargs.get("discordance")
+    if discordance is not None and discordance.gene_index is None:
+        discordance.gene_index = _shared_gene_index or {}
+    comparison, uses_truthset = PLATFORM_COMPARISONS[job.comparison]
+    start = time.perf_counter()
+    with instrumentation.stage(job.name):
+        if uses_truthset:
+            result = comparison(job.annotation_file, _shared_truthset, **job.kwargs)
+        else:
+            result = comparison(job.annotation_file, **job.kwargs)
+        instrumentation.count("rows", sum(result[0].values()))
+    seconds = time.perf_counter() - start
+    if instrumentation_config is not None:
+        return result, seconds, instrumentation.disable().report()
+    return result, seconds, None
+
+
+def run_platform_comparisons(clingen_truthset, jobs, processes=None, timings=None, while_waiting=None):
+    """
+    runs every PlatformJob concurrently, one process each, and returns {job.name: comparison result};
+    per-platform wall times are added to timings when given. while_waiting is called once all jobs are
+    submitted, so the parent can do its own setup in the time it would otherwise spend blocked.
+    the strata index of the jobs' counters and the gene index of their discordance writers reach the workers
+    the same way as the truthset, instead of being pickled into every job and result
+    """
+    global _shared_truthset, _shared_strata_index, _shared_gene_index
+    jobs = list(jobs)
+    processes = processes or len(jobs)
+    strata_index = _jobs_index(jobs, "strata", "strata_index")
+    gene_index = _jobs_index(jobs, "discordance", "gene_index")
+    if "fork" in multiprocessing.get_all_start_methods():
+        _shared_truthset = clingen_truthset
+        _shared_strata_index = strata_index
+        _shared_gene_index = gene_index
+        pool_kwargs = dict(mp_context=multiprocessing.get_context("fork"))
+    else:
+        # spawned workers each receive a pickled copy
+        pool_kwargs = dict(
+            initializer=_init_platform_worker, initargs=(clingen_truthset, strata_index, gene_index)
+        )
+    try:
+        with ProcessPoolExecutor(max_workers=processes, **pool_kwargs) as executor:
+            futures = {
+                job.name: executor.submit(_run_platform_job, job, instrumentation.worker_config()) for job in jobs
+            }
+            if while_waiting is not None:
+                while_waiting()
+            results = {}
+            for name, future in futures.items():
+                results[name], seconds, report = future.result()
+                instrumentation.merge(report)
+                if timings is not None:
+                    timings[name] = seconds
+    finally:
+        _shared_truthset = _shared_strata_index = _shared_gene_index = None
+    return results
+
+
+def write_comparison_tsv(comparison_dict, index_mapping, tsv_file):
+    """same file as sankey_diagram.dict_to_tsv, written without pandas"""
+    aggregated = aggregate_comparison_dict(comparison_dict, index_mapping)
+    with open(tsv_file, "w", newline="") as fh:
+        writer = csv.writer(fh, delimiter="\t", lineterminator="\n")
+        writer.writerow(["Clingen pathogenicity", "Predicted pathogenicity", "Variants counts"])
+        for (clingen_name, predicted_name), value in aggregated.items():
+            writer.writerow([clingen_name, predicted_name, value])
+
+
+def read_comparison_tsv(tsv_file):
+    comparison_dict = defaultdict(int)
+    with open(tsv_file, newline="") as fh:
+        for row in csv.DictReader(fh, delimiter="\t"):
+            comparison_dict[(row["Clingen pathogenicity"], row["Predicted pathogenicity"])] += int(
+                row["Variants counts"]
+            )
+    return comparison_dict
+
+
+def write_table_tsv(rows, columns, tsv_file):
+    # layout of DataFrame.to_csv(sep="\t") with the labels as index
+    with open(tsv_file, "w", newline="") as fh:
+        writer = csv.writer(fh, delimiter="\t", lineterminator="\n")
+        writer.writerow([""] + columns)
+        writer.writerows(rows)
+
+
+def write_strata_reports(name, strata, output_dir, top_k=20, min_variants=10, index_mapping=COMPETITOR_INDEX_MAPPING):
+    """
+    {name}_strata_{field}.tsv with the metrics of every stratum and {name}_worst_{field}.tsv with the
+    top_k strata of lowest weighted F1, for each field of strata; returns the written files.
+    strata filled with raw labels need an index_mapping that covers them (TierModel.index_mapping)
+    """
+    written = []
+    for field in strata.fields:
+        for report, rows in (
+                ("strata", strata.metrics(field, index_mapping)),
+                ("worst", strata.worst(field, index_mapping, top_k=top_k, min_variants=min_variants)),
+        ):
+            tsv_file = os.path.join(output_dir, f"{name}_{report}_{field}.tsv")
+            write_table_tsv(rows, strata_metric_columns(), tsv_file)
+            written.append(tsv_file)
+    return written
+
+
+def tier_sweep_rows(tier_counts, platform, models=None):
+    """
+    (tier, tier model, merge VUS, F1, precision, recall) rows of every tier model (TIER_MODELS by default)
+    with VUS sub-tiers kept and merged, each a projection of the platform's tier_counts
+    """
+    rows = []
+    for model in models or TIER_MODELS.values():
+        for merge_vus in (False, True):
+            matrix, labels = tier_counts.project(model, platform_label_mapping(platform, merge_vus))
+            rows.extend((row[0], model.name, merge_vus) + row[1:] for row in statistics_rows(matrix, labels))
+    return rows
+
+
+def trend_rows(release_counts, platform, releases, models=None):
+    """
+    (tier, release, tier model, F1, precision, recall) rows for every release and tier model (TIER_MODELS by
+    default), each a projection of the platform's raw label counts in that release (compare_platform_releases);
+    releases the platform was not scored against are left out
+    """
+    label_mapping = platform_label_mapping(platform)
+    pairs = defaultdict(dict)
+    for (release, truth_label, raw_label), count in release_counts.items():
+        pairs[release][(truth_label, raw_label)] = count
+    rows = []
+    for release in releases:
+        if not pairs[release]:
+            continue
+        tier_counts = TierCounts(pairs[release])
+        for model in models or TIER_MODELS.values():
+            matrix, labels = tier_counts.project(model, label_mapping)
+            rows.extend((row[0], release, model.name) + row[1:] for row in statistics_rows(matrix, labels))
+    return rows
+
+
+def _compare_command(args):
+    truthset_file, platforms = load_platform_config(args.config)
+    load_tier_models(args.config)
+    if args.platform:
+        platforms = [platform for platform in platforms if platform.name in args.platform]
+    cache = ParseCache(args.cache_dir) if args.cache_dir is not None else None
+    with instrumentation.stage("read truthset"):
+        if cache is not None:
+            clingen_truthset = read_clingen_index(truthset_file, cache)
+        else:
+            clingen_truthset = read_clingen(truthset_file)
+    strata_fields = args.stratify.split(",") if args.stratify else None
+    strata_index = None
+    if strata_fields:
+        with instrumentation.stage("read strata"):
+            strata_index = load_strata_index(truthset_file, strata_fields)
+    gene_index = None
+    if args.discordance:
+        with instrumentation.stage("read genes"):
+            gene_index = load_gene_index(truthset_file)
+    os.makedirs(args.output_dir, exist_ok=True)
+    with instrumentation.stage("platform comparisons"):
+        # raw labels are counted once; the configured tiers and the sweep are projections of the same counts
+        comparison_results = run_platform_comparisons(
+            clingen_truthset,
+            platform_jobs(
+                platforms,
+                cache,
+                args.incremental_dir,
+                strata_index,
+                strata_fields,
+                raw_labels=True,
+                discordance_dir=args.output_dir if args.discordance else None,
+                gene_index=gene_index,
+            ),
+        )
+    if args.discordance:
+        for platform in platforms:
+            print(discordance_file(args.output_dir, platform.name))
+    with instrumentation.stage("tsv export"):
+        for platform in platforms:
+            tier_counts = TierCounts(comparison_results[platform.name][0])
+            label_mapping = platform_label_mapping(platform)
+            comparison_dict = tier_counts.comparison_dict(label_mapping)
+            for suffix, index_mapping in (("", COMPETITOR_INDEX_MAPPING), ("_merged", COMPETITOR_INDEX_MAPPING_MERGED)):
+                tsv_file = os.path.join(args.output_dir, f"{platform.name}{suffix}.tsv")
+                write_comparison_tsv(comparison_dict, index_mapping, tsv_file)
+                print(tsv_file)
+            if strata_fields:
+                for tsv_file in write_strata_reports(
+                        platform.name,
+                        comparison_results[platform.name][-1],
+                        args.output_dir,
+                        top_k=args.top_k,
+                        index_mapping=TIER_MODELS["five_tier"].index_mapping(label_mapping),
+                ):
+                    print(tsv_file)
+            if args.tier_sweep:
+                tsv_file = os.path.join(args.output_dir, f"{platform.name}_tier_sweep.tsv")
+                write_table_tsv(
+                    tier_sweep_rows(tier_counts, platform),
+                    ["Tier model", "Merge VUS", "F1", "Precision", "Recall"],
+                    tsv_file,
+                )
+                print(tsv_file)
+
+
+def _trend_command(args):
+    releases = load_truthset_releases(args.config)
+    _, platforms = load_platform_config(args.config)
+    load_tier_models(args.config)
+    if args.platform:
+        platforms = [platform for platform in platforms if platform.name in args.platform]
+    cache = ParseCache(args.cache_dir) if args.cache_dir is not None else None
+    # one release is parsed at a time; only the records it changed are added to the store
+    truthset_releases = TruthsetReleases()
+    for release in releases:
+        with instrumentation.stage(f"read truthset {release.name}"):
+            truthset_releases.add_truthset(release.name, read_clingen(release.file, cache))
+    print(
+        f"{len(truthset_releases.releases)} releases\t{sum(truthset_releases.release_sizes)} variants\t"
+        f"{len(truthset_releases)} distinct records"
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+    with instrumentation.stage("platform comparisons"):
+        comparison_results = run_platform_comparisons(truthset_releases, release_jobs(platforms, releases, cache))
+    release_names = [release.name for release in releases]
+    trends = {}
+    with instrumentation.stage("tsv export"):
+        for platform in platforms:
+            trends[platform.name] = trend_rows(comparison_results[platform.name][0], platform, release_names)
+            tsv_file = os.path.join(args.output_dir, f"{platform.name}_trend.tsv")
+            write_table_tsv(trends[platform.name], ["Release", "Tier model", "F1", "Precision", "Recall"], tsv_file)
+            print(tsv_file)
+    if args.formats:
+        # pandas, plotly and Kaleido are only loaded when the trends are drawn
+        from lib.figure_renderer import FigureRenderer
+        from sankey_diagram import trend_chart
+
+        renderer = FigureRenderer(args.output_dir, formats=args.formats.split(","))
+        with instrumentation.stage("figure export"):
+            for model in TIER_MODELS.values():
+                trend_chart(
+                    {platform.label: trends[platform.name] for platform in platforms},
+                    release_names,
+                    f"trend_{model.name}",
+                    tier_model=model.name,
+                    colors={platform.label: platform.color for platform in platforms},
+                    renderer=renderer,
+                )
+            renderer.render()
+
+
+def _stats_command(args):
+    for tsv_file in args.tsv_files:
+        stem = os.path.splitext(os.path.basename(tsv_file))[0]
+        output_dir = args.output_dir or os.path.dirname(tsv_file)
+        tiers = PATHOGENICITY_TIERS_MERGED if args.merged or stem.endswith("_merged") else PATHOGENICITY_TIERS
+        with instrumentation.stage("statistics"):
+            matrix, labels = build_tier_confusion_matrix(read_comparison_tsv(tsv_file), tiers)
+            statistics_file = os.path.join(output_dir, f"{stem}_statistics.tsv")
+            write_table_tsv(statistics_rows(matrix, labels, tiers), ["F1", "Precision", "Recall"], statistics_file)
+        print(statistics_file)
+        if args.bootstrap:
+            with instrumentation.stage("confidence intervals"):
+                intervals = bootstrap_metrics(matrix, replicates=args.bootstrap, seed=0)
+            rows = interval_rows(intervals, labels)
+            rows = [row for row in rows if row[0] in tiers or row[0] in AVERAGES]
+            intervals_file = os.path.join(output_dir, f"{stem}_confidence_intervals.tsv")
+            write_table_tsv(
+                rows,
+                [f"{column} {bound}" for column in ["F1", "Precision", "Recall"] for bound in ["lower", "upper"]],
+                intervals_file,
+            )
+            print(intervals_file)
+
+
+def _variants_command(args):
+    # pandas is only needed to filter the outcome files
+    frame = query_discordance(
+        args.discordance_file,
+        truth=args.truth,
+        predicted=args.predicted,
+        gene=args.gene,
+        evidence_code=args.evidence_code,
+        evidence=args.evidence,
+        discordant_only=not args.all,
+    )
+    frame = with_evidence_codes(frame)
+    if args.output is None:
+        frame.to_csv(sys.stdout, sep="\t", index=False)
+    else:
+        frame.to_csv(args.output, sep="\t", index=False)
+        print(f"{len(frame)} variants\t{args.output}")
+
+
+def _plot_command(args):
+    # pandas, plotly and Kaleido are only loaded by the subcommand that draws
+    from sankey_diagram import main as plot_main
+
+    truthset_file, platforms = load_platform_config(args.config)
+    plot_main(
+        truthset_file,
+        platforms,
+        cache_dir=args.cache_dir,
+        incremental_dir=args.incremental_dir,
+        bootstrap_replicates=args.bootstrap,
+        figure_formats=args.formats.split(","),
+        discordance=args.discordance,
+    )
+
+
+def cli(argv=None):
+    """
+    python -m pathogenicity_benchmark compare|stats|trend|variants|plot; compare and stats only need NumPy,
+    so a metrics step started once per sample batch does not pay for the plotting stack
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m pathogenicity_benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="score the configured platforms against the truthset and write the comparison TSVs"
+    )
+    compare_parser.add_argument("config", nargs="?", default="platforms.json")
+    compare_parser.add_argument("--platform", action="append", help="only this platform name (repeatable)")
+    compare_parser.add_argument("--output-dir", default=os.path.join("data", "output"))
+    compare_parser.add_argument("--cache-dir", default=None)
+    compare_parser.add_argument("--incremental-dir", default=None)
+    compare_parser.add_argument(
+        "--stratify", default=None, help=f"comma separated strata, any of {', '.join(STRATA_FIELDS)}"
+    )
+    compare_parser.add_argument("--top-k", type=int, default=20, help="strata in the worst-F1 reports")
+    compare_parser.add_argument(
+        "--tier-sweep", action="store_true",
+        help="also write {platform}_tier_sweep.tsv: metrics of every tier model, VUS sub-tiers kept and merged",
+    )
+    compare_parser.add_argument(
+        "--discordance", action="store_true",
+        help="also write every compared variant to {platform}_variants.parquet (.tsv.gz without pyarrow)",
+    )
+    compare_parser.set_defaults(func=_compare_command)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="per-tier F1/precision/recall of comparison TSVs, written next to them as *_statistics.tsv"
+    )
+    stats_parser.add_argument("tsv_files", nargs="+")
+    stats_parser.add_argument("--merged", action="store_true", help="P/VUS/B tiers (default for *_merged.tsv)")
+    stats_parser.add_argument("--bootstrap", type=int, default=0, help="replicates for 95%% confidence intervals")
+    stats_parser.add_argument("--output-dir", default=None)
+    stats_parser.set_defaults(func=_stats_command)
+
+    trend_parser = subparsers.add_parser(
+        "trend", help="score the platforms against every truthset release of the config and write metric trends"
+    )
+    trend_parser.add_argument("config", nargs="?", default="platforms.json")
+    trend_parser.add_argument("--platform", action="append", help="only this platform name (repeatable)")
+    trend_parser.add_argument("--output-dir", default=os.path.join("data", "output"))
+    trend_parser.add_argument("--cache-dir", default=None)
+    trend_parser.add_argument(
+        "--formats", default=None, help="also draw the trends per tier model, comma separated: pdf, png, svg, html"
+    )
+    trend_parser.set_defaults(func=_trend_command)
+
+    variants_parser = subparsers.add_parser(
+        "variants", help="list variants of a compare --discordance file by transition, gene or evidence code"
+    )
+    variants_parser.add_argument("discordance_file")
+    variants_parser.add_argument("--truth", action="append", help="ClinGen tier (repeatable)")
+    variants_parser.add_argument("--predicted", action="append", help="predicted tier (repeatable)")
+    variants_parser.add_argument("--gene", action="append", help="gene symbol (repeatable)")
+    variants_parser.add_argument("--evidence-code", action="append", help="evidence code, e.g. PM2 (repeatable)")
+    variants_parser.add_argument("--evidence", choices=["predicted", "met", "unmet"], default="predicted",
+                                 help="mask --evidence-code is looked up in")
+    variants_parser.add_argument("--all", action="store_true", help="keep concordant variants as well")
+    variants_parser.add_argument("--output", default=None, help="TSV file, default stdout")
+    variants_parser.set_defaults(func=_variants_command)
+
+    plot_parser = subparsers.add_parser("plot", help="full benchmark with Sankey diagrams and radar charts")
+    plot_parser.add_argument("config", nargs="?", default="platforms.json")
+    plot_parser.add_argument("--cache-dir", default=os.path.join("data", "cache"))
+    plot_parser.add_argument("--incremental-dir", default=None)
+    plot_parser.add_argument("--bootstrap", type=int, default=10000)
+    plot_parser.add_argument("--formats", default="pdf", help="comma separated: pdf, png, svg, html")
+    plot_parser.add_argument("--discordance", action="store_true", help="also write per-variant outcome files")
+    plot_parser.set_defaults(func=_plot_command)
+
+    for subparser in (compare_parser, stats_parser, trend_parser, variants_parser, plot_parser):
+        subparser.add_argument(
+            "--metrics-report", default=None,
+            help="write per-stage timings, rows, bytes, peak memory and cache hits here "
+                 "(.prom/.txt: OpenMetrics, else JSON)",
+        )
+        subparser.add_argument("--profile-stage", default=None, help="run this stage under --profiler")
+        subparser.add_argument("--profiler", choices=instrumentation.PROFILERS, default="cprofile")
+        subparser.add_argument("--profile-dir", default=".", help="where the --profile-stage output is written")
+
+    args = parser.parse_args(argv)
+    if args.metrics_report is None and args.profile_stage is None:
+        args.func(args)
+        return 0
+    instrumentation.enable(args.profile_stage, args.profiler, args.profile_dir)
+    try:
+        with instrumentation.stage(args.command):
+            args.func(args)
+    finally:
+        collector = instrumentation.disable()
+    if args.metrics_report is not None:
+        instrumentation.write_report(args.metrics_report, collector.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -1,13 +1,39 @@
 import os
+import sys
+
 import pandas as pd
 
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from lib.confusion_matrix import (
+    aggregate_comparison_dict,
+    build_confusion_matrix,
+    build_tier_confusion_matrix,
+    statistics_rows,
+)
+from lib.baseutils import timed
+from lib.bootstrap import bootstrap_platforms, interval_rows
+from lib.cache import ParseCache
+from lib.figure_renderer import FigureRenderer
+from lib.platform_registry import DEFAULT_COLORS, load_platform_config
+from lib.strata import load_gene_index, load_strata_index
+from lib.tier_models import TIER_MODELS, TierCounts
+from lib.unchangable_variables import (
+    CLINGEN_INDEX_MAPPING,
+    CLINGEN_INDEX_MAPPING_MERGED,
+    COMPETITOR_INDEX_MAPPING,
+    COMPETITOR_INDEX_MAPPING_MERGED,
+    PATHOGENICITY_TIERS,
+    PATHOGENICITY_TIERS_MERGED,
+)
 from pathogenicity_benchmark import (
+    platform_jobs,
+    platform_label_mapping,
     read_clingen,
-    run_competitor_comparison,
-    compare_seq_vs_clingen,
+    read_clingen_index,
+    run_platform_comparisons,
+    write_strata_reports,
 )
 
 
@@ -36,7 +62,13 @@ def create_sankey_subplot(
         node_colors,
         titles,
         subplot_index,
+        subplots=3,
+        gap=0.05,
 ):
+    # subplots share the width evenly, gap apart
+    width = (1 - gap * (subplots - 1)) / subplots
+    start = subplot_index * (width + gap)
+
     # convert to RGB
     node_colors = [f"rgb({color})" for color in node_colors] * 2
 
@@ -56,17 +88,19 @@ def create_sankey_subplot(
                 color=colors,
             ),
             domain=dict(
-                x=[subplot_index * (0.3 + 0.05), subplot_index * (0.3 + 0.05) + 0.3],
+                x=[start, start + width],
                 y=[0, 1],
             ),
         )
     )
 
     # https://stackoverflow.com/questions/67540925/plotly-how-to-write-a-text-over-my-sankey-diagram-columns
+    # titles sit over the node columns, i.e. the left and right edge of the subplot domain
     cols = titles
     for x_coordinate, column_name in enumerate(cols):
         fig.add_annotation(
-            x=subplot_index * (0.3 + 0.08) + 0.25 * x_coordinate,
+            x=start + width * x_coordinate,
+            xanchor="left" if x_coordinate == 0 else "right",
             y=1.05,
             xref="paper",
             yref="paper",
@@ -80,7 +114,7 @@ def create_sankey_subplot(
 
 
 def create_sankey_figure(fig, data_dict, clingen_mapping, competitor_mapping, node_colors, node_labels, titles,
-                         subplot_index):
+                         subplot_index, subplots=3):
     sources, targets, counts, colors = prepare_sankey_data(
         data_dict,
         clingen_mapping,
@@ -97,82 +131,84 @@ def create_sankey_figure(fig, data_dict, clingen_mapping, competitor_mapping, no
         node_colors,
         titles,
         subplot_index,
+        subplots,
     )
 
 
-def dict_to_tsv(comparison_dict, index_mapping, filename_output):
-    # Create a reverse mapping dictionary
-    reverse_competitor_mapping = {v: k for k, v in index_mapping.items()}
+def sankey_diagram(comparison_dicts, titles, clingen_mapping, competitor_mapping, node_colors, node_labels,
+                   filename, renderer=None):
+    """
+    one Sankey subplot per entry of comparison_dicts, titles maps the same keys to the platform labels.
+    with a FigureRenderer the figure is queued for its batch export instead of written right away
+    """
+    fig_comparison = go.Figure()
+    for subplot_index, (name, comparison_dict) in enumerate(comparison_dicts.items()):
+        create_sankey_figure(
+            fig_comparison,
+            comparison_dict,
+            clingen_mapping,
+            competitor_mapping,
+            node_colors,
+            node_labels,
+            ["Clingen", titles[name]],
+            subplot_index,
+            len(comparison_dicts),
+        )
 
-    # Create empty DataFrame
-    df = pd.DataFrame(
-        columns=["Clingen pathogenicity", "Predicted pathogenicity", "Variants counts"]
+    fig_comparison.add_annotation(
+        x=0.5,
+        y=1.1,
+        xref="paper",
+        yref="paper",
+        text="Comparison of Pathogenicity Prediction",
+        showarrow=False,
+        font=dict(
+            family="Courier New, monospace",
+            size=20,
+        ),
     )
+    if renderer is not None:
+        renderer.add(os.path.splitext(filename)[0], fig_comparison)
+    else:
+        fig_comparison.write_image(os.path.join("data", "output", filename), width=1280, height=720)
 
-    # Process and fill the DataFrame
-    for key, value in comparison_dict.items():
-        merged_key = (index_mapping[key[0]], index_mapping[key[1]])
-        clingen_name = reverse_competitor_mapping[merged_key[0]]
-        predicted_name = reverse_competitor_mapping[merged_key[1]]
-        # check if clingen_name, predicted_name pair already exists
-        if df[
-            (df["Clingen pathogenicity"] == clingen_name)
-            & (df["Predicted pathogenicity"] == predicted_name)
-        ].empty:
-            df.loc[len(df.index)] = [clingen_name, predicted_name, value]
-        else:
-            index = df[
-                (df["Clingen pathogenicity"] == clingen_name)
-                & (df["Predicted pathogenicity"] == predicted_name)
-                ].index[0]
-            df.at[index, "Variants counts"] += value
+
+def dict_to_tsv(comparison_dict, index_mapping, filename_output):
+    aggregated = aggregate_comparison_dict(comparison_dict, index_mapping)
+    df = pd.DataFrame(
+        [(clingen_name, predicted_name, value) for (clingen_name, predicted_name), value in
+         aggregated.items()],
+        columns=["Clingen pathogenicity", "Predicted pathogenicity", "Variants counts"],
+    )
 
     # Save as TSV
     df.to_csv(os.path.join("data", "output", filename_output), sep="\t", index=False)
 
+    return df
 
-def calculate_statistics_from_tsv(tsv_file, filename_output, merged=False):
-    df = pd.read_csv(os.path.join("data", "output", tsv_file), sep="\t")
-    result_df = pd.DataFrame(columns=["F1", "Precision", "Recall"])
-    pathogenicity_values = ["P", "LP", "VUS", "LB", "B"]
-    if merged:
-        pathogenicity_values = ["P", "VUS", "B"]
-
-    for patho in pathogenicity_values:
-        relevant_data = df
-
-        true_positives = relevant_data[
-            (relevant_data["Predicted pathogenicity"] == patho)
-            & (relevant_data["Clingen pathogenicity"] == patho)
-            ]["Variants counts"].sum()
-
-        false_positives = relevant_data[
-            (relevant_data["Predicted pathogenicity"] == patho)
-            & (relevant_data["Clingen pathogenicity"] != patho)
-            ]["Variants counts"].sum()
-
-        false_negatives = relevant_data[
-            (relevant_data["Predicted pathogenicity"] != patho)
-            & (relevant_data["Clingen pathogenicity"] == patho)
-            ]["Variants counts"].sum()
-
-        # Calculation of metrics (assuming you already have the above)
-        if true_positives + false_positives > 0:
-            precision = true_positives / (true_positives + false_positives)
-            precision = round(precision, 3)
-        else:
-            precision = 0  # Handle division by zero
 
-        if true_positives + false_negatives > 0:
-            recall = true_positives / (true_positives + false_negatives)
-            recall = round(recall, 3)
-        else:
-            recall = 0
+def dicts_to_tsv(comparison_dicts, index_mappings):
+    """
+    writes every platform x tier model combination in one call, e.g.
+    comparison_dicts={"seq_ensembl": ..., "competitor": ...} and index_mappings={"": five_tier, "_merged": merged}
+    produce seq_ensembl.tsv, seq_ensembl_merged.tsv, competitor.tsv and competitor_merged.tsv
+    """
+    return {
+        (name, suffix): dict_to_tsv(comparison_dict, index_mapping, f"{name}{suffix}.tsv")
+        for name, comparison_dict in comparison_dicts.items()
+        for suffix, index_mapping in index_mappings.items()
+    }
+
+
+def statistics_to_dataframe(matrix, labels, tiers=None):
+    rows = statistics_rows(matrix, labels, tiers)
+    return pd.DataFrame(
+        [row[1:] for row in rows], index=[row[0] for row in rows], columns=["F1", "Precision", "Recall"]
+    )
 
-        f1 = 2 * (precision * recall) / (precision + recall)
-        f1 = round(f1, 3)
 
-        result_df.loc[patho] = [f1, precision, recall]
+def save_statistics(matrix, labels, filename_output):
+    result_df = statistics_to_dataframe(matrix, labels)
 
     # save to data folder
     result_df.to_csv(os.path.join("data", "output", filename_output), sep="\t")
@@ -180,83 +216,116 @@ def calculate_statistics_from_tsv(tsv_file, filename_output, merged=False):
     return result_df
 
 
-def radar_chart(seq_ensembl_stat, seq_refseq_stat, competitor_stat, filename, merged=False):
-    # set same grid for every subplot
-    fig_radar = make_subplots(rows=1, cols=3, specs=[[{"type": "polar"}] * 3] * 1)
+def calculate_statistics(comparison_dict, index_mapping, filename_output):
+    matrix, labels = build_confusion_matrix(comparison_dict, index_mapping)
+    return save_statistics(matrix, labels, filename_output)
 
-    categories = ["P", "LP", "VUS", "LB", "B"]
-    if merged:
-        categories = ["P", "VUS", "B"]
 
-    # Define colors for each group
-    color_map = {"SEQ-Ensembl": "blue", "SEQ-RefSeq": "lightgreen", "Competitor": "salmon"}
+def calculate_projected_statistics(tier_counts, tier_model, label_mapping, filename_output):
+    """calculate_statistics for a tier model, projected from raw label counts instead of rebuilt from a dict"""
+    matrix, labels = tier_counts.project(tier_model, label_mapping)
+    return save_statistics(matrix, labels, filename_output)
+
+
+def calculate_statistics_from_tsv(tsv_file, filename_output, merged=False):
+    df = pd.read_csv(os.path.join("data", "output", tsv_file), sep="\t")
+    pathogenicity_values = PATHOGENICITY_TIERS_MERGED if merged else PATHOGENICITY_TIERS
+
+    comparison_dict = (
+        df.groupby(["Clingen pathogenicity", "Predicted pathogenicity"])["Variants counts"]
+        .sum()
+        .to_dict()
+    )
+    matrix, labels = build_tier_confusion_matrix(comparison_dict, pathogenicity_values)
+    result_df = statistics_to_dataframe(matrix, labels, tiers=pathogenicity_values)
+
+    # save to data folder
+    result_df.to_csv(os.path.join("data", "output", filename_output), sep="\t")
+
+    return result_df
+
+
+def intervals_to_dataframe(intervals, labels, decimals=3):
+    rows = interval_rows(intervals, labels, decimals)
+    return pd.DataFrame(
+        [row[1:] for row in rows],
+        index=[row[0] for row in rows],
+        columns=[f"{column} {bound}" for column in ["F1", "Precision", "Recall"] for bound in ["lower", "upper"]],
+    )
+
+
+def calculate_confidence_intervals(comparison_dicts, index_mappings, replicates=10000, confidence=0.95, seed=None):
+    """
+    bootstrap CIs for every (name, comparison_dict, index_mapping) entry of comparison_dicts, computed in
+    parallel and written to {name}_confidence_intervals.tsv; index_mappings is keyed like comparison_dicts
+    """
+    matrices = {}
+    labels = {}
+    for name, comparison_dict in comparison_dicts.items():
+        matrices[name], labels[name] = build_confusion_matrix(comparison_dict, index_mappings[name])
+    intervals = bootstrap_platforms(matrices, replicates=replicates, confidence=confidence, seed=seed)
+
+    result = {}
+    for name in comparison_dicts:
+        result[name] = intervals_to_dataframe(intervals[name], labels[name])
+        result[name].to_csv(os.path.join("data", "output", f"{name}_confidence_intervals.tsv"), sep="\t")
+    return result
 
-    for group, color in color_map.items():
-        fig_radar.add_trace(
-            go.Scatterpolar(
-                r=(
-                    seq_ensembl_stat.loc[categories]["F1"].values
-                    if group == "SEQ-Ensembl"
-                    else (
-                        seq_refseq_stat.loc[categories]["F1"].values
-                        if group == "SEQ-RefSeq"
-                        else competitor_stat.loc[categories]["F1"].values
-                    )
-                ),
-                theta=categories,
-                fill="toself",
-                name=group,
-                marker=dict(color=color),  # Assign color based on the group
-                legendgroup=group,
-                showlegend=True,
-            ),
-            row=1,
-            col=1,
-        )
 
-        fig_radar.add_trace(
+def add_interval_band(fig, interval_df, metric, categories, color, group, row, col):
+    # lower ring without a line, upper ring filled down to it; both closed by repeating the first tier
+    theta = categories + categories[:1]
+    for bound, fill in (("lower", "none"), ("upper", "tonext")):
+        values = interval_df.loc[categories][f"{metric} {bound}"].values
+        fig.add_trace(
             go.Scatterpolar(
-                r=(
-                    seq_ensembl_stat.loc[categories]["Recall"].values
-                    if group == "SEQ-Ensembl"
-                    else (
-                        seq_refseq_stat.loc[categories]["Recall"].values
-                        if group == "SEQ-RefSeq"
-                        else competitor_stat.loc[categories]["Recall"].values
-                    )
-                ),
-                theta=categories,
-                fill="toself",
-                name=group,
-                marker=dict(color=color),  # Assign color based on the group
+                r=list(values) + list(values[:1]),
+                theta=theta,
+                mode="lines",
+                line=dict(width=0),
+                fill=fill,
+                fillcolor=color,
+                opacity=0.25,
+                name=f"{group} 95% CI",
                 legendgroup=group,
                 showlegend=False,
+                hoverinfo="skip",
             ),
-            row=1,
-            col=2,
+            row=row,
+            col=col,
         )
 
-        fig_radar.add_trace(
-            go.Scatterpolar(
-                r=(
-                    seq_ensembl_stat.loc[categories]["Precision"].values
-                    if group == "SEQ-Ensembl"
-                    else (
-                        seq_refseq_stat.loc[categories]["Precision"].values
-                        if group == "SEQ-RefSeq"
-                        else competitor_stat.loc[categories]["Precision"].values
-                    )
+
+def radar_chart(platform_stats, filename, merged=False, intervals=None, colors=None, renderer=None):
+    """
+    platform_stats maps legend labels to statistics tables, one trace per platform in each polar subplot;
+    colors maps the same labels to trace colors, intervals to intervals_to_dataframe results drawn as bands.
+    with a FigureRenderer the figure is queued for its batch export instead of written right away
+    """
+    # set same grid for every subplot
+    fig_radar = make_subplots(rows=1, cols=3, specs=[[{"type": "polar"}] * 3] * 1)
+
+    categories = PATHOGENICITY_TIERS_MERGED if merged else PATHOGENICITY_TIERS
+
+    colors = colors or {}
+    for position, (group, stat) in enumerate(platform_stats.items()):
+        color = colors.get(group, DEFAULT_COLORS[position % len(DEFAULT_COLORS)])
+        for col, metric in enumerate(["F1", "Recall", "Precision"], start=1):
+            fig_radar.add_trace(
+                go.Scatterpolar(
+                    r=stat.loc[categories][metric].values,
+                    theta=categories,
+                    fill="toself",
+                    name=group,
+                    marker=dict(color=color),  # Assign color based on the group
+                    legendgroup=group,
+                    showlegend=col == 1,
                 ),
-                theta=categories,
-                fill="toself",
-                name=group,
-                marker=dict(color=color),  # Assign color based on the group
-                legendgroup=group,
-                showlegend=False,
-            ),
-            row=1,
-            col=3,
-        )
+                row=1,
+                col=col,
+            )
+            if intervals is not None:
+                add_interval_band(fig_radar, intervals[group], metric, categories, color, group, row=1, col=col)
 
     fig_radar.update_layout(
         autosize=False,
@@ -305,65 +374,125 @@ def radar_chart(seq_ensembl_stat, seq_refseq_stat, competitor_stat, filename, me
         ),
     )
 
-    fig_radar.write_image(os.path.join("data", "output", filename), width=1280, height=720)
+    if renderer is not None:
+        renderer.add(os.path.splitext(filename)[0], fig_radar)
+    else:
+        fig_radar.write_image(os.path.join("data", "output", filename), width=1280, height=720)
+
+
+def trend_chart(platform_trends, releases, filename, tier_model="five_tier", average="weighted", colors=None,
+                renderer=None):
+    """
+    platform_trends maps legend labels to pathogenicity_benchmark.trend_rows, one line per platform in each of the
+    F1, recall and precision subplots: the average of tier_model across releases, in the order of releases.
+    with a FigureRenderer the figure is queued for its batch export instead of written right away
+    """
+    fig_trend = make_subplots(rows=1, cols=3, subplot_titles=["F1", "Recall", "Precision"], shared_yaxes=True)
+
+    colors = colors or {}
+    for position, (group, rows) in enumerate(platform_trends.items()):
+        color = colors.get(group, DEFAULT_COLORS[position % len(DEFAULT_COLORS)])
+        trend = pd.DataFrame(rows, columns=["Tier", "Release", "Tier model", "F1", "Precision", "Recall"])
+        # trend_rows come in release order
+        trend = trend[(trend["Tier"] == average) & (trend["Tier model"] == tier_model)].set_index("Release")
+        for col, metric in enumerate(["F1", "Recall", "Precision"], start=1):
+            fig_trend.add_trace(
+                go.Scatter(
+                    x=trend.index,
+                    y=trend[metric].values,
+                    mode="lines+markers",
+                    name=group,
+                    marker=dict(color=color),
+                    legendgroup=group,
+                    showlegend=col == 1,
+                ),
+                row=1,
+                col=col,
+            )
+
+    fig_trend.update_layout(autosize=False, width=1280, height=720, showlegend=True)
+    fig_trend.update_xaxes(type="category", categoryorder="array", categoryarray=list(releases))
+    fig_trend.update_yaxes(range=[0, 1])
+
+    if renderer is not None:
+        renderer.add(os.path.splitext(filename)[0], fig_trend)
+    else:
+        fig_trend.write_image(os.path.join("data", "output", filename), width=1280, height=720)
 
 
 def main(
         clingen_json_file,
-        seq_refseq_annotation_file,
-        seq_ensembl_annotation_file,
-        competitor_annotation_file,
+        platforms,
+        cache_dir=None,
+        incremental_dir=None,
+        bootstrap_replicates=10000,
+        figure_formats=("pdf",),
+        strata_fields=None,
+        discordance=False,
 ):
+    """
+    benchmarks every registry Platform against one loaded truthset, each platform in its own process.
+    cache_dir keeps pre-parsed inputs between runs; None parses everything from scratch.
+    incremental_dir keeps per-variant outcomes so a rerun only scores variants that changed since the last one.
+    bootstrap_replicates sets the resamples behind the 95% confidence intervals; None skips them.
+    figure_formats lists the formats every figure is exported in (pdf, png, svg, html).
+    strata_fields (e.g. ["gene_symbol", "variant_class"]) adds per-stratum metrics and worst-F1 reports,
+    collected in the same pass as the comparisons.
+    discordance writes every compared variant to {platform}_variants.parquet (.tsv.gz without pyarrow)
+    """
     # check if output folder exists
     if not os.path.exists(os.path.join("data", "output")):
         os.makedirs(os.path.join("data", "output"))
 
     # process data
-    clingen_truthset_dict = read_clingen(clingen_json_file)
-    (
-        seq_ensembl_pathogenicity_comparison_dict,
-        seq_ensembl_evidence_code_comparison_dict,
-    ) = compare_seq_vs_clingen(seq_ensembl_annotation_file)
-    (
-        seq_refseq_pathogenicity_comparison_dict,
-        seq_refseq_evidence_code_comparison_dict,
-    ) = compare_seq_vs_clingen(seq_refseq_annotation_file)
-    (
-        competitor_pathogenicity_comparison_dict,
-        competitor_evidence_code_comparison_dict,
-        competitor_double_counting_dict,
-        missing,
-    ) = run_competitor_comparison(
-        competitor_annotation_file, clingen_truthset_dict, merge_vus=True
-    )
+    timings = {}
+    cache = ParseCache(cache_dir) if cache_dir is not None else None
+    renderer = FigureRenderer(os.path.join("data", "output"), formats=figure_formats)
+    with timed("read truthset", timings):
+        if cache is not None:
+            clingen_truthset = read_clingen_index(clingen_json_file, cache)
+        else:
+            clingen_truthset = read_clingen(clingen_json_file)
+    strata_index = None
+    if strata_fields:
+        with timed("read strata", timings):
+            strata_index = load_strata_index(clingen_json_file, strata_fields)
+    gene_index = None
+    if discordance:
+        with timed("read genes", timings):
+            gene_index = load_gene_index(clingen_json_file)
+    with timed("platform comparisons", timings):
+        # Kaleido starts up while the platforms are compared
+        comparison_results = run_platform_comparisons(
+            clingen_truthset,
+            platform_jobs(
+                platforms,
+                cache,
+                incremental_dir,
+                strata_index,
+                strata_fields,
+                raw_labels=True,
+                discordance_dir=os.path.join("data", "output") if discordance else None,
+                gene_index=gene_index,
+            ),
+            timings=timings,
+            while_waiting=renderer.warm_up,
+        )
+    # every comparison returns the pathogenicity dict first, here with the platform labels as reported;
+    # every tier scheme below is a relabelling or projection of these counts, never another pass over the input
+    tier_counts = {platform.name: TierCounts(comparison_results[platform.name][0]) for platform in platforms}
+    label_mappings = {platform.name: platform_label_mapping(platform) for platform in platforms}
+    pathogenicity_comparison_dicts = {
+        platform.name: tier_counts[platform.name].comparison_dict(label_mappings[platform.name])
+        for platform in platforms
+    }
+    labels = {platform.name: platform.label for platform in platforms}
 
     # define index mappings
-    clingen_index_mapping = {"P": 0, "LP": 1, "VUS": 2, "LB": 3, "B": 4}
-    competitor_index_mapping = {
-        "P": 5,
-        "LP": 6,
-        "VUS++": 7,
-        "VUS+": 7,
-        "VUS": 7,
-        "LB": 8,
-        "B": 9,
-    }
-    clingen_index_mapping_merged = {
-        "LP": 0,
-        "P": 0,
-        "VUS": 1,
-        "LB": 2,
-        "B": 2,
-    }  # LP should be before P
-    competitor_index_mapping_merged = {
-        "LP": 3,
-        "P": 3,
-        "VUS++": 4,
-        "VUS+": 4,
-        "VUS": 4,
-        "LB": 5,
-        "B": 5,
-    }  # LP should be before P
+    clingen_index_mapping = CLINGEN_INDEX_MAPPING
+    competitor_index_mapping = COMPETITOR_INDEX_MAPPING
+    clingen_index_mapping_merged = CLINGEN_INDEX_MAPPING_MERGED
+    competitor_index_mapping_merged = COMPETITOR_INDEX_MAPPING_MERGED
 
     # define node colors
     node_colors = [
@@ -383,192 +512,111 @@ def main(
     node_labels = ["P", "LP", "VUS", "LB", "B", "P", "LP", "VUS", "LB", "B"]
     node_labels_merged = ["P/LP", "VUS", "B/LB", "P/LP", "VUS", "B/LB"]
 
-    # Create a figure with subplots
-    fig_comparison = go.Figure()
-
-    create_sankey_figure(
-        fig_comparison,
-        seq_ensembl_pathogenicity_comparison_dict,
-        clingen_index_mapping,
-        competitor_index_mapping,
-        node_colors,
-        node_labels,
-        ["Clingen", "SEQ-Ensembl"],
-        0,
-    )
-
-    create_sankey_figure(
-        fig_comparison,
-        seq_refseq_pathogenicity_comparison_dict,
-        clingen_index_mapping,
-        competitor_index_mapping,
-        node_colors,
-        node_labels,
-        ["Clingen", "SEQ-RefSeq"],
-        1,
-    )
-
-    create_sankey_figure(
-        fig_comparison,
-        competitor_pathogenicity_comparison_dict,
-        clingen_index_mapping,
-        competitor_index_mapping,
-        node_colors,
-        node_labels,
-        ["Clingen", "Competitor"],
-        2,
-    )
-
-    fig_comparison.add_annotation(
-        x=0.5,
-        y=1.1,
-        xref="paper",
-        yref="paper",
-        text="Comparison of Pathogenicity Prediction",
-        showarrow=False,
-        font=dict(
-            family="Courier New, monospace",
-            size=20,
-        ),
-    )
-    fig_comparison.write_image(os.path.join("data", "output", "sankey_diagram.pdf"), width=1280, height=720)
-
-    # Create a figure with merged subplots
-    fig_comparison_merged = go.Figure()
-
-    create_sankey_figure(
-        fig_comparison_merged,
-        seq_ensembl_pathogenicity_comparison_dict,
-        clingen_index_mapping_merged,
-        competitor_index_mapping_merged,
-        node_colors_merged,
-        node_labels_merged,
-        ["Clingen", "SEQ-Ensembl"],
-        0,
-    )
-
-    create_sankey_figure(
-        fig_comparison_merged,
-        seq_refseq_pathogenicity_comparison_dict,
-        clingen_index_mapping_merged,
-        competitor_index_mapping_merged,
-        node_colors_merged,
-        node_labels_merged,
-        ["Clingen", "SEQ-RefSeq"],
-        1,
-    )
-
-    create_sankey_figure(
-        fig_comparison_merged,
-        competitor_pathogenicity_comparison_dict,
-        clingen_index_mapping_merged,
-        competitor_index_mapping_merged,
-        node_colors_merged,
-        node_labels_merged,
-        ["Clingen", "Competitor"],
-        2,
-    )
+    with timed("sankey diagrams", timings):
+        sankey_diagram(
+            pathogenicity_comparison_dicts,
+            labels,
+            clingen_index_mapping,
+            competitor_index_mapping,
+            node_colors,
+            node_labels,
+            "sankey_diagram.pdf",
+            renderer=renderer,
+        )
+        sankey_diagram(
+            pathogenicity_comparison_dicts,
+            labels,
+            clingen_index_mapping_merged,
+            competitor_index_mapping_merged,
+            node_colors_merged,
+            node_labels_merged,
+            "sankey_diagram_merged.pdf",
+            renderer=renderer,
+        )
 
-    fig_comparison_merged.add_annotation(
-        x=0.5,
-        y=1.1,
-        xref="paper",
-        yref="paper",
-        text="Comparison of Pathogenicity Prediction",
-        showarrow=False,
-        font=dict(
-            family="Courier New, monospace",
-            size=20,
-        ),
-    )
-    fig_comparison_merged.write_image(os.path.join("data", "output", "sankey_diagram_merged.pdf"), width=1280, height=720)
+    with timed("tsv export", timings):
+        # Save the comparison data as TSV
+        dicts_to_tsv(
+            pathogenicity_comparison_dicts,
+            {
+                "": competitor_index_mapping,
+                "_merged": competitor_index_mapping_merged,
+            },
+        )
 
-    # Save the comparison data as TSV
-    dict_to_tsv(
-        seq_ensembl_pathogenicity_comparison_dict,
-        competitor_index_mapping,
-        "seq_ensembl.tsv",
-    )
-    dict_to_tsv(
-        seq_refseq_pathogenicity_comparison_dict,
-        competitor_index_mapping,
-        "seq_refseq.tsv",
-    )
-    dict_to_tsv(
-        competitor_pathogenicity_comparison_dict,
-        clingen_index_mapping,
-        "competitor.tsv"
-    )
-    dict_to_tsv(
-        seq_ensembl_pathogenicity_comparison_dict,
-        competitor_index_mapping_merged,
-        "seq_ensembl_merged.tsv",
-    )
-    dict_to_tsv(
-        seq_refseq_pathogenicity_comparison_dict,
-        competitor_index_mapping_merged,
-        "seq_refseq_merged.tsv",
-    )
-    dict_to_tsv(
-        competitor_pathogenicity_comparison_dict,
-        clingen_index_mapping_merged,
-        "competitor_merged.tsv",
-    )
+    # predicted labels of every format map onto the competitor tiers, which cover the ClinGen ones
+    index_mappings = {"": competitor_index_mapping, "_merged": competitor_index_mapping_merged}
+    tier_models = {"": TIER_MODELS["five_tier"], "_merged": TIER_MODELS["three_tier"]}
+    with timed("statistics", timings):
+        # Calculate statistics
+        statistics = {
+            (platform.name, suffix): calculate_projected_statistics(
+                tier_counts[platform.name],
+                tier_model,
+                label_mappings[platform.name],
+                f"{platform.name}{suffix}_statistics.tsv",
+            )
+            for suffix, tier_model in tier_models.items()
+            for platform in platforms
+        }
+
+    if strata_fields:
+        with timed("strata reports", timings):
+            for platform in platforms:
+                write_strata_reports(
+                    platform.name,
+                    comparison_results[platform.name][-1],
+                    os.path.join("data", "output"),
+                    index_mapping=tier_models[""].index_mapping(label_mappings[platform.name]),
+                )
+
+    confidence_intervals = None
+    if bootstrap_replicates:
+        with timed("confidence intervals", timings):
+            confidence_intervals = calculate_confidence_intervals(
+                {
+                    f"{platform.name}{suffix}": pathogenicity_comparison_dicts[platform.name]
+                    for suffix in index_mappings
+                    for platform in platforms
+                },
+                {
+                    f"{platform.name}{suffix}": index_mapping
+                    for suffix, index_mapping in index_mappings.items()
+                    for platform in platforms
+                },
+                replicates=bootstrap_replicates,
+                # a fixed seed keeps reruns, and so the radar chart exports, reproducible
+                seed=0,
+            )
+
+    with timed("radar charts", timings):
+        for suffix in index_mappings:
+            radar_chart(
+                {platform.label: statistics[(platform.name, suffix)] for platform in platforms},
+                f"radar_chart{suffix}.pdf",
+                merged=suffix == "_merged",
+                intervals=(
+                    None
+                    if confidence_intervals is None
+                    else {platform.label: confidence_intervals[f"{platform.name}{suffix}"] for platform in platforms}
+                ),
+                colors={platform.label: platform.color for platform in platforms},
+                renderer=renderer,
+            )
 
-    # Calculate statistics
-    seq_ensembl_stat = calculate_statistics_from_tsv(
-        "seq_ensembl.tsv",
-        "seq_ensembl_statistics.tsv"
-    )
-    seq_refseq_stat = calculate_statistics_from_tsv(
-        "seq_refseq.tsv",
-        "seq_refseq_statistics.tsv"
-    )
-    competitor_stat = calculate_statistics_from_tsv(
-        "competitor.tsv",
-        "competitor_statistics.tsv"
-    )
-    seq_ensembl_stat_merged = calculate_statistics_from_tsv(
-        "seq_ensembl_merged.tsv",
-        "seq_ensembl_merged_statistics.tsv",
-        merged=True,
-    )
-    seq_refseq_stat_merged = calculate_statistics_from_tsv(
-        "seq_refseq_merged.tsv",
-        "seq_refseq_merged_statistics.tsv",
-        merged=True,
-    )
-    competitor_stat_merged = calculate_statistics_from_tsv(
-        "competitor_merged.tsv",
-        "competitor_merged_statistics.tsv",
-        merged=True
-    )
+    with timed("figure export", timings):
+        renderer.render()
 
-    radar_chart(
-        seq_ensembl_stat,
-        seq_refseq_stat,
-        competitor_stat,
-        "radar_chart.pdf"
-    )
-    radar_chart(
-        seq_ensembl_stat_merged,
-        seq_refseq_stat_merged,
-        competitor_stat_merged,
-        "radar_chart_merged.pdf",
-        merged=True,
-    )
+    for stage, seconds in timings.items():
+        print(f"{stage}\t{seconds:.2f}s")
+    return timings
 
 
 if __name__ == "__main__":
-    clingen_json_file_path = os.path.join("data", "clingen", "clingen_variant_hg38.json.gz")
-    seq_ensembl_annotation_file_path = os.path.join("data", "seq", "clingen_annotation_2024feb_ensembl.json.gz")
-    seq_refseq_annotation_file_path = os.path.join("data", "seq", "clingen_annotation_2024feb_refseq.json.gz")
-    competitor_annotation_file_path = (
-        os.path.join("data", "competitor", "competitor_clingen2024feb_hg38_variant_annotation.tsv.gz")
-    )
+    # an alternative config (any number of platforms and releases) can be given as the first argument
+    truthset_file, benchmark_platforms = load_platform_config(sys.argv[1] if len(sys.argv) > 1 else "platforms.json")
     main(
-        clingen_json_file_path,
-        seq_refseq_annotation_file_path,
-        seq_ensembl_annotation_file_path,
-        competitor_annotation_file_path,
+        truthset_file,
+        benchmark_platforms,
+        cache_dir=os.path.join("data", "cache"),
     )
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_cli_import_skips_pandas_and_plotly():
+    # a fresh interpreter, since the test session may already have imported both
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import pathogenicity_benchmark, sys; assert 'pandas' not in sys.modules and 'plotly' not in sys.modules",
+        ],
+        cwd=Path(__file__).resolve().parent.parent,
+        check=True,
+    )
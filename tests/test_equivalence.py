@@ -0,0 +1,67 @@
+import pytest
+
+from benchmarks.synthetic_data import synthetic_dataset
+from lib.cache import ParseCache
+from lib.truthset import load_clingen_truthset
+from pathogenicity_benchmark import (
+    compare_seq_vs_clingen,
+    compare_seq_vs_clingen_incremental,
+    read_clingen_index,
+    run_competitor_comparison,
+    run_competitor_comparison_incremental,
+)
+
+# small blocks, so the multi-process runs split the input across several blocks and workers
+BLOCK_SIZE = 1 << 14
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return synthetic_dataset(tmp_path_factory.mktemp("synthetic"), 2000)
+
+
+def _as_dicts(result):
+    return [value if isinstance(value, int) else dict(value) for value in result]
+
+
+@pytest.mark.parametrize("merge_vus", [False, True])
+def test_seq_runs_equal_serial(dataset, tmp_path, merge_vus):
+    serial = _as_dicts(compare_seq_vs_clingen(dataset["seq"], merge_vus=merge_vus))
+    assert serial[0]
+    parallel = compare_seq_vs_clingen(dataset["seq"], merge_vus=merge_vus, processes=2, block_size=BLOCK_SIZE)
+    assert _as_dicts(parallel) == serial
+    cache = ParseCache(tmp_path / "cache")
+    for _ in range(2):
+        # the first run fills the cache, the second reads it back
+        assert _as_dicts(compare_seq_vs_clingen(dataset["seq"], merge_vus=merge_vus, cache=cache)) == serial
+    assert cache.misses == 1 and cache.hits == 1
+    state_file = tmp_path / "seq_state.npz"
+    for _ in range(2):
+        incremental = compare_seq_vs_clingen_incremental(dataset["seq"], state_file, merge_vus=merge_vus)
+        assert _as_dicts(incremental) == serial
+
+
+@pytest.mark.parametrize("merge_vus", [False, True])
+def test_competitor_runs_equal_serial(dataset, tmp_path, merge_vus):
+    truthset = load_clingen_truthset(dataset["clingen"])
+    serial = _as_dicts(run_competitor_comparison(dataset["competitor"], truthset, merge_vus=merge_vus))
+    assert serial[0]
+    cache = ParseCache(tmp_path / "cache")
+    # the memory-mapped index the CLI joins against when a cache dir is set
+    for clingen_truthset in (truthset, read_clingen_index(dataset["clingen"], cache)):
+        parallel = run_competitor_comparison(
+            dataset["competitor"], clingen_truthset, merge_vus=merge_vus, processes=2, block_size=BLOCK_SIZE
+        )
+        assert _as_dicts(parallel) == serial
+        columnar = run_competitor_comparison(
+            dataset["competitor"], clingen_truthset, merge_vus=merge_vus, engine="columnar", block_size=BLOCK_SIZE
+        )
+        assert _as_dicts(columnar) == serial
+        cached = run_competitor_comparison(dataset["competitor"], clingen_truthset, merge_vus=merge_vus, cache=cache)
+        assert _as_dicts(cached) == serial
+        state_file = tmp_path / "competitor_state.npz"
+        for _ in range(2):
+            incremental = run_competitor_comparison_incremental(
+                dataset["competitor"], clingen_truthset, state_file, merge_vus=merge_vus
+            )
+            assert _as_dicts(incremental) == serial
@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+
+from benchmarks.synthetic_data import synthetic_dataset
+from lib.truthset import load_clingen_truthset
+from pathogenicity_benchmark import (
+    compare_seq_vs_clingen,
+    compare_seq_vs_clingen_incremental,
+    run_competitor_comparison,
+    run_competitor_comparison_incremental,
+)
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return synthetic_dataset(tmp_path_factory.mktemp("synthetic"), 400)
+
+
+def _edit_lines(source, target, appended):
+    # drops every fifth data line and appends the given lines plus a copy of an existing one
+    with gzip.open(source, "rt", encoding="utf-8") as infile:
+        lines = infile.readlines()
+    header = [line for line in lines[:1] if line.startswith(("#", "Variant"))]
+    data = lines[len(header):]
+    kept = [line for position, line in enumerate(data) if position % 5 != 0]
+    with gzip.open(target, "wt", encoding="utf-8") as outfile:
+        outfile.writelines(header + kept + appended + kept[:1])
+
+
+def _as_dicts(result):
+    return [value if isinstance(value, int) else dict(value) for value in result]
+
+
+def test_seq_rerun_equals_full_recompute(dataset, tmp_path):
+    state_file = tmp_path / "seq_state.npz"
+    edited = tmp_path / "seq_edited.json.gz"
+    other = synthetic_dataset(tmp_path / "other", 40, seed=1)
+    with gzip.open(other["seq"], "rt", encoding="utf-8") as infile:
+        appended = infile.readlines()
+    _edit_lines(dataset["seq"], edited, appended)
+
+    first = compare_seq_vs_clingen_incremental(dataset["seq"], state_file)
+    assert _as_dicts(first) == _as_dicts(compare_seq_vs_clingen(dataset["seq"]))
+    rerun = compare_seq_vs_clingen_incremental(str(edited), state_file)
+    assert _as_dicts(rerun) == _as_dicts(compare_seq_vs_clingen(str(edited)))
+
+
+def test_competitor_rerun_equals_full_recompute(dataset, tmp_path):
+    truthset = load_clingen_truthset(dataset["clingen"])
+    state_file = tmp_path / "competitor_state.npz"
+    edited = tmp_path / "competitor_edited.tsv.gz"
+    with gzip.open(dataset["competitor"], "rt", encoding="utf-8") as infile:
+        rows = infile.readlines()[1:]
+    # rows of truthset variants under another label, and a variant outside the truthset
+    appended = [row.replace("\tPathogenic\t", "\tBenign\t") for row in rows[:30]]
+    outside = rows[0].split("\t")
+    outside[2] = "999999999"
+    appended.append("\t".join(outside))
+    _edit_lines(dataset["competitor"], edited, appended)
+
+    for merge_vus in (False, True):
+        first = run_competitor_comparison_incremental(dataset["competitor"], truthset, state_file, merge_vus=merge_vus)
+        full = run_competitor_comparison(dataset["competitor"], truthset, merge_vus=merge_vus)
+        assert _as_dicts(first) == _as_dicts(full)
+        rerun = run_competitor_comparison_incremental(str(edited), truthset, state_file, merge_vus=merge_vus)
+        assert _as_dicts(rerun) == _as_dicts(run_competitor_comparison(str(edited), truthset, merge_vus=merge_vus))
@@ -0,0 +1,58 @@
+import gzip
+import importlib.util
+import shutil
+
+import pytest
+
+from lib.baseutils import open_text
+
+LINES = "".join(f"row\t{row}\n" for row in range(20000))
+
+
+def _available(decompressor):
+    if decompressor == "isal":
+        return importlib.util.find_spec("isal") is not None
+    if decompressor == "pigz":
+        return shutil.which("pigz") is not None
+    return True
+
+
+DECOMPRESSORS = [
+    pytest.param(
+        decompressor, marks=pytest.mark.skipif(not _available(decompressor), reason=f"{decompressor} not installed")
+    )
+    for decompressor in ["gzip", "isal", "pigz"]
+]
+
+
+@pytest.fixture
+def gzipped(tmp_path):
+    path = tmp_path / "rows.tsv.gz"
+    path.write_bytes(gzip.compress(LINES.encode("utf-8")))
+    return path
+
+
+@pytest.mark.parametrize("decompressor", DECOMPRESSORS)
+def test_reads_the_whole_stream(gzipped, decompressor):
+    with open_text(gzipped, decompressor=decompressor) as infile:
+        assert infile.read() == LINES
+
+
+@pytest.mark.parametrize("decompressor", DECOMPRESSORS)
+def test_truncated_stream_raises(gzipped, tmp_path, decompressor):
+    truncated = tmp_path / "truncated.tsv.gz"
+    truncated.write_bytes(gzipped.read_bytes()[:-100])
+    with pytest.raises((EOFError, OSError)):
+        with open_text(truncated, decompressor=decompressor) as infile:
+            infile.read()
+
+
+@pytest.mark.parametrize("decompressor", DECOMPRESSORS)
+def test_early_stop_and_reader_errors(gzipped, decompressor):
+    with open_text(gzipped, decompressor=decompressor) as infile:
+        assert infile.readline() == "row\t0\n"
+    # the reader's own exception is the one that propagates
+    with pytest.raises(KeyError):
+        with open_text(gzipped, decompressor=decompressor) as infile:
+            infile.readline()
+            raise KeyError("reader")
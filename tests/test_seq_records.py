@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from lib.json_backend import JSON_BACKENDS, get_json_decoder
+from pathogenicity_benchmark import compare_seq_vs_clingen
+
+CLINGEN_ENTRY = {
+    "identifier": "1-100-A-T",
+    "pathogenicity": "P",
+    "evidence_codes": ["PVS1", "PM2_Supporting"],
+    "unmet_evidence_codes": ["PP3"],
+}
+
+RECORDS = [
+    {"annotations": {"variant": {"clingen": [CLINGEN_ENTRY]},
+                     "transcript": {"auto_pathogenicity": "P", "acmg_evidence_codes": ["PVS1", "PM2"]}}},
+    # a ClinGen entry without evidence codes on the transcript
+    {"annotations": {"variant": {"clingen": [CLINGEN_ENTRY]},
+                     "transcript": {"auto_pathogenicity": "B", "acmg_evidence_codes": None}}},
+    {"annotations": {"variant": {"clingen": [CLINGEN_ENTRY]}, "transcript": {"auto_pathogenicity": "B"}}},
+    # no ClinGen entry: skipped whatever the transcript holds
+    {"annotations": {"variant": {}, "transcript": {"auto_pathogenicity": "B"}}},
+    {"annotations": {"variant": {"clingen": None}, "transcript": {"acmg_evidence_codes": None}}},
+    {"annotations": {"variant": {"clingen": []}}},
+]
+
+
+def _installed_backends():
+    backends = []
+    for backend in JSON_BACKENDS:
+        try:
+            get_json_decoder(backend)
+        except ImportError:
+            continue
+        backends.append(backend)
+    return backends
+
+
+@pytest.mark.parametrize("backend", _installed_backends())
+def test_backends_agree_on_sparse_records(tmp_path, backend):
+    seq_file = tmp_path / "seq.jsonl"
+    seq_file.write_text("".join(json.dumps(record) + "\n" for record in RECORDS))
+    expected = compare_seq_vs_clingen(str(seq_file), json_backend="json")
+    result = compare_seq_vs_clingen(str(seq_file), json_backend=backend)
+    assert dict(result[0]) == dict(expected[0]) == {("P", "P"): 1, ("P", "B"): 2}
+    assert result[1] == expected[1]
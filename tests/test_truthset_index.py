@@ -0,0 +1,51 @@
+from lib import truthset_index
+from lib.truthset import ClingenTruthset
+from lib.truthset_index import TruthsetIndex, pack_variant_key
+
+
+def test_colliding_alleles_are_told_apart():
+    # both alt alleles hash to the same 15 bits, so the variants share a packed key
+    assert pack_variant_key("1", "100", "A", "ACCTCA") == pack_variant_key("1", "100", "A", "ATAAAA")
+    truthset = ClingenTruthset()
+    truthset.add("1-100-A-ACCTCA", "P", ["PVS1"], [])
+    truthset.add("1-100-A-ATAAAA", "B", ["BA1"], [])
+    truthset.add("2-5-C-T", "VUS", [], ["PM2"])
+    index = TruthsetIndex.from_truthset(truthset)
+
+    assert index.get("1-100-A-ACCTCA").pathogenicity == "P"
+    assert index.get("1-100-A-ATAAAA").pathogenicity == "B"
+    assert index.get("2-5-C-T").pathogenicity == "VUS"
+    assert "1-100-A-AGGGGG" not in index
+    rows = index.lookup_identifiers(["1-100-A-ATAAAA", "3-1-G-A", "1-100-A-ACCTCA"])
+    assert [index.tiers[index.pathogenicity_codes[row]] for row in rows[[0, 2]]] == ["B", "P"]
+    assert rows[1] == -1
+
+
+def test_colliding_keys_and_checksums_are_told_apart():
+    # these share the packed key and their adler32 checksum
+    first, second = "1-100-A-AACGGCAA", "1-100-A-GCAAAACG"
+    assert pack_variant_key(*first.split("-")) == pack_variant_key(*second.split("-"))
+    truthset = ClingenTruthset()
+    truthset.add(first, "P", ["PVS1"], [])
+    only_first = TruthsetIndex.from_truthset(truthset)
+    assert only_first.get(second) is None
+    truthset.add(second, "B", ["BA1"], [])
+    both = TruthsetIndex.from_truthset(truthset)
+    assert both.get(first).pathogenicity == "P"
+    assert both.get(second).pathogenicity == "B"
+
+
+def test_colliding_keys_are_confirmed_by_identifier(monkeypatch, tmp_path):
+    # every variant gets the same key, so only the stored identifiers tell them apart
+    monkeypatch.setattr(truthset_index, "pack_variant_key", lambda chromosome, position, ref, alt: 7)
+    truthset = ClingenTruthset()
+    truthset.add("1-100-A-AACGGCAA", "P", ["PVS1"], [])
+    truthset.add("1-100-A-GCAAAACG", "B", ["BA1"], [])
+    truthset.add("2-5-C-T", "VUS", [], ["PM2"])
+    TruthsetIndex.from_truthset(truthset).save(tmp_path)
+    index = TruthsetIndex.load(tmp_path)
+
+    rows = index.lookup_identifiers(["1-100-A-GCAAAACG", "1-100-A-AACGGCAA", "1-100-A-AACGGCAT", "2-5-C-TT"])
+    assert [index.tiers[index.pathogenicity_codes[row]] for row in rows[:2]] == ["B", "P"]
+    assert rows[2:].tolist() == [-1, -1]
+    assert index.get("2-5-C-T").pathogenicity == "VUS"
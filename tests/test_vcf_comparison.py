@@ -0,0 +1,32 @@
+from lib.truthset import ClingenTruthset
+from pathogenicity_benchmark import run_vcf_comparison
+
+VCF = """##fileformat=VCFv4.2
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+chr1\t100\t.\tA\tT\t.\t.\tCLASS=Pathogenic;ACMG=PVS1,PM2_Supporting
+chr1\t200\t.\tG\tC\t.\t.\tACMG=PVS1
+chr1\t300\t.\tC\tG\t.\t.\tCLASS=not_a_class;ACMG=BA1
+chr1\t400\t.\tT\tA\t.\t.\tCLASS=Benign
+"""
+
+
+def _truthset():
+    truthset = ClingenTruthset()
+    truthset.add("1-100-A-T", "P", ["PVS1", "PM2"], [])
+    truthset.add("1-200-G-C", "P", ["PVS1"], [])
+    truthset.add("1-300-C-G", "B", ["BA1"], [])
+    return truthset
+
+
+def test_alleles_without_a_known_class_are_counted_as_missing(tmp_path):
+    vcf_file = tmp_path / "platform.vcf"
+    vcf_file.write_text(VCF)
+
+    pathogenicity_dict, _, missing = run_vcf_comparison(str(vcf_file), _truthset())
+    # the unclassified and unknown-class records and the one outside the truthset
+    assert dict(pathogenicity_dict) == {("P", "P"): 1}
+    assert missing == 3
+
+    raw_pathogenicity_dict, _, raw_missing = run_vcf_comparison(str(vcf_file), _truthset(), raw_labels=True)
+    assert dict(raw_pathogenicity_dict) == {("P", "Pathogenic"): 1}
+    assert raw_missing == 3